@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WorkoutPlan, WorkoutLog, WorkoutExercise
+from .models import WorkoutPlan, WorkoutLog, WorkoutExercise, VideoAnalysisCache, VideoAnalysisJob, VideoWorker
 
 class WorkoutExerciseInline(admin.TabularInline):
     model = WorkoutExercise
@@ -23,3 +23,19 @@ class WorkoutLogAdmin(admin.ModelAdmin):
     list_display = ('plan_title', 'start_time', 'duration', 'status', 'ai_score')
     list_filter = ('status', 'start_time')
     search_fields = ('plan_title',)
+
+@admin.register(VideoAnalysisCache)
+class VideoAnalysisCacheAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'model', 'prompt_version', 'hit_count', 'last_used_at', 'created_at')
+    list_filter = ('model', 'prompt_version')
+    search_fields = ('content_hash',)
+
+@admin.register(VideoAnalysisJob)
+class VideoAnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'status', 'stage', 'progress', 'cached', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'stage')
+    search_fields = ('job_id', 'content_hash')
+
+@admin.register(VideoWorker)
+class VideoWorkerAdmin(admin.ModelAdmin):
+    list_display = ('name', 'started_at', 'last_seen')
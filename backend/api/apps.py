@@ -1,7 +1,28 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _is_server_process():
+    """
+    是否为处理请求的 Web 进程：runserver 的自动重载子进程、daphne / gunicorn / uvicorn / uwsgi
+    migrate 等管理命令及 runserver 的监控父进程不预热
+    """
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in ('manage.py', 'django-admin'):
+        if len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+            return False
+        return '--noreload' in sys.argv or os.environ.get('RUN_MAIN') == 'true'
+    return any(server in program for server in ('daphne', 'gunicorn', 'uvicorn', 'uwsgi'))
+
+
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
 
+    def ready(self):
+        # Web 进程启动后在后台预热姿态模型，/api/ready/ 在预热完成后才返回 200
+        if _is_server_process():
+            from .utils.warmup import start_warmup
+            start_warmup()
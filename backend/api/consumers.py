@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+import cv2
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from .utils.pose_analysis import create_pose_detector, decode_frame, build_pose_result
+from .utils.complexity_controller import get_complexity_controller, run_with_complexity
+from .utils.static_frames import get_static_frame_cache, frame_fingerprint
+from .utils.metrics import metrics
+
+# WebSocket 会话只返回数值结果，客户端本地已有画面，不回传图像
+SESSION_RETURN_MODES = ('none', 'landmarks')
+
+logger = logging.getLogger(__name__)
+
+
+class PoseSessionConsumer(AsyncWebsocketConsumer):
+    """
+    长连接姿态分析会话 (ws/pose/)
+    每个会话持有一个跟踪模式 (static_image_mode=False) 的 Pose 实例，连续帧复用上一帧的检测结果
+    - 二进制消息：一帧 JPEG/WebP 图像，返回 {"type": "pose", "data": {...}}
+      推理期间最多保留一帧待处理，新帧取代未处理的旧帧，丢弃数随结果返回 (dropped_frames)
+    - 文本消息：JSON 配置，如 {"exercise_type": "squat", "return_image": "none"}
+    初始配置也可以放在连接的查询参数中：ws/pose/?exercise_type=squat
+    """
+
+    async def connect(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.exercise_type = params.get('exercise_type', ['general'])[0]
+        self.return_image = params.get('return_image', ['landmarks'])[0]
+        if self.return_image not in SESSION_RETURN_MODES:
+            self.return_image = 'landmarks'
+        self.frame_index = 0
+        self.dropped_frames = 0
+        self.pending_frame = None
+        self.worker = None
+        self.pose_detector = None
+        self.model_complexity = None
+        # 当前检测器已推理过的档位；重建检测器后的第一帧耗时含模型加载，不计入复杂度控制器的样本
+        self.warmed_levels = set()
+        await self.accept()
+
+    async def disconnect(self, code):
+        # 等待正在进行的推理结束，再释放检测器
+        self.pending_frame = None
+        if self.worker is not None:
+            await asyncio.gather(self.worker, return_exceptions=True)
+            self.worker = None
+        get_static_frame_cache().discard(self.channel_name)
+        if self.pose_detector is not None:
+            await sync_to_async(self.pose_detector.close, thread_sensitive=False)()
+            self.pose_detector = None
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            if self.pending_frame is not None:
+                self.dropped_frames += 1
+            self.pending_frame = bytes_data
+            if self.worker is None or self.worker.done():
+                self.worker = asyncio.ensure_future(self.drain_frames())
+            return
+
+        try:
+            config = json.loads(text_data or '{}')
+        except json.JSONDecodeError:
+            await self.send_json({'type': 'error', 'success': False, 'error': '配置数据格式错误'})
+            return
+        if config.get('exercise_type'):
+            self.exercise_type = config['exercise_type']
+        if config.get('return_image') in SESSION_RETURN_MODES:
+            self.return_image = config['return_image']
+        await self.send_json({
+            'type': 'config',
+            'success': True,
+            'data': {'exercise_type': self.exercise_type, 'return_image': self.return_image}
+        })
+
+    async def drain_frames(self):
+        """依次处理最新的待处理帧，直到没有新帧"""
+        while self.pending_frame is not None:
+            frame_bytes = self.pending_frame
+            self.pending_frame = None
+            try:
+                data = await sync_to_async(self.process_frame, thread_sensitive=False)(frame_bytes)
+            except Exception as e:
+                logger.exception('WebSocket 会话姿态分析失败 (%s)', self.exercise_type)
+                await self.send_json({'type': 'error', 'success': False, 'error': f'姿态分析失败: {str(e)}'})
+                continue
+            if data is None:
+                await self.send_json({'type': 'error', 'success': False, 'error': '无法解码图像'})
+            else:
+                data['dropped_frames'] = self.dropped_frames
+                await self.send_json({'type': 'pose', 'success': True, 'data': data})
+
+    def process_frame(self, frame_bytes):
+        """在线程池中执行：解码 -> MediaPipe 跟踪 -> 动作分析"""
+        image, input_scale = decode_frame(frame_bytes, max_side=settings.POSE_INFERENCE_MAX_SIDE)
+        if image is None:
+            return None
+        # 画面与上次推理的帧几乎相同时复用上次结果
+        static_frames = get_static_frame_cache()
+        fingerprint = frame_fingerprint(image) if static_frames.enabled else None
+        cached = static_frames.lookup(self.channel_name, fingerprint)
+        if cached is not None:
+            results, level = cached
+            metrics.inc('pose_session_static_hits')
+        else:
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            results, level, _ = run_with_complexity(
+                get_complexity_controller(), lambda level: self.get_detector(level).process(image_rgb),
+                warmed=self.warmed_levels
+            )
+            static_frames.store(self.channel_name, fingerprint, (results, level))
+        data = build_pose_result(
+            results, self.exercise_type, image.shape,
+            include_landmarks=(self.return_image == 'landmarks')
+        )
+        data['input_scale'] = round(input_scale, 4)
+        data['model_complexity'] = level
+        data['static_frame'] = cached is not None
+        metrics.inc('pose_session_frames')
+        data['frame_index'] = self.frame_index
+        self.frame_index += 1
+        return data
+
+    def get_detector(self, model_complexity):
+        """控制器切换档位后重建跟踪检测器（跟踪状态从下一帧重新开始）"""
+        if self.pose_detector is None or self.model_complexity != model_complexity:
+            detector = create_pose_detector(static_image_mode=False, model_complexity=model_complexity)
+            if self.pose_detector is not None:
+                self.pose_detector.close()
+            self.pose_detector = detector
+            self.model_complexity = model_complexity
+            self.warmed_levels.clear()
+        return self.pose_detector
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content, ensure_ascii=False))
@@ -0,0 +1,304 @@
+import json
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.metrics import metrics
+from api.utils.pose_analysis import build_pose_result
+from api.utils.pose_math import LANDMARK_INDEX, NUM_LANDMARKS
+from api.utils.pose_pool import PoolPoseResults, get_pose_pool
+from api.utils.static_frames import get_static_frame_cache
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def _parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def _rss_mb(pid='self'):
+    """进程常驻内存（MB），读取 /proc，非 Linux 系统返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def _latency_stats(latencies):
+    if not latencies:
+        return None
+    values = np.asarray(latencies) * 1000
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def synthetic_frame(width, height, rng, index=0):
+    """
+    固定随机种子生成的合成帧：带噪声的背景加一个简笔人形，编码为 JPEG
+    各帧背景亮度和人形位置不同，相邻帧不会被静止帧缓存当作同一画面
+    """
+    low = 60 + (index * 12) % 100
+    image = rng.integers(low, low + 70, size=(height, width, 3), dtype=np.uint8)
+    scale = height / 480
+    cx = width // 2 + (index % 3 - 1) * width // 10
+    color = (40, 40, 40)
+    thickness = max(int(12 * scale), 1)
+    cv2.circle(image, (cx, int(90 * scale)), int(35 * scale), color, -1)
+    body = [((cx, int(125 * scale)), (cx, int(280 * scale))),
+            ((cx, int(150 * scale)), (cx - int(80 * scale), int(230 * scale))),
+            ((cx, int(150 * scale)), (cx + int(80 * scale), int(230 * scale))),
+            ((cx, int(280 * scale)), (cx - int(50 * scale), int(430 * scale))),
+            ((cx, int(280 * scale)), (cx + int(50 * scale), int(430 * scale)))]
+    for start, end in body:
+        cv2.line(image, start, end, color, thickness)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes()
+
+
+def _static_hit(response):
+    """响应是否为静止帧缓存的结果（data.static_frame）"""
+    if response.status_code != 200:
+        return False
+    try:
+        return bool(response.json()['data'].get('static_frame'))
+    except (ValueError, KeyError, AttributeError):
+        return False
+
+
+def synthetic_landmarks(count, rng):
+    """站立姿态附近随机扰动的 (count, 33, 4) 关键点，用于单独测量动作判定路径"""
+    base = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    base[:, 3] = 0.95
+    base[:, 0] = 0.5
+    base[:, 1] = np.linspace(0.1, 0.95, NUM_LANDMARKS)
+    for side, dx in (('LEFT', -0.08), ('RIGHT', 0.08)):
+        for name, y in (('SHOULDER', 0.3), ('ELBOW', 0.45), ('WRIST', 0.58),
+                        ('HIP', 0.6), ('KNEE', 0.78), ('ANKLE', 0.95)):
+            base[LANDMARK_INDEX[f'{side}_{name}'], :2] = (0.5 + dx, y)
+    noise = rng.normal(0, 0.03, size=(count, NUM_LANDMARKS, 2)).astype(np.float32)
+    arrays = np.repeat(base[None], count, axis=0)
+    arrays[..., :2] += noise
+    return arrays
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the analyze-pose pipeline (in-process and over HTTP) and print JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=('inprocess', 'http', 'both'), default='inprocess')
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/analyze-pose/',
+                            help='HTTP 模式请求的 analyze-pose 地址')
+        parser.add_argument('--resolutions', default='640x480,1280x720',
+                            help='合成帧分辨率，逗号分隔，例如 320x240,640x480,1920x1080')
+        parser.add_argument('--frames-dir', help='录制帧目录（JPEG/PNG/WebP），作为额外的 recorded 语料')
+        parser.add_argument('--exercise-types', default='squat,curl,general')
+        parser.add_argument('--concurrency', default='1,4', help='并发数，逗号分隔')
+        parser.add_argument('--frames', type=int, default=30, help='每个用例每个并发线程发送的帧数')
+        parser.add_argument('--warmup', type=int, default=3, help='每个用例正式计时前的预热帧数')
+        parser.add_argument('--return-image', default='none', choices=('none', 'landmarks', 'jpeg'))
+        parser.add_argument('--analysis-frames', type=int, default=2000,
+                            help='动作判定路径（不含推理）的关键点帧数，0 表示跳过')
+        parser.add_argument('--static-frames', action='store_true',
+                            help='进程内运行时保留静止帧缓存（默认关闭，使每帧都经过推理）')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='结果写入的 JSON 文件，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        corpus = self.build_corpus(options, rng)
+        modes = ('inprocess', 'http') if options['mode'] == 'both' else (options['mode'],)
+        exercise_types = _parse_list(options['exercise_types'])
+        concurrency_levels = _parse_list(options['concurrency'], int)
+
+        # 静止帧缓存命中时不推理，测得的延迟和帧率不反映推理流水线；HTTP 模式下由服务端配置决定，命中数单独统计
+        static_frames = get_static_frame_cache()
+        threshold = static_frames.threshold
+        if not options['static_frames']:
+            static_frames.threshold = 0
+        results = []
+        try:
+            for mode in modes:
+                for corpus_name, frames in corpus.items():
+                    for exercise_type in exercise_types:
+                        for concurrency in concurrency_levels:
+                            self.stderr.write(f'[Benchmark] {mode} {corpus_name} {exercise_type} x{concurrency}')
+                            results.append(self.run_case(
+                                mode, corpus_name, frames, exercise_type, concurrency, options
+                            ))
+        finally:
+            static_frames.threshold = threshold
+
+        report = {
+            'meta': self.environment(options),
+            'results': results,
+            'analysis': self.benchmark_analysis(exercise_types, options['analysis_frames'], rng),
+            'stages': metrics.snapshot()['latency_ms'] if 'inprocess' in modes else None,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f'Benchmark written to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def build_corpus(self, options, rng):
+        """语料：每种分辨率若干张合成帧，另可加入录制帧目录"""
+        corpus = {}
+        for resolution in _parse_list(options['resolutions']):
+            width, height = _parse_resolution(resolution)
+            corpus[resolution] = [synthetic_frame(width, height, rng, index) for index in range(8)]
+        frames_dir = options.get('frames_dir')
+        if frames_dir:
+            if not os.path.isdir(frames_dir):
+                raise CommandError(f'录制帧目录不存在: {frames_dir}')
+            recorded = []
+            for name in sorted(os.listdir(frames_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    with open(os.path.join(frames_dir, name), 'rb') as f:
+                        recorded.append(f.read())
+            if not recorded:
+                raise CommandError(f'录制帧目录中没有图像: {frames_dir}')
+            corpus['recorded'] = recorded
+        return corpus
+
+    def make_sender(self, mode, url, exercise_type, return_image, client_id):
+        """返回 send(frame_bytes) -> (HTTP 状态码, 是否命中静止帧缓存)；每个并发线程使用独立的 client_id，避免互相取代"""
+        params = {'exercise_type': exercise_type, 'return_image': return_image, 'client_id': client_id}
+        if mode == 'http':
+            import requests
+            session = requests.Session()
+
+            def send(frame):
+                response = session.post(url, params=params, data=frame,
+                                        headers={'Content-Type': 'application/octet-stream'})
+                return response.status_code, _static_hit(response)
+            return send
+
+        from rest_framework.test import APIClient
+        client = APIClient()
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+
+        def send(frame):
+            response = client.generic('POST', f'/api/analyze-pose/?{query}', frame,
+                                      content_type='application/octet-stream')
+            return response.status_code, _static_hit(response)
+        return send
+
+    def run_case(self, mode, corpus_name, frames, exercise_type, concurrency, options):
+        # 各线程完成客户端创建和预热帧后在栅栏处汇合，计时从栅栏之后开始，不含预热
+        barrier = threading.Barrier(concurrency + 1)
+
+        def worker(worker_index):
+            try:
+                send = self.make_sender(mode, options['url'], exercise_type, options['return_image'],
+                                        f'benchmark-{worker_index}')
+                for i in range(options['warmup']):
+                    send(frames[i % len(frames)])
+            finally:
+                barrier.wait()
+            latencies, static_latencies, dropped, errors = [], [], 0, 0
+            for i in range(options['frames']):
+                start = time.perf_counter()
+                code, static_hit = send(frames[(worker_index + i) % len(frames)])
+                if code == 200 and static_hit:
+                    static_latencies.append(time.perf_counter() - start)
+                elif code == 200:
+                    latencies.append(time.perf_counter() - start)
+                elif code == 409:
+                    dropped += 1
+                else:
+                    errors += 1
+            return latencies, static_latencies, dropped, errors
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(worker, index) for index in range(concurrency)]
+            barrier.wait()
+            start = time.perf_counter()
+            outcomes = [future.result() for future in futures]
+        duration = time.perf_counter() - start
+
+        latencies = [value for outcome in outcomes for value in outcome[0]]
+        static_latencies = [value for outcome in outcomes for value in outcome[1]]
+        return {
+            'mode': mode,
+            'corpus': corpus_name,
+            'exercise_type': exercise_type,
+            'concurrency': concurrency,
+            'return_image': options['return_image'],
+            # frames / frames_per_second / latency_ms 只统计经过推理的帧，静止帧缓存命中单独列出
+            'frames': len(latencies),
+            'static_hits': len(static_latencies),
+            'dropped': sum(outcome[2] for outcome in outcomes),
+            'errors': sum(outcome[3] for outcome in outcomes),
+            'duration_seconds': round(duration, 3),
+            'frames_per_second': round(len(latencies) / duration, 2) if duration else None,
+            'latency_ms': _latency_stats(latencies),
+            'static_latency_ms': _latency_stats(static_latencies),
+            # HTTP 模式下服务端是另一个进程，本进程内存没有参考意义
+            'rss_mb': self.memory_usage() if mode == 'inprocess' else None,
+        }
+
+    def benchmark_analysis(self, exercise_types, count, rng):
+        """只测量关键点到接口结果的动作判定路径（build_pose_result），不含解码与推理"""
+        if count <= 0:
+            return None
+        arrays = synthetic_landmarks(count, rng)
+        results = {}
+        for exercise_type in exercise_types:
+            for include_landmarks in (False, True):
+                start = time.perf_counter()
+                for array in arrays:
+                    build_pose_result(PoolPoseResults(array), exercise_type, (480, 640, 3),
+                                      include_landmarks=include_landmarks)
+                duration = time.perf_counter() - start
+                key = f'{exercise_type}' + ('+landmarks' if include_landmarks else '')
+                results[key] = {
+                    'frames': count,
+                    'frames_per_second': round(count / duration, 1),
+                    'per_frame_us': round(duration / count * 1e6, 2),
+                }
+        return results
+
+    def memory_usage(self):
+        pool = get_pose_pool()
+        workers = [_rss_mb(pid) for pid in pool.worker_pids] if pool is not None else []
+        return {'main': _rss_mb(), 'workers': workers}
+
+    def environment(self, options):
+        import mediapipe
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'mediapipe': mediapipe.__version__,
+            'pose_pool_workers': getattr(settings, 'POSE_POOL_WORKERS', 0),
+            'options': {key: options[key] for key in (
+                'mode', 'resolutions', 'frames_dir', 'exercise_types', 'concurrency',
+                'frames', 'warmup', 'return_image', 'static_frames', 'seed',
+            )},
+        }
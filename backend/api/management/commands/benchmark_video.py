@@ -0,0 +1,202 @@
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+from imageio_ffmpeg import get_ffmpeg_exe
+
+VARIANTS = ('single', 'legacy')
+
+
+def synthesize_video(path, seconds, resolution, fps):
+    """用 ffmpeg 的测试源生成带音频（正弦波）的合成视频"""
+    subprocess.run([
+        get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={resolution}:rate={fps}',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+        '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', path,
+    ], check=True, capture_output=True)
+
+
+def legacy_compress_video(input_path, output_path, target_fps=1, target_width=320):
+    """
+    改为单遍转码之前的实现，仅用于对比：
+    OpenCV 解码全部帧写出 mp4v 临时文件，再用 MoviePy 同时打开临时文件与原视频，合成音频并用 libx264 重新编码
+    """
+    # moviepy 1.x：moviepy.editor、set_audio、write_videofile(verbose=)；2.x：顶层导入、with_audio，没有 verbose 参数
+    try:
+        from moviepy.editor import VideoFileClip
+        write_options = {'verbose': False, 'logger': None}
+    except ImportError:
+        from moviepy import VideoFileClip
+        write_options = {'logger': None}
+
+    temp_video = tempfile.mktemp(suffix='.mp4')
+    cap = cv2.VideoCapture(input_path)
+    original_fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    target_height = int(height * target_width / width)
+    out = cv2.VideoWriter(temp_video, cv2.VideoWriter_fourcc(*'mp4v'), target_fps, (target_width, target_height))
+    skip_interval = max(1, int(original_fps / target_fps))
+    frame_count = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count % skip_interval == 0:
+                out.write(cv2.resize(frame, (target_width, target_height)))
+            frame_count += 1
+    finally:
+        cap.release()
+        out.release()
+
+    video_clip = VideoFileClip(temp_video)
+    original_clip = VideoFileClip(input_path)
+    try:
+        if original_clip.audio:
+            with_audio = getattr(video_clip, 'with_audio', None) or video_clip.set_audio
+            final_clip = with_audio(original_clip.audio)
+            final_clip.write_videofile(output_path, codec='libx264', audio_codec='aac', **write_options)
+        else:
+            video_clip.write_videofile(output_path, codec='libx264', **write_options)
+    finally:
+        video_clip.close()
+        original_clip.close()
+        os.remove(temp_video)
+
+
+def _peak_rss_mb(children=False):
+    """本进程（或已结束子进程中最高）的峰值常驻内存（MB）；resource 模块只在 Unix 上可用，其他系统返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss 在 Linux 下单位为 KB，macOS 下为字节
+    return round(usage / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _run_variant(variant, input_path, output_path, conn):
+    """子进程中执行一次压缩，返回耗时与峰值内存（本进程与 ffmpeg 等子进程分别统计）；失败时返回 error"""
+    try:
+        import django
+        django.setup()
+        from api.utils.video_analyzer import VideoAnalyzer
+
+        # baseline 为 Django 初始化后、开始压缩前的峰值
+        baseline = _peak_rss_mb()
+        start = time.perf_counter()
+        if variant == 'single':
+            VideoAnalyzer.compress_video(input_path, output_path)
+        else:
+            legacy_compress_video(input_path, output_path)
+        duration = time.perf_counter() - start
+        conn.send({
+            'seconds': round(duration, 2),
+            'baseline_rss_mb': baseline,
+            'peak_rss_mb': _peak_rss_mb(),
+            # 子进程（ffmpeg）中峰值最高的一个
+            'peak_child_rss_mb': _peak_rss_mb(children=True),
+        })
+    except Exception as e:
+        conn.send({'error': f'{type(e).__name__}: {e}'})
+    finally:
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark VideoAnalyzer.compress_video against the previous two-pass pipeline and print JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help='待压缩的视频；省略时生成合成视频')
+        parser.add_argument('--seconds', type=int, default=300, help='合成视频时长（秒）')
+        parser.add_argument('--resolution', default='1280x720', help='合成视频分辨率')
+        parser.add_argument('--fps', type=int, default=30, help='合成视频帧率')
+        parser.add_argument('--variants', default=','.join(VARIANTS),
+                            help='single 为当前单遍转码，legacy 为原先的 OpenCV + MoviePy 两遍编码')
+        parser.add_argument('--output', help='结果写入的 JSON 文件，默认输出到标准输出')
+
+    def handle(self, *args, **options):
+        variants = [variant.strip() for variant in options['variants'].split(',') if variant.strip()]
+        unknown = set(variants) - set(VARIANTS)
+        if unknown:
+            raise CommandError(f'未知的对比项: {", ".join(sorted(unknown))}')
+
+        workdir = tempfile.mkdtemp(prefix='benchmark_video_')
+        try:
+            input_path = options['input']
+            if input_path:
+                if not os.path.exists(input_path):
+                    raise CommandError(f'视频不存在: {input_path}')
+            else:
+                input_path = os.path.join(workdir, 'input.mp4')
+                self.stderr.write(f'[Benchmark] 生成 {options["seconds"]}s {options["resolution"]} 合成视频')
+                synthesize_video(input_path, options['seconds'], options['resolution'], options['fps'])
+
+            cap = cv2.VideoCapture(input_path)
+            source = {
+                'path': options['input'] or 'synthetic',
+                'size_mb': round(os.path.getsize(input_path) / 1024 / 1024, 2),
+                'fps': round(cap.get(cv2.CAP_PROP_FPS), 2),
+                'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            }
+            cap.release()
+
+            # 每个对比项在独立的进程中运行，峰值内存互不影响
+            ctx = multiprocessing.get_context('spawn')
+            results = {}
+            for variant in variants:
+                self.stderr.write(f'[Benchmark] {variant}')
+                output_path = os.path.join(workdir, f'{variant}.mp4')
+                parent_conn, child_conn = ctx.Pipe()
+                process = ctx.Process(target=_run_variant, args=(variant, input_path, output_path, child_conn))
+                process.start()
+                # 关闭父进程持有的写端，子进程崩溃退出时 recv() 才会收到 EOF 而不是一直等待
+                child_conn.close()
+                try:
+                    result = parent_conn.recv()
+                except EOFError:
+                    result = None
+                process.join()
+                if result is None:
+                    result = {'error': f'子进程异常退出（exitcode {process.exitcode}）'}
+                if 'error' in result:
+                    self.stderr.write(self.style.ERROR(f'[Benchmark] {variant} 失败: {result["error"]}'))
+                elif os.path.exists(output_path):
+                    result['output_size_kb'] = round(os.path.getsize(output_path) / 1024, 1)
+                results[variant] = result
+
+            report = {
+                'meta': {
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpu_count': os.cpu_count(),
+                    'opencv': cv2.__version__,
+                },
+                'source': source,
+                'results': results,
+            }
+            if all('seconds' in results.get(variant, {}) for variant in ('single', 'legacy')):
+                report['speedup'] = round(results['legacy']['seconds'] / results['single']['seconds'], 2)
+            output = json.dumps(report, ensure_ascii=False, indent=2)
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8') as f:
+                    f.write(output)
+                self.stderr.write(self.style.SUCCESS(f'Benchmark written to {options["output"]}'))
+            else:
+                self.stdout.write(output)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,82 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.utils.video_jobs import (
+    claim_next_job, purge_finished_jobs, remove_worker, requeue_stale_jobs, run_job, touch_worker, worker_name,
+)
+
+# 检查中断任务、清理过期任务的间隔（秒）
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued /api/analyze-video/ jobs (async mode); start one or more alongside the web server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='处理完当前排队的任务后退出')
+        parser.add_argument('--poll-interval', type=float, default=settings.VIDEO_JOB_POLL_INTERVAL,
+                            help='没有任务时查询数据库的间隔（秒）')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        # SIGTERM / Ctrl+C 时执行完当前任务再退出，不留下停在 running 的任务
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        name = worker_name()
+        # 心跳在独立线程中写入，执行任务期间（模型调用可能持续数分钟）Web 进程也能判断 worker 仍存活
+        touch_worker(name)
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(name, heartbeat_stop), daemon=True)
+        heartbeat.start()
+        self.stderr.write(f'[VideoWorker] {name} started')
+        try:
+            self._loop(name, options)
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+            remove_worker(name)
+        self.stderr.write(f'[VideoWorker] {name} stopped')
+
+    def _heartbeat(self, name, stop):
+        while not stop.wait(settings.VIDEO_WORKER_HEARTBEAT_SECONDS):
+            try:
+                touch_worker(name)
+            except Exception as e:
+                self.stderr.write(f'[VideoWorker] heartbeat failed: {e}')
+        close_old_connections()
+
+    def _loop(self, name, options):
+        last_maintenance = 0.0
+        while not self._stopping:
+            if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                last_maintenance = time.monotonic()
+                self._maintain()
+
+            job = claim_next_job(name)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stderr.write(f'[VideoWorker] job {job.job_id} started (attempt {job.attempts})')
+            job = run_job(job)
+            self.stderr.write(f'[VideoWorker] job {job.job_id} {job.status}')
+
+    def _maintain(self):
+        requeued, failed = requeue_stale_jobs(settings.VIDEO_JOB_STALE_SECONDS, settings.VIDEO_JOB_MAX_ATTEMPTS)
+        purged = purge_finished_jobs(settings.VIDEO_JOB_RETENTION_DAYS)
+        if requeued or failed or purged:
+            self.stderr.write(f'[VideoWorker] requeued {requeued}, failed {failed}, purged {purged} jobs')
+
+    def _stop(self, signum, frame):
+        if self._stopping:
+            raise KeyboardInterrupt
+        self._stopping = True
+        self.stderr.write('[VideoWorker] stopping after the current job (press Ctrl+C again to abort)')
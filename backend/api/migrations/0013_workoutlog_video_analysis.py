@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_workoutexercise_muscle_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutlog',
+            name='video_analysis',
+            field=models.JSONField(blank=True, null=True, verbose_name='本地视频分析'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_workoutlog_video_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='视频内容哈希')),
+                ('model', models.CharField(max_length=100, verbose_name='分析模型')),
+                ('prompt_version', models.CharField(max_length=16, verbose_name='提示词版本')),
+                ('workout_data', models.JSONField(verbose_name='分析结果')),
+                ('gif_files', models.JSONField(default=list, verbose_name='GIF文件')),
+                ('video_size', models.BigIntegerField(default=0, verbose_name='视频大小(字节)')),
+                ('gif_size', models.BigIntegerField(default=0, verbose_name='GIF总大小(字节)')),
+                ('hit_count', models.IntegerField(default=0, verbose_name='命中次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, verbose_name='最近使用时间')),
+            ],
+            options={
+                'verbose_name': '视频分析缓存',
+                'verbose_name_plural': '视频分析缓存',
+                'ordering': ['-last_used_at'],
+                'unique_together': {('content_hash', 'model', 'prompt_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:38
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_videoanalysiscache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoAnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='任务ID')),
+                ('status', models.CharField(choices=[('queued', '排队中'), ('running', '执行中'), ('completed', '已完成'), ('failed', '失败')], default='queued', max_length=20, verbose_name='状态')),
+                ('stage', models.CharField(default='queued', max_length=30, verbose_name='阶段')),
+                ('progress', models.FloatField(default=0, verbose_name='进度(%)')),
+                ('video_path', models.CharField(max_length=500, verbose_name='上传视频路径')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='视频内容哈希')),
+                ('video_size', models.BigIntegerField(default=0, verbose_name='视频大小(字节)')),
+                ('media_url', models.CharField(max_length=500, verbose_name='媒体文件地址')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='分析结果')),
+                ('cached', models.BooleanField(default=False, verbose_name='命中缓存')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('attempts', models.IntegerField(default=0, verbose_name='执行次数')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='执行进程')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='提交时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='最近更新时间')),
+            ],
+            options={
+                'verbose_name': '视频分析任务',
+                'verbose_name_plural': '视频分析任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='api_videoan_status_616740_idx')],
+            },
+        ),
+    ]
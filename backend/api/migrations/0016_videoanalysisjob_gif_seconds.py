@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_videoanalysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoanalysisjob',
+            name='gif_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='GIF生成耗时(秒)'),
+        ),
+    ]
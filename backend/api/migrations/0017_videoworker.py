@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_videoanalysisjob_gif_seconds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='进程')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='启动时间')),
+                ('last_seen', models.DateTimeField(verbose_name='最近心跳')),
+            ],
+            options={
+                'verbose_name': '视频分析 worker',
+                'verbose_name_plural': '视频分析 worker',
+            },
+        ),
+    ]
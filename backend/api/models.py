@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class WorkoutPlan(models.Model):
@@ -63,6 +65,7 @@ class WorkoutLog(models.Model):
     ai_score = models.FloatField(null=True, blank=True, verbose_name="AI评分")
     ai_feedback = models.TextField(null=True, blank=True, verbose_name="AI建议")
     set_feedback = models.JSONField(null=True, blank=True, verbose_name="每组AI反馈") # [{action_id, set_index, score, is_standard, feedback, errors}]
+    video_analysis = models.JSONField(null=True, blank=True, verbose_name="本地视频分析") # {exercise_type, reps, segments, tempo, range_of_motion, score, ...}
 
     class Meta:
         ordering = ['-start_time']
@@ -76,3 +79,83 @@ class WorkoutLog(models.Model):
         if self.set_index:
             desc += f" (第{self.set_index}组)"
         return f"{desc} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class VideoAnalysisCache(models.Model):
+    """
+    视频分析结果缓存：按上传内容的 SHA-256、模型和提示词版本索引
+    同一视频再次上传时直接返回已保存的训练计划和 GIF，不再压缩、调用模型和生成 GIF
+    """
+    content_hash = models.CharField(max_length=64, verbose_name="视频内容哈希")
+    model = models.CharField(max_length=100, verbose_name="分析模型")
+    prompt_version = models.CharField(max_length=16, verbose_name="提示词版本")
+    workout_data = models.JSONField(verbose_name="分析结果") # 不含 gif_url，命中时按请求地址重新生成
+    gif_files = models.JSONField(default=list, verbose_name="GIF文件") # 与 exercises 一一对应的文件名，生成失败为 null
+    video_size = models.BigIntegerField(default=0, verbose_name="视频大小(字节)")
+    gif_size = models.BigIntegerField(default=0, verbose_name="GIF总大小(字节)")
+    hit_count = models.IntegerField(default=0, verbose_name="命中次数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    last_used_at = models.DateTimeField(auto_now_add=True, verbose_name="最近使用时间")
+
+    class Meta:
+        unique_together = ('content_hash', 'model', 'prompt_version')
+        ordering = ['-last_used_at']
+        verbose_name = "视频分析缓存"
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.model}, {self.prompt_version})"
+
+
+class VideoAnalysisJob(models.Model):
+    """
+    异步视频分析任务：接口保存上传后登记任务，video_worker 进程领取执行并写回阶段和进度
+    """
+    STATUS_CHOICES = [
+        ('queued', '排队中'),
+        ('running', '执行中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name="任务ID")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="状态")
+    stage = models.CharField(max_length=30, default='queued', verbose_name="阶段") # queued/compressing/analyzing/generating_gifs/completed
+    progress = models.FloatField(default=0, verbose_name="进度(%)")
+    video_path = models.CharField(max_length=500, verbose_name="上传视频路径")
+    content_hash = models.CharField(max_length=64, verbose_name="视频内容哈希")
+    video_size = models.BigIntegerField(default=0, verbose_name="视频大小(字节)")
+    media_url = models.CharField(max_length=500, verbose_name="媒体文件地址") # 生成 gif_url 用的 MEDIA_URL 绝对地址
+    result = models.JSONField(null=True, blank=True, verbose_name="分析结果")
+    cached = models.BooleanField(default=False, verbose_name="命中缓存")
+    gif_seconds = models.FloatField(null=True, blank=True, verbose_name="GIF生成耗时(秒)")
+    error = models.TextField(blank=True, default='', verbose_name="错误信息")
+    attempts = models.IntegerField(default=0, verbose_name="执行次数")
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name="执行进程")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="提交时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="最近更新时间")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "视频分析任务"
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return f"{self.job_id} ({self.status}, {self.stage})"
+
+
+class VideoWorker(models.Model):
+    """video_worker 进程的心跳：Web 进程据此判断是否有 worker 在运行，决定异步排队还是在请求内执行"""
+    name = models.CharField(max_length=100, unique=True, verbose_name="进程") # 主机名:pid
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="启动时间")
+    last_seen = models.DateTimeField(verbose_name="最近心跳")
+
+    class Meta:
+        verbose_name = "视频分析 worker"
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,19 @@
+from rest_framework.parsers import BaseParser
+
+
+class RawFrameParser(BaseParser):
+    """
+    读取原始二进制图像帧（JPEG/WebP 字节），不做 base64 编解码
+    request.data 直接是 bytes，交给 cv2.imdecode 解码
+    """
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return b''
+        return stream.read()
+
+
+class ImageFrameParser(RawFrameParser):
+    """以 image/jpeg、image/webp 等 Content-Type 直接上传的图像帧"""
+    media_type = 'image/*'
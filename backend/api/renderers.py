@@ -0,0 +1,71 @@
+import base64
+
+import msgpack
+import numpy as np
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_json_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """orjson / MessagePack 不能直接序列化的类型：numpy 标量、Decimal、惰性翻译字符串等交给 DRF 的 JSONEncoder"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return _json_encoder.default(obj)
+
+
+def _json_default(obj):
+    # JSON 中的二进制字段（如 float32 关键点）以 base64 字符串表示
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode('ascii')
+    return _default(obj)
+
+
+class OrjsonRenderer(BaseRenderer):
+    """
+    基于 orjson 的 JSON 渲染器，输出与 JSONRenderer 相同的 application/json，
+    序列化耗时约为标准库 json 的 1/5~1/10；numpy 数组与标量直接序列化
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack 渲染器（Accept: application/msgpack 或 ?format=msgpack）
+    结构与 JSON 响应相同，体积更小；二进制字段（如 float32 关键点）直接以 bin 类型传输
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """
+    Prometheus 文本格式，供 /api/metrics/ 被抓取时使用
+    视图根据 request.accepted_renderer 直接返回已生成的文本
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # 错误响应等非文本数据
+        return f'# {data}\n'.encode(self.charset)
@@ -10,7 +10,12 @@ urlpatterns = [
     path('', include(router.urls)),
     path('analyze-douyin/', views.analyze_douyin, name='analyze_douyin'),
     path('analyze-pose/', views.analyze_pose, name='analyze_pose'),
+    path('analyze-pose-batch/', views.analyze_pose_batch, name='analyze_pose_batch'),
+    path('rep-session/', views.rep_session, name='rep_session'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('ready/', views.readiness, name='readiness'),
     path('analyze-video/', views.analyze_video_content, name='analyze_video'),
+    path('analyze-video/jobs/<uuid:job_id>/', views.video_analysis_job, name='video_analysis_job'),
     path('evaluate-complete-training/', views.evaluate_complete_training, name='evaluate_complete_training'),
     path('achievements/', views.get_achievements, name='get_achievements'),
     path('muscle-fatigue-stats/', views.get_muscle_fatigue_stats, name='get_muscle_fatigue_stats'),
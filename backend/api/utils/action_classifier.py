@@ -1,172 +1,132 @@
+"""
+动作分类规则引擎
+ACTION_CATEGORIES 只从 action_categories.json 加载一次，并预编译为：
+关键点索引数组、比较符号/阈值数组和可见度检查索引
+单帧或一批帧 (T, 33, 4) 对所有类别的判定都是一次向量化运算
+"""
+import json
+import os
+
 import numpy as np
 
-ACTION_CATEGORIES = {
-    "elbow_dominant": {
-        "name": "Elbow Dominant",
-        "detection_type": "angle",
-        "landmarks": {
-            "point1": "LEFT_SHOULDER",
-            "point2": "LEFT_ELBOW",
-            "point3": "LEFT_WRIST"
-        },
-        "thresholds": {
-            "start_condition": {"operator": "<", "value": 60},
-            "end_condition": {"operator": ">", "value": 140}
-        }
-    },
-    "shoulder_dominant": {
-        "name": "Shoulder Dominant",
-        "detection_type": "height",
-        "landmarks": {
-            "point1": "LEFT_SHOULDER",
-            "point2": "LEFT_WRIST"
-        },
-        "thresholds": {
-            "start_condition": {"operator": "<", "value": -0.2},
-            "end_condition": {"operator": ">", "value": 0.02}
-        }
-    },
-    "knee_dominant": {
-        "name": "Knee Dominant",
-        "detection_type": "angle",
-        "landmarks": {
-            "point1": "LEFT_HIP",
-            "point2": "LEFT_KNEE",
-            "point3": "LEFT_ANKLE"
-        },
-        "thresholds": {
-            "start_condition": {"operator": "<", "value": 90},
-            "end_condition": {"operator": ">", "value": 160}
-        }
-    },
-    "hip_dominant": {
-        "name": "Hip Dominant",
-        "detection_type": "angle",
-        "landmarks": {
-            "point1": "LEFT_SHOULDER",
-            "point2": "LEFT_HIP",
-            "point3": "LEFT_KNEE"
-        },
-        "thresholds": {
-            "start_condition": {"operator": "<", "value": 120},
-            "end_condition": {"operator": ">", "value": 170}
-        }
-    },
-    "core_dominant": {
-        "name": "Core Dominant",
-        "detection_type": "angle",
-        "landmarks": {
-            "point1": "LEFT_SHOULDER",
-            "point2": "LEFT_HIP",
-            "point3": "LEFT_KNEE"
-        },
-        "thresholds": {
-            "start_condition": {"operator": "<", "value": 100},
-            "end_condition": {"operator": ">", "value": 160}
-        }
-    }
-}
-
-def calculate_angle(p1, p2, p3):
-    """计算三点之间的角度"""
-    a = np.array([p1.x, p1.y])
-    b = np.array([p2.x, p2.y])
-    c = np.array([p3.x, p3.y])
-    
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    
-    if angle > 180.0:
-        angle = 360 - angle
-    
-    return angle
-
-def get_landmark(landmarks, name, mp_pose):
-    """根据名称获取 MediaPipe 关键点"""
-    return landmarks[getattr(mp_pose.PoseLandmark, name).value]
-
-def detect_action(category_key, landmarks, mp_pose):
+from .pose_math import LANDMARK_INDEX, angles_from_triples, heights_from_pairs
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), 'action_categories.json')
+
+# 判定结果编码
+STATE_INVISIBLE = 0
+STATE_DOWN = 1
+STATE_UP = 2
+STATE_TRANSITION = 3
+STATE_NAMES = {STATE_INVISIBLE: None, STATE_DOWN: 'DOWN', STATE_UP: 'UP', STATE_TRANSITION: 'TRANSITION'}
+
+# 比较符 -> 符号：sign * (value - threshold) < 0 即满足条件
+_OPERATOR_SIGNS = {'<': 1.0, '>': -1.0}
+
+
+def load_action_categories(path=CATEGORIES_PATH):
+    """读取动作分类配置"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class CompiledActionRules:
+    """
+    预编译的动作判定规则
+    - angle 类型：point1-point2-point3 的夹角
+    - height 类型：point1.y - point2.y（y 越小越高），索引补齐为三元组以便统一做可见度检查
+    start_condition 满足为 DOWN，end_condition 满足为 UP，否则为 TRANSITION
+    """
+
+    def __init__(self, categories):
+        self.keys = tuple(categories)
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.names = [categories[key]['name'] for key in self.keys]
+
+        indices, is_angle = [], []
+        start_sign, start_value, end_sign, end_value = [], [], [], []
+        for key in self.keys:
+            config = categories[key]
+            lms = config['landmarks']
+            angle = config['detection_type'] == 'angle'
+            points = [lms['point1'], lms['point2'], lms['point3'] if angle else lms['point2']]
+            indices.append([LANDMARK_INDEX[name] for name in points])
+            is_angle.append(angle)
+            start = config['thresholds']['start_condition']
+            end = config['thresholds']['end_condition']
+            start_sign.append(_OPERATOR_SIGNS[start['operator']])
+            start_value.append(start['value'])
+            end_sign.append(_OPERATOR_SIGNS[end['operator']])
+            end_value.append(end['value'])
+
+        self.indices = np.array(indices, dtype=np.intp)           # (C, 3)
+        self.is_angle = np.array(is_angle, dtype=bool)            # (C,)
+        self.start_sign = np.array(start_sign, dtype=np.float32)
+        self.start_value = np.array(start_value, dtype=np.float32)
+        self.end_sign = np.array(end_sign, dtype=np.float32)
+        self.end_value = np.array(end_value, dtype=np.float32)
+
+        # 每个类别在 DOWN/UP/TRANSITION 时的提示语
+        self.messages = []
+        for name, angle in zip(self.names, is_angle):
+            down, up = ('动作到位', '准备/起始') if angle else ('准备/起始', '动作到位')
+            self.messages.append({
+                STATE_DOWN: f"{name} {down}",
+                STATE_UP: f"{name} {up}",
+                STATE_TRANSITION: f"{name} 运动中",
+            })
+
+    def measure(self, array, threshold=0.5):
+        """
+        计算所有类别的测量值（角度或高度差）及关键点可见性
+        返回: (values, visible)，形状均为 (..., C)
+        """
+        angles = angles_from_triples(array, self.indices)
+        heights = heights_from_pairs(array, self.indices[:, :2])
+        values = np.where(self.is_angle, angles, heights)
+        visible = np.all(array[..., self.indices, 3] >= threshold, axis=-1)
+        return values, visible
+
+    def classify(self, values, index=slice(None)):
+        """
+        按阈值判定测量值，不做可见度检查
+        values: (..., C)；指定 index 时 values 只包含该类别的测量值
+        """
+        is_start = self.start_sign[index] * (values - self.start_value[index]) < 0
+        is_end = self.end_sign[index] * (values - self.end_value[index]) < 0
+        return np.where(is_start, STATE_DOWN, np.where(is_end, STATE_UP, STATE_TRANSITION))
+
+    def evaluate(self, array, threshold=0.5):
+        """
+        对所有类别判定一帧 (33, 4) 或一批帧 (T, 33, 4)
+        返回: (states, values)，形状均为 (..., C)；关键点不可见时 state 为 STATE_INVISIBLE、value 为 0
+        """
+        values, visible = self.measure(array, threshold)
+        states = np.where(visible, self.classify(values), STATE_INVISIBLE)
+        values = np.where(visible, values, 0.0)
+        return states, values
+
+    def message(self, category_index, state):
+        if state == STATE_INVISIBLE:
+            return "关键点不可见"
+        return self.messages[category_index][state]
+
+
+ACTION_CATEGORIES = load_action_categories()
+ACTION_RULES = CompiledActionRules(ACTION_CATEGORIES)
+
+
+def detect_action(category_key, features):
     """
     通用动作检测函数
+    features: 单帧 PoseFeatures
     返回: (state, value, message)
     """
-    if category_key not in ACTION_CATEGORIES:
+    if category_key not in ACTION_RULES.key_index:
         return None, 0, "未知动作类型"
-    
-    config = ACTION_CATEGORIES[category_key]
-    lms = config['landmarks']
-    thresholds = config['thresholds']
-    
-    try:
-        if config['detection_type'] == 'angle':
-            p1 = get_landmark(landmarks, lms['point1'], mp_pose)
-            p2 = get_landmark(landmarks, lms['point2'], mp_pose)
-            p3 = get_landmark(landmarks, lms['point3'], mp_pose)
-            
-            if p1.visibility < 0.5 or p2.visibility < 0.5 or p3.visibility < 0.5:
-                return None, 0, "关键点不可见"
-            
-            val = calculate_angle(p1, p2, p3)
-            
-            start_cond = thresholds['start_condition']
-            end_cond = thresholds['end_condition']
-            
-            # 这里简单处理 state：start_condition 满足为 DOWN/START，end_condition 满足为 UP/END
-            # 实际上不同的动作可能相反，这里根据 JSON 的逻辑判断
-            
-            is_start = False
-            if start_cond['operator'] == '<':
-                is_start = val < start_cond['value']
-            elif start_cond['operator'] == '>':
-                is_start = val > start_cond['value']
-                
-            is_end = False
-            if end_cond['operator'] == '<':
-                is_end = val < end_cond['value']
-            elif end_cond['operator'] == '>':
-                is_end = val > end_cond['value']
-                
-            if is_start:
-                return "DOWN", val, f"{config['name']} 动作到位"
-            elif is_end:
-                return "UP", val, f"{config['name']} 准备/起始"
-            else:
-                return "TRANSITION", val, f"{config['name']} 运动中"
-
-        elif config['detection_type'] == 'height':
-            p1 = get_landmark(landmarks, lms['point1'], mp_pose)
-            p2 = get_landmark(landmarks, lms['point2'], mp_pose)
-            
-            if p1.visibility < 0.5 or p2.visibility < 0.5:
-                return None, 0, "关键点不可见"
-            
-            # 高度差 (y 坐标越小越高)
-            val = p1.y - p2.y
-            
-            start_cond = thresholds['start_condition']
-            end_cond = thresholds['end_condition']
-            
-            is_start = False
-            if start_cond['operator'] == '<':
-                is_start = val < start_cond['value']
-            elif start_cond['operator'] == '>':
-                is_start = val > start_cond['value']
-                
-            is_end = False
-            if end_cond['operator'] == '<':
-                is_end = val < end_cond['value']
-            elif end_cond['operator'] == '>':
-                is_end = val > end_cond['value']
-                
-            if is_start:
-                return "DOWN", val, f"{config['name']} 准备/起始"
-            elif is_end:
-                return "UP", val, f"{config['name']} 动作到位"
-            else:
-                return "TRANSITION", val, f"{config['name']} 运动中"
-                
-    except Exception as e:
-        return None, 0, f"检测出错: {str(e)}"
-    
-    return "UNKNOWN", 0, "无法判断状态"
 
+    idx = ACTION_RULES.key_index[category_key]
+    states, values = ACTION_RULES.evaluate(features.array)
+    state = int(states[idx])
+    value = float(values[idx]) if state != STATE_INVISIBLE else 0
+    return STATE_NAMES[state], value, ACTION_RULES.message(idx, state)
@@ -0,0 +1,142 @@
+"""
+姿态模型复杂度自适应控制
+根据最近一段推理延迟的 p95 和等待推理的帧数，在 Lite/Full/Heavy (0/1/2) 之间切换：
+- p95 超过目标或有帧排队：降一档
+- p95 低于目标的 upgrade_ratio 倍且没有排队：升一档（更重的模型耗时约为 2~3 倍，需要留足余量）
+每次切换后清空样本，新档位积累满一个窗口后才会再次判断，避免来回抖动；
+每个检测器以某档位的第一次推理包含构建计算图、加载（首次使用时下载）模型，耗时不计入样本
+模型无法加载的档位（Lite/Heavy 首次使用需要联网下载）会被标记为不可用并跳过
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .metrics import metrics
+from .pose_analysis import ModelUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class ComplexityController:
+    def __init__(self, target_p95, levels=(0, 1, 2), initial=1, window=30,
+                 max_queue_depth=1, upgrade_ratio=0.4, enabled=True):
+        self.target_p95 = target_p95
+        self.levels = tuple(sorted(levels))
+        self.default = initial if initial in self.levels else self.levels[0]
+        self.level = self.default
+        self.enabled = enabled
+        self.max_queue_depth = max_queue_depth
+        self.upgrade_ratio = upgrade_ratio
+        self.unavailable = set()
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._thread_levels = threading.local()
+        metrics.set_gauge('pose_model_complexity', self.level)
+
+    def current(self):
+        return self.level if self.enabled else self.default
+
+    def thread_warmed_levels(self):
+        """当前线程已推理过的档位（检测器按线程缓存时使用）"""
+        levels = getattr(self._thread_levels, 'levels', None)
+        if levels is None:
+            levels = self._thread_levels.levels = set()
+        return levels
+
+    def _neighbor(self, step):
+        """当前档位之后（step=1）或之前（step=-1）第一个可用档位，没有返回 None"""
+        idx = self.levels.index(self.level) + step
+        while 0 <= idx < len(self.levels):
+            if self.levels[idx] not in self.unavailable:
+                return self.levels[idx]
+            idx += step
+        return None
+
+    def _switch(self, level, reason):
+        logger.info('模型复杂度 %d -> %d（%s）', self.level, level, reason)
+        self.level = level
+        self._samples.clear()
+        metrics.inc('pose_complexity_switches')
+        metrics.set_gauge('pose_model_complexity', level)
+
+    def record(self, level, seconds, queue_depth=0):
+        """记录一次推理的延迟；只统计当前档位的样本"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if level != self.level:
+                return
+            self._samples.append(seconds)
+            if len(self._samples) < self._samples.maxlen:
+                return
+            p95 = float(np.percentile(self._samples, 95))
+            if p95 > self.target_p95 or queue_depth > self.max_queue_depth:
+                lower = self._neighbor(-1)
+                if lower is not None:
+                    self._switch(lower, f'p95 {p95 * 1000:.1f}ms，排队 {queue_depth}')
+            elif p95 < self.target_p95 * self.upgrade_ratio and queue_depth == 0:
+                higher = self._neighbor(1)
+                if higher is not None:
+                    self._switch(higher, f'p95 {p95 * 1000:.1f}ms，有余量')
+
+    def mark_unavailable(self, level, reason=''):
+        """档位的模型无法加载：以后跳过该档位，当前处于该档位时回到默认档位"""
+        with self._lock:
+            if level in self.unavailable:
+                return
+            logger.warning('模型复杂度 %d 不可用，已跳过: %s', level, reason)
+            self.unavailable.add(level)
+            if self.level == level:
+                self._switch(self.default, '模型不可用')
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_complexity_controller():
+    """按 settings 创建的全局控制器"""
+    global _controller
+    if _controller is not None:
+        return _controller
+    from django.conf import settings
+    with _controller_lock:
+        if _controller is None:
+            _controller = ComplexityController(
+                target_p95=getattr(settings, 'POSE_LATENCY_TARGET_MS', 150) / 1000,
+                levels=getattr(settings, 'POSE_MODEL_COMPLEXITY_LEVELS', (0, 1, 2)),
+                initial=getattr(settings, 'POSE_POOL_MODEL_COMPLEXITY', 1),
+                enabled=getattr(settings, 'POSE_ADAPTIVE_COMPLEXITY', True),
+            )
+    return _controller
+
+
+def run_with_complexity(controller, fn, queue_depth=0, warmed=None):
+    """
+    以控制器当前档位执行 fn(model_complexity)，并记录推理延迟
+    当前档位模型不可用时标记后退回默认档位重试
+    warmed 为执行 fn 的检测器已推理过的档位集合（默认按当前线程），不在其中的档位本次耗时包含检测器构建，不计入样本
+    返回 (fn 的结果, 实际使用的档位, 耗时秒数)
+    """
+    if warmed is None:
+        warmed = controller.thread_warmed_levels()
+    level = controller.current()
+    start = time.perf_counter()
+    try:
+        result = fn(level)
+    except ModelUnavailable as e:
+        if level == controller.default:
+            raise
+        controller.mark_unavailable(level, e.reason)
+        level = controller.default
+        start = time.perf_counter()
+        result = fn(level)
+    duration = time.perf_counter() - start
+    if level in warmed:
+        controller.record(level, duration, queue_depth)
+    else:
+        warmed.add(level)
+    return result, level, duration
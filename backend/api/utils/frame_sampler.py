@@ -0,0 +1,139 @@
+"""
+视频抽帧
+cv2.VideoCapture.read() = grab()（解复用并解码）+ retrieve()（转换为 BGR 并拷贝）。
+按帧率或步长抽帧时，跳过的帧只 grab() 不 retrieve()，省去像素格式转换与拷贝；
+只需要一段时间范围时先跳转到起点附近的关键点再向后读取，不解码起点之前的帧。
+（逐帧 seek 到每个采样点需要从前一个关键帧重新解码，关键帧间隔较长时反而更慢，因此只在起点 seek）
+多个时间段（每个动作的 GIF）用 sample_segments 在一次打开、按时间顺序的读取中完成，每帧只解码、缩放一次
+视频压缩的 OpenCV 回退路径、GIF 生成和训练视频的本地姿态分析共用
+"""
+import cv2
+
+# 两个时间段之间的间隔超过该秒数时跳转，否则继续 grab() 读过去
+# 跳转要从前一个关键帧重新解码（x264 默认关键帧间隔 250 帧，30fps 下约 8 秒），间隔较短时直接读取更快
+SEEK_GAP_SECONDS = 10.0
+
+
+def video_info(video_path):
+    """返回 (fps, frame_count, width, height)；fps 读取失败时按 30 处理"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return (
+            cap.get(cv2.CAP_PROP_FPS) or 30.0,
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+    finally:
+        cap.release()
+
+
+def resize_frame(frame, width=None, max_side=None):
+    """按目标宽度（保持比例）或长边上限缩小；不放大"""
+    height, frame_width = frame.shape[:2]
+    if width:
+        scale = width / frame_width
+    elif max_side:
+        scale = max_side / max(height, frame_width)
+    else:
+        return frame
+    if scale >= 1 and not width:
+        return frame
+    size = (max(int(frame_width * scale), 1), max(int(height * scale), 1))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(frame, size, interpolation=interpolation)
+
+
+def sample_frames(video_path, fps=None, stride=None, start=0.0, end=None,
+                  width=None, max_side=None, rgb=False):
+    """
+    流式抽帧，产出 (frame_index, timestamp, image)
+    - fps：目标帧率（按时间均匀抽取，源帧率不是整数倍时也不会累积误差）；stride：每 stride 帧取一帧；都不指定时取全部帧
+    - start / end：时间范围（秒），start > 0 时先跳转
+    - width / max_side：缩放到目标宽度或长边上限；rgb=True 时转换为 RGB
+    视频无法打开时抛出 IOError
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f'Could not open video file: {video_path}')
+    try:
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_index = 0
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+            frame_index = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        interval = source_fps / fps if fps else max(int(stride or 1), 1)
+        next_pick = float(frame_index)
+
+        while cap.grab():
+            timestamp = frame_index / source_fps
+            if end is not None and timestamp >= end:
+                break
+            if frame_index >= next_pick - 1e-6 and timestamp >= start:
+                next_pick = max(next_pick, frame_index) + interval
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                frame = resize_frame(frame, width=width, max_side=max_side)
+                if rgb:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                yield frame_index, timestamp, frame
+            frame_index += 1
+    finally:
+        cap.release()
+
+
+def merge_ranges(ranges, gap=SEEK_GAP_SECONDS):
+    """
+    把 (start, end) 区间按起点排序，重叠或间隔不超过 gap 秒的合并
+    返回 [(start, end, [原区间序号, ...]), ...]
+    """
+    spans = []
+    for index in sorted(range(len(ranges)), key=lambda i: ranges[i][0]):
+        start, end = ranges[index]
+        if spans and start - spans[-1][1] <= gap:
+            spans[-1][1] = max(spans[-1][1], end)
+            spans[-1][2].append(index)
+        else:
+            spans.append([start, end, [index]])
+    return [tuple(span) for span in spans]
+
+
+def sample_segments(video_path, segments, fps, width=None, max_side=None, rgb=False, seek_gap=SEEK_GAP_SECONDS):
+    """
+    一次打开视频，按时间顺序读取多个时间段，产出 (timestamp, image, [所属时间段序号, ...])
+    - segments：[(start, end), ...]（秒），可以重叠、无序；重叠部分的帧只解码一次，同时属于多个时间段
+    - 相距超过 seek_gap 秒的时间段之间跳转，不在任何时间段内的帧只 grab() 不转换
+    - fps / width / max_side / rgb 与 sample_frames 相同；同一连续区域内按统一的时间网格抽帧
+    视频无法打开时抛出 IOError
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f'Could not open video file: {video_path}')
+    try:
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        interval = source_fps / fps
+        frame_index = 0
+        for span_start, span_end, members in merge_ranges(segments, seek_gap):
+            if span_start - frame_index / source_fps > seek_gap:
+                cap.set(cv2.CAP_PROP_POS_MSEC, span_start * 1000)
+                frame_index = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+            next_pick = max(float(frame_index), span_start * source_fps)
+            while frame_index / source_fps < span_end:
+                if not cap.grab():
+                    return
+                timestamp = frame_index / source_fps
+                if frame_index >= next_pick - 1e-6:
+                    next_pick = max(next_pick, frame_index) + interval
+                    active = [i for i in members if segments[i][0] <= timestamp < segments[i][1]]
+                    if active:
+                        ok, frame = cap.retrieve()
+                        if not ok:
+                            return
+                        frame = resize_frame(frame, width=width, max_side=max_side)
+                        if rgb:
+                            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                        yield timestamp, frame, active
+                frame_index += 1
+    finally:
+        cap.release()
@@ -0,0 +1,91 @@
+"""
+按客户端调度姿态推理：每个客户端同一时间只跑一帧推理，最多保留一帧待处理
+推理期间到达的新帧会取代尚未开始的旧帧（latest-frame-wins），被取代的请求立即返回
+这样当推理速度跟不上客户端帧率时，反馈延迟最多为两次推理时间，而不会在 WSGI 线程中无限排队
+"""
+import threading
+import time
+
+
+class FrameSuperseded(Exception):
+    """等待中的帧被同一客户端更新的帧取代"""
+
+    def __init__(self, dropped_frames):
+        super().__init__('帧已被更新的帧取代')
+        self.dropped_frames = dropped_frames
+
+
+class _ClientSlot:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.busy = False
+        self.latest_ticket = 0
+        self.dropped_frames = 0
+        self.last_seen = time.monotonic()
+
+
+class LatestFrameScheduler:
+    """
+    用法：
+        result, dropped = scheduler.run(client_id, lambda: detector.process(image))
+    被取代的调用会抛出 FrameSuperseded
+    """
+
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._waiting = 0
+
+    @property
+    def queue_depth(self):
+        """当前所有客户端中等待推理（尚未开始）的帧数"""
+        return self._waiting
+
+    def _add_waiting(self, delta):
+        with self._lock:
+            self._waiting += delta
+
+    def _get_slot(self, client_id):
+        now = time.monotonic()
+        with self._lock:
+            slot = self._slots.get(client_id)
+            if slot is None:
+                # 新客户端到来时顺便清理长时间不活跃的客户端
+                for key in [k for k, s in self._slots.items()
+                            if not s.busy and now - s.last_seen > self.idle_timeout]:
+                    del self._slots[key]
+                slot = self._slots[client_id] = _ClientSlot()
+            slot.last_seen = now
+            return slot
+
+    def run(self, client_id, fn):
+        """执行 fn；返回 (fn 的结果, 该客户端累计丢弃帧数)"""
+        slot = self._get_slot(client_id)
+        self._add_waiting(1)
+        try:
+            with slot.cond:
+                slot.latest_ticket += 1
+                ticket = slot.latest_ticket
+                # 唤醒之前等待的帧，让它们发现自己已被取代
+                slot.cond.notify_all()
+                while slot.busy and slot.latest_ticket == ticket:
+                    slot.cond.wait()
+                if slot.latest_ticket != ticket:
+                    slot.dropped_frames += 1
+                    raise FrameSuperseded(slot.dropped_frames)
+                slot.busy = True
+        finally:
+            self._add_waiting(-1)
+
+        try:
+            result = fn()
+        finally:
+            with slot.cond:
+                slot.busy = False
+                slot.cond.notify_all()
+        return result, slot.dropped_frames
+
+
+# 进程内共享的姿态推理调度器
+pose_scheduler = LatestFrameScheduler()
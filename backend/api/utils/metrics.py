@@ -0,0 +1,124 @@
+"""
+进程内性能指标
+- LatencyHistogram：固定对数分桶的延迟直方图，记录成本为一次二分查找，p50/p95/p99 由分桶插值得到
+- MetricsRegistry：按名称管理直方图、计数器和瞬时值 (gauge)，可导出为 JSON 快照或 Prometheus 文本格式
+姿态分析热路径只调用 observe / inc，不再逐帧打印日志
+"""
+import bisect
+import threading
+import time
+
+# 延迟分桶上界（秒）：0.5ms ~ 约 33s，每档 ×1.5
+LATENCY_BUCKETS = tuple(0.0005 * 1.5 ** i for i in range(28))
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 最后一档为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """按分桶线性插值估算分位数（秒）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[idx - 1] if idx > 0 else 0.0
+                upper = self.buckets[idx] if idx < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self):
+        """毫秒为单位的统计"""
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+        return {
+            'count': self.count,
+            'mean': ms(self.sum / self.count) if self.count else None,
+            'p50': ms(self.percentile(0.5)),
+            'p95': ms(self.percentile(0.95)),
+            'p99': ms(self.percentile(0.99)),
+            'max': ms(self.max) if self.count else None,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, prefix='workout'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        """计数器加 amount，返回新值"""
+        with self._lock:
+            value = self._counters[name] = self._counters.get(name, 0) + amount
+            return value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def counter(self, name):
+        return self._counters.get(name, 0)
+
+    def ratio(self, numerator, denominator):
+        total = self.counter(denominator)
+        return round(self.counter(numerator) / total, 4) if total else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'latency_ms': {name: h.snapshot() for name, h in self._histograms.items()},
+            }
+
+    def render_prometheus(self):
+        """Prometheus 文本格式（counter、gauge 与 histogram）"""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._counters.items()):
+                metric = f'{self.prefix}_{name}_total'
+                lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+            for name, value in sorted(self._gauges.items()):
+                metric = f'{self.prefix}_{name}'
+                lines += [f'# TYPE {metric} gauge', f'{metric} {value}']
+            for name, histogram in sorted(self._histograms.items()):
+                metric = f'{self.prefix}_{name}_seconds'
+                lines.append(f'# TYPE {metric} histogram')
+                cumulative = 0
+                for upper, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{upper:.6g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum {histogram.sum:.6f}')
+                lines.append(f'{metric}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的指标注册表
+metrics = MetricsRegistry()
@@ -0,0 +1,199 @@
+"""
+姿态分析工具：MediaPipe 检测器管理、图像解码以及检测结果的整理（动作判定见 pose_detectors）
+HTTP 接口 (views.analyze_pose) 与 WebSocket 会话 (consumers.PoseSessionConsumer) 共用
+"""
+import logging
+import threading
+import cv2
+import mediapipe as mp
+import numpy as np
+from .pose_detectors import get_detector
+from .pose_math import PoseFeatures, results_to_array
+
+logger = logging.getLogger(__name__)
+
+# 初始化 MediaPipe 模块
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+# 使用线程局部存储，确保多线程环境下的安全性
+thread_local = threading.local()
+
+
+class ModelUnavailable(Exception):
+    """指定复杂度的模型无法加载（Lite/Heavy 模型首次使用时需要联网下载）"""
+
+    def __init__(self, model_complexity, reason=''):
+        super().__init__(model_complexity, reason)
+        self.model_complexity = model_complexity
+        self.reason = reason
+
+    def __str__(self):
+        return f'model_complexity={self.model_complexity} 的模型不可用: {self.reason}'
+
+
+def create_pose_detector(static_image_mode=True, model_complexity=1):
+    """
+    创建 Pose 检测器实例
+    static_image_mode=False 为跟踪模式：利用上一帧结果，适合连续视频流
+    模型文件无法加载时抛出 ModelUnavailable
+    """
+    # model_complexity: 0=Lite, 1=Full, 2=Heavy. 
+    # 实时应用建议使用 0 或 1。此处改为 1 平衡速度与精度。
+    try:
+        return mp_pose.Pose(
+            static_image_mode=static_image_mode,
+            model_complexity=model_complexity,
+            enable_segmentation=False,
+            min_detection_confidence=0.3 # 降低置信度阈值，提高检出率
+        )
+    except Exception as e:
+        raise ModelUnavailable(model_complexity, str(e)) from e
+
+
+def get_pose_detector(model_complexity=1):
+    """获取当前线程指定复杂度的 Pose 检测器实例"""
+    detectors = getattr(thread_local, 'pose_detectors', None)
+    if detectors is None:
+        detectors = thread_local.pose_detectors = {}
+    if model_complexity not in detectors:
+        detectors[model_complexity] = create_pose_detector(model_complexity=model_complexity)
+    return detectors[model_complexity]
+
+
+def get_tracking_detector(model_complexity=1):
+    """
+    获取当前线程指定复杂度的跟踪模式 (static_image_mode=False) 检测器
+    检测器在多批帧之间复用以省去模型加载；处理新的帧序列前需调用 reset() 清除上一序列的跟踪状态
+    """
+    detectors = getattr(thread_local, 'tracking_detectors', None)
+    if detectors is None:
+        detectors = thread_local.tracking_detectors = {}
+    if model_complexity not in detectors:
+        detectors[model_complexity] = create_pose_detector(
+            static_image_mode=False, model_complexity=model_complexity
+        )
+    return detectors[model_complexity]
+
+
+# 响应模式：none 只返回状态与反馈；landmarks 额外返回关键点与关节角度；jpeg 额外返回图像
+RETURN_IMAGE_MODES = ('none', 'landmarks', 'jpeg')
+
+# 关键点格式：list 为嵌套列表；float32 为固定布局的二进制：33 x [x, y, z, visibility] 小端 float32，
+# 共 528 字节，MessagePack 响应中为 bin 类型，JSON 响应中为 base64 字符串
+LANDMARK_FORMATS = ('list', 'float32')
+
+
+def pack_landmarks(array):
+    """将 (33, 4) 关键点数组打包为 float32 小端字节（行优先）"""
+    return np.ascontiguousarray(array, dtype='<f4').tobytes()
+
+
+def serialize_landmarks(array):
+    """将 (33, 4) 关键点数组转换为 [x, y, z, visibility] 列表（归一化坐标）"""
+    out = np.round(array.astype(np.float64), 4)
+    out[:, 3] = np.round(array[:, 3].astype(np.float64), 3)
+    return out.tolist()
+
+
+# IMREAD_REDUCED_* 对 JPEG 在 DCT 阶段直接按 1/2、1/4、1/8 解码，比整幅解码后再缩小省时省内存
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# 带尺寸信息的 JPEG 帧起始标记 (SOF0~SOF15，不含 DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(image_bytes):
+    """只解析 JPEG 头部得到 (width, height)，不是 JPEG 或解析失败返回 None"""
+    if image_bytes[:2] != b'\xff\xd8':
+        return None
+    i, n = 2, len(image_bytes)
+    while i + 9 < n:
+        if image_bytes[i] != 0xFF:
+            i += 1
+            continue
+        marker = image_bytes[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # 填充字节或无长度字段的标记
+            i += 1 if marker == 0xFF else 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(image_bytes[i + 5:i + 7], 'big')
+            width = int.from_bytes(image_bytes[i + 7:i + 9], 'big')
+            return (width, height) if width and height else None
+        i += 2 + int.from_bytes(image_bytes[i + 2:i + 4], 'big')
+    return None
+
+
+def decode_frame(image_bytes, max_side=None):
+    """
+    将 JPEG/WebP 字节解码为 BGR 图像
+    max_side 指定时把长边缩小到不超过 max_side：JPEG 先按 1/2~1/8 降采样解码，剩余部分解码后再缩放
+    关键点是归一化坐标，缩小输入不影响返回结果的坐标系
+    返回: (image, scale)，scale 为解码后长边 / 原始长边；解码失败时 image 为 None
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    flag = cv2.IMREAD_COLOR
+    original_side = None
+    if max_side:
+        size = jpeg_size(image_bytes)
+        if size is not None:
+            original_side = max(size)
+            for factor, reduced_flag in _REDUCED_DECODE_FLAGS:
+                if original_side / factor >= max_side:
+                    flag = reduced_flag
+                    break
+
+    image = cv2.imdecode(nparr, flag)
+    if image is None:
+        return None, 1.0
+    height, width = image.shape[:2]
+    original_side = original_side or max(height, width)
+    if max_side and max(height, width) > max_side:
+        ratio = max_side / max(height, width)
+        # 降采样解码后剩余的缩放比例不超过 2 倍时用双线性插值，比 INTER_AREA 的非整数比例快得多
+        interpolation = cv2.INTER_LINEAR if ratio > 0.5 else cv2.INTER_AREA
+        image = cv2.resize(image, (max(int(width * ratio), 1), max(int(height * ratio), 1)),
+                           interpolation=interpolation)
+    return image, max(image.shape[:2]) / original_side
+
+
+def build_pose_result(results, exercise_type, image_shape, include_landmarks=False, landmark_format='list'):
+    """
+    将 MediaPipe 检测结果整理为接口返回的数据
+    include_landmarks=True 时附带 33 个关键点与关节角度，landmark_format 见 LANDMARK_FORMATS
+    """
+    feedback = []
+    pose_state = "UNKNOWN"
+    pose_angle = 0
+    landmarks_data = None
+    joint_angles = None
+
+    # 检测是否检测到人体；关键点只转换一次，检测器需要的关节角度在一次批量运算中得到
+    array = results_to_array(results)
+    if array is not None:
+        detector = get_detector(exercise_type)
+        logger.debug('检测到人体姿态，使用检测器: %s', detector.key)
+        features = PoseFeatures(array, joints=None if include_landmarks else detector.joints)
+        if include_landmarks:
+            landmarks_data = pack_landmarks(array) if landmark_format == 'float32' else serialize_landmarks(array)
+            joint_angles = features.joint_angles()
+        pose_state, pose_angle, feedback = detector.detect(features, image_shape)
+    else:
+        logger.debug('未检测到人体姿态')
+        feedback.append({'type': 'warning', 'message': '未检测到人体，请调整站位'})
+
+    data = {
+        'feedback': feedback,
+        'landmarks_detected': array is not None,
+        'pose_state': pose_state,
+        'pose_angle': pose_angle,
+        'exercise_type': exercise_type
+    }
+    if include_landmarks:
+        data['landmarks'] = landmarks_data
+        data['joint_angles'] = joint_angles
+    return data
@@ -0,0 +1,312 @@
+"""
+动作检测器注册表
+每种 exercise_type 对应一个检测器对象，统一接口：
+- joints / landmarks：声明需要的关节角度与关键点，服务端只计算这些关节
+- detect(features, image_shape)：单帧判定，返回 (pose_state, pose_angle, feedback)
+- detect_batch(features)：对 (T, 33, 4) 批量判定，返回 (states, values)，state 编码见 action_classifier.STATE_*
+- rep_phases：(起始状态, 结束状态)，从起始状态到达结束状态计一次，None 表示不支持计数
+支持计数的检测器继承 RepCountingMixin，detect_batch 由 measure_batch（测量值与可见性）和
+classify_values（按阈值判定）组成，计数器可直接对客户端上传的测量值判定
+新增动作类型只需定义检测器并用 register_detector 注册，无需修改视图
+"""
+import logging
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .action_classifier import (
+    ACTION_RULES, STATE_INVISIBLE, STATE_DOWN, STATE_UP, STATE_TRANSITION, detect_action,
+)
+from .pose_math import JOINT_TRIPLES, HEIGHT_PAIRS, LANDMARK_NAMES
+
+logger = logging.getLogger(__name__)
+
+DETECTORS = {}
+
+
+def register_detector(detector):
+    """注册检测器实例（可作为类装饰器使用，自动实例化）"""
+    if isinstance(detector, type):
+        register_detector(detector())
+        return detector
+    DETECTORS[detector.key] = detector
+    return detector
+
+
+def get_detector(exercise_type):
+    """按动作类型获取检测器，未注册的类型使用通用姿态质量分析"""
+    return DETECTORS.get(exercise_type, DETECTORS['general'])
+
+
+def _classify(values, up_above, down_below, up_state=STATE_UP, down_state=STATE_DOWN):
+    """values > up_above 为 up_state，values < down_below 为 down_state，其余为 TRANSITION"""
+    return np.where(values > up_above, up_state,
+                    np.where(values < down_below, down_state, STATE_TRANSITION))
+
+
+class PoseDetector(ABC):
+    """检测器基类：子类实现 detect_frame 与 detect_batch；支持计数的检测器另见 RepCountingMixin"""
+    key = None
+    joints = ()
+    heights = ()
+    extra_landmarks = ()
+    rep_phases = None
+
+    @property
+    def landmarks(self):
+        """检测器用到的全部关键点名称"""
+        names = set(self.extra_landmarks)
+        for joint in self.joints:
+            names.update(JOINT_TRIPLES[joint])
+        for height in self.heights:
+            names.update(HEIGHT_PAIRS[height])
+        return tuple(name for name in LANDMARK_NAMES if name in names)
+
+    @abstractmethod
+    def detect_frame(self, features):
+        """单帧判定，返回 (state, value, message)；state 为 None 表示无法判定"""
+
+    @abstractmethod
+    def detect_batch(self, features):
+        """批量判定，返回 (states, values)，形状均为 (T,)"""
+
+    def detect(self, features, image_shape):
+        """单帧判定并整理为接口反馈，返回 (pose_state, pose_angle, feedback)"""
+        state, value, msg = self.detect_frame(features)
+        if state:
+            logger.debug('动作检测成功 - 状态: %s, 角度: %.2f°, 消息: %s', state, value, msg)
+            return state, value, [{'type': 'info', 'message': msg}]
+        logger.debug('动作检测失败 - 消息: %s', msg)
+        return "UNKNOWN", 0, [{'type': 'warning', 'message': msg}]
+
+
+class RepCountingMixin(ABC):
+    """
+    可计数检测器：子类实现 measure_batch 与 classify_values，detect_batch 由两者组成
+    用法：class XxxDetector(RepCountingMixin, PoseDetector)
+    """
+    rep_phases = (STATE_DOWN, STATE_UP)
+
+    @abstractmethod
+    def measure_batch(self, features):
+        """批量计算测量值（角度或高度差），返回 (values, visible)，形状均为 (T,)"""
+
+    @abstractmethod
+    def classify_values(self, values):
+        """按阈值判定测量值，返回 states"""
+
+    def detect_batch(self, features):
+        values, visible = self.measure_batch(features)
+        states = self.classify_values(values)
+        return np.where(visible, states, STATE_INVISIBLE), np.where(visible, values, 0.0)
+
+
+class ActionCategoryDetector(RepCountingMixin, PoseDetector):
+    """ACTION_CATEGORIES 中的通用动作类别，使用预编译规则"""
+
+    def __init__(self, key):
+        self.key = key
+        self.index = ACTION_RULES.key_index[key]
+        self.extra_landmarks = tuple(LANDMARK_NAMES[i] for i in ACTION_RULES.indices[self.index])
+
+    def detect_frame(self, features):
+        return detect_action(self.key, features)
+
+    def measure_batch(self, features):
+        values, visible = ACTION_RULES.measure(features.array)
+        return values[..., self.index], visible[..., self.index]
+
+    def classify_values(self, values):
+        return ACTION_RULES.classify(values, self.index)
+
+
+for _key in ACTION_RULES.keys:
+    register_detector(ActionCategoryDetector(_key))
+
+
+@register_detector
+class SquatDetector(RepCountingMixin, PoseDetector):
+    """
+    深蹲：左右膝角度平均值
+    state: 'UP' (站立), 'DOWN' (下蹲)
+    """
+    key = 'squat'
+    joints = ('left_knee', 'right_knee')
+
+    def detect_frame(self, features):
+        # 确保关键点可见
+        if not features.joint_visible('left_knee', inclusive=True):
+            return None, 0, "未检测到完整的腿部，请调整站位"
+
+        avg_angle = float(features.angle('left_knee') + features.angle('right_knee')) / 2
+        if avg_angle > 150:
+            return "UP", avg_angle, "站立准备"
+        elif avg_angle < 130:
+            return "DOWN", avg_angle, "下蹲到位"
+        return "TRANSITION", avg_angle, "动作进行中"
+
+    def measure_batch(self, features):
+        visible = features.joint_visible('left_knee', inclusive=True)
+        values = (features.angle('left_knee') + features.angle('right_knee')) / 2
+        return values, visible
+
+    def classify_values(self, values):
+        return _classify(values, 150, 130)
+
+
+@register_detector
+class CurlDetector(RepCountingMixin, PoseDetector):
+    """
+    哑铃弯举：优先检测右臂，右臂不可见时检测左臂
+    state: 'DOWN' (放下), 'UP' (举起)
+    """
+    key = 'curl'
+    joints = ('left_elbow', 'right_elbow')
+    # 举起后放下计一次
+    rep_phases = (STATE_UP, STATE_DOWN)
+
+    def detect_frame(self, features):
+        if features.joint_visible('right_elbow'):
+            angle = float(features.angle('right_elbow'))
+        elif features.joint_visible('left_elbow'):
+            angle = float(features.angle('left_elbow'))
+        else:
+            return None, 0, "未检测到手臂"
+
+        if angle > 145:
+            return "DOWN", angle, "手臂已放下"
+        elif angle < 85: # 放宽判定，小于85度即算到位
+            return "UP", angle, "弯举到位"
+        return "TRANSITION", angle, "弯举中"
+
+    def measure_batch(self, features):
+        right = features.joint_visible('right_elbow')
+        left = features.joint_visible('left_elbow')
+        values = np.where(right, features.angle('right_elbow'), features.angle('left_elbow'))
+        return values, right | left
+
+    def classify_values(self, values):
+        return _classify(values, 145, 85, up_state=STATE_DOWN, down_state=STATE_UP)
+
+
+@register_detector
+class PressDetector(RepCountingMixin, PoseDetector):
+    """
+    哑铃推肩：手腕高于肩膀的手臂取肘角平均值
+    state: 'DOWN' (放下/准备), 'UP' (推起)
+    """
+    key = 'press'
+    joints = ('left_elbow', 'right_elbow')
+    heights = ('left_shoulder_wrist', 'right_shoulder_wrist')
+
+    def detect_frame(self, features):
+        left_visible = features.joint_visible('left_elbow')
+        right_visible = features.joint_visible('right_elbow')
+        if not left_visible and not right_visible:
+            return None, 0, "未检测到手臂"
+
+        # 关键判定：手腕必须高于肩膀 (y坐标更小，即 肩膀y - 手腕y > 0)
+        # 如果手腕低于肩膀，说明手臂是垂下的，不是推肩姿势
+        angles = []
+        if left_visible and features.height('left_shoulder_wrist') > 0:
+            angles.append(float(features.angle('left_elbow')))
+        if right_visible and features.height('right_shoulder_wrist') > 0:
+            angles.append(float(features.angle('right_elbow')))
+        if not angles:
+            return None, 0, "请举起双手至肩部以上"
+
+        avg_angle = sum(angles) / len(angles)
+        if avg_angle > 150:
+            return "UP", avg_angle, "推举到位"
+        elif avg_angle < 100:
+            return "DOWN", avg_angle, "下放到位"
+        return "TRANSITION", avg_angle, "发力中"
+
+    def measure_batch(self, features):
+        left = features.joint_visible('left_elbow') & (features.height('left_shoulder_wrist') > 0)
+        right = features.joint_visible('right_elbow') & (features.height('right_shoulder_wrist') > 0)
+        count = left.astype(np.float32) + right
+        total = np.where(left, features.angle('left_elbow'), 0.0) + np.where(right, features.angle('right_elbow'), 0.0)
+        return total / np.maximum(count, 1), count > 0
+
+    def classify_values(self, values):
+        return _classify(values, 150, 100)
+
+
+@register_detector
+class GeneralDetector(PoseDetector):
+    """通用姿态质量分析：给出手臂、腿部伸直程度和身体平衡的反馈，没有动作状态"""
+    key = 'general'
+    joints = ('left_elbow', 'right_elbow', 'left_knee', 'right_knee')
+    heights = ('shoulder_level', 'hip_level')
+
+    def detect(self, features, image_shape):
+        feedback = self.analyze_quality(features)
+        logger.debug('通用分析完成，反馈数量: %d', len(feedback))
+        return "UNKNOWN", 0, feedback
+
+    def detect_frame(self, features):
+        return None, 0, "通用分析没有动作状态"
+
+    def detect_batch(self, features):
+        shape = features.array.shape[:-2]
+        return np.full(shape, STATE_INVISIBLE), np.zeros(shape)
+
+    def analyze_quality(self, features):
+        feedback = []
+
+        # 分析左右臂角度
+        for side, side_name in (('left', '左'), ('right', '右')):
+            joint = f'{side}_elbow'
+            if features.joint_visible(joint):
+                arm_angle = features.angle(joint)
+                if arm_angle < 150:
+                    feedback.append({
+                        'type': 'warning',
+                        'message': f'{side_name}臂可以更伸直一些',
+                        'body_part': f'{side}_arm'
+                    })
+                elif arm_angle > 180:
+                    feedback.append({
+                        'type': 'info',
+                        'message': f'{side_name}臂姿势良好',
+                        'body_part': f'{side}_arm'
+                    })
+
+        # 分析左右腿角度
+        for side, side_name in (('left', '左'), ('right', '右')):
+            joint = f'{side}_knee'
+            if features.joint_visible(joint) and features.angle(joint) < 150:
+                feedback.append({
+                    'type': 'warning',
+                    'message': f'{side_name}腿可以更伸直一些',
+                    'body_part': f'{side}_leg'
+                })
+
+        # 分析身体平衡
+        if all(features.visibility(name) > 0.5 for name in
+               ('LEFT_SHOULDER', 'RIGHT_SHOULDER', 'LEFT_HIP', 'RIGHT_HIP')):
+            shoulder_diff = abs(features.height('shoulder_level'))
+            hip_diff = abs(features.height('hip_level'))
+
+            if shoulder_diff > 0.05 or hip_diff > 0.05:
+                feedback.append({
+                    'type': 'warning',
+                    'message': '注意保持身体平衡，肩膀和髋部应该在同一水平线上',
+                    'body_part': 'balance'
+                })
+            else:
+                feedback.append({
+                    'type': 'success',
+                    'message': '身体平衡良好',
+                    'body_part': 'balance'
+                })
+
+        if not feedback:
+            feedback.append({
+                'type': 'info',
+                'message': '姿态检测正常，继续保持',
+                'body_part': 'general'
+            })
+
+        return feedback
@@ -0,0 +1,132 @@
+"""
+姿态数学计算
+MediaPipe 关键点一次性转换为 (33, 4) float32 数组 [x, y, z, visibility]，
+所有关节角度、高度差在一次批量 NumPy 运算中得到；同样接受 (T, 33, 4) 的整段录像数组
+"""
+import numpy as np
+
+# MediaPipe PoseLandmark 的 33 个关键点（顺序即索引）
+LANDMARK_NAMES = (
+    'NOSE', 'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER',
+    'RIGHT_EYE_INNER', 'RIGHT_EYE', 'RIGHT_EYE_OUTER',
+    'LEFT_EAR', 'RIGHT_EAR', 'MOUTH_LEFT', 'MOUTH_RIGHT',
+    'LEFT_SHOULDER', 'RIGHT_SHOULDER', 'LEFT_ELBOW', 'RIGHT_ELBOW',
+    'LEFT_WRIST', 'RIGHT_WRIST', 'LEFT_PINKY', 'RIGHT_PINKY',
+    'LEFT_INDEX', 'RIGHT_INDEX', 'LEFT_THUMB', 'RIGHT_THUMB',
+    'LEFT_HIP', 'RIGHT_HIP', 'LEFT_KNEE', 'RIGHT_KNEE',
+    'LEFT_ANKLE', 'RIGHT_ANKLE', 'LEFT_HEEL', 'RIGHT_HEEL',
+    'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX',
+)
+LANDMARK_INDEX = {name: idx for idx, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+# 关节角度：关节名 -> (端点1, 顶点, 端点2)
+JOINT_TRIPLES = {
+    'left_elbow': ('LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST'),
+    'right_elbow': ('RIGHT_SHOULDER', 'RIGHT_ELBOW', 'RIGHT_WRIST'),
+    'left_shoulder': ('LEFT_ELBOW', 'LEFT_SHOULDER', 'LEFT_HIP'),
+    'right_shoulder': ('RIGHT_ELBOW', 'RIGHT_SHOULDER', 'RIGHT_HIP'),
+    'left_hip': ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE'),
+    'right_hip': ('RIGHT_SHOULDER', 'RIGHT_HIP', 'RIGHT_KNEE'),
+    'left_knee': ('LEFT_HIP', 'LEFT_KNEE', 'LEFT_ANKLE'),
+    'right_knee': ('RIGHT_HIP', 'RIGHT_KNEE', 'RIGHT_ANKLE'),
+}
+JOINT_NAMES = tuple(JOINT_TRIPLES)
+JOINT_INDEX = {name: idx for idx, name in enumerate(JOINT_NAMES)}
+
+# 高度差：名称 -> (关键点1, 关键点2)，值为 y1 - y2（y 越小越高）
+HEIGHT_PAIRS = {
+    'left_shoulder_wrist': ('LEFT_SHOULDER', 'LEFT_WRIST'),
+    'right_shoulder_wrist': ('RIGHT_SHOULDER', 'RIGHT_WRIST'),
+    'shoulder_level': ('LEFT_SHOULDER', 'RIGHT_SHOULDER'),
+    'hip_level': ('LEFT_HIP', 'RIGHT_HIP'),
+}
+HEIGHT_NAMES = tuple(HEIGHT_PAIRS)
+HEIGHT_INDEX = {name: idx for idx, name in enumerate(HEIGHT_NAMES)}
+
+
+def resolve_indices(names):
+    """关键点名称序列 -> 索引数组，支持嵌套（如三元组列表）"""
+    return np.vectorize(LANDMARK_INDEX.__getitem__, otypes=[np.intp])(np.asarray(names))
+
+
+_JOINT_IDX = resolve_indices(list(JOINT_TRIPLES.values()))   # (J, 3)
+_HEIGHT_IDX = resolve_indices(list(HEIGHT_PAIRS.values()))   # (H, 2)
+
+
+def landmarks_to_array(landmarks):
+    """MediaPipe 关键点列表 -> (33, 4) float32 数组"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks],
+        dtype=np.float32
+    )
+
+
+def results_to_array(results):
+    """MediaPipe (或推理进程池) 的检测结果 -> (33, 4) 数组；未检测到人体返回 None"""
+    array = getattr(results, 'array', None)
+    if array is not None:
+        return array
+    if not results.pose_landmarks:
+        return None
+    return landmarks_to_array(results.pose_landmarks.landmark)
+
+
+def angles_from_triples(array, triples):
+    """
+    批量计算三点在 x/y 平面内的夹角（度，0~180）
+    array: (..., 33, 4)；triples: (K, 3) 关键点索引
+    返回 (..., K)
+    """
+    triples = np.asarray(triples)
+    a = array[..., triples[:, 0], :2]
+    b = array[..., triples[:, 1], :2]
+    c = array[..., triples[:, 2], :2]
+    radians = (np.arctan2(c[..., 1] - b[..., 1], c[..., 0] - b[..., 0])
+               - np.arctan2(a[..., 1] - b[..., 1], a[..., 0] - b[..., 0]))
+    angle = np.abs(np.degrees(radians))
+    return np.where(angle > 180.0, 360.0 - angle, angle)
+
+
+def heights_from_pairs(array, pairs):
+    """批量计算高度差 y1 - y2；pairs: (K, 2) 关键点索引，返回 (..., K)"""
+    pairs = np.asarray(pairs)
+    return array[..., pairs[:, 0], 1] - array[..., pairs[:, 1], 1]
+
+
+class PoseFeatures:
+    """
+    一帧 (33, 4) 或一段录像 (T, 33, 4) 的关键点及派生量
+    构造时一次算出所需关节（默认 JOINT_TRIPLES 全部）的角度和 HEIGHT_PAIRS 中的所有高度差
+    joints 只列出检测器需要的关节时，其余关节不计算
+    """
+
+    def __init__(self, array, joints=None):
+        self.array = np.asarray(array, dtype=np.float32)
+        self.joint_names = tuple(joints) if joints is not None else JOINT_NAMES
+        self._joint_index = {name: idx for idx, name in enumerate(self.joint_names)}
+        triples = _JOINT_IDX[[JOINT_INDEX[name] for name in self.joint_names]]
+        self.angles = angles_from_triples(self.array, triples.reshape(-1, 3))
+        self.heights = heights_from_pairs(self.array, _HEIGHT_IDX)
+
+    def angle(self, joint):
+        return self.angles[..., self._joint_index[joint]]
+
+    def height(self, name):
+        return self.heights[..., HEIGHT_INDEX[name]]
+
+    def visibility(self, landmark):
+        return self.array[..., LANDMARK_INDEX[landmark], 3]
+
+    def joint_visible(self, joint, threshold=0.5, inclusive=False):
+        """关节三个关键点的可见度均 > threshold（inclusive=True 时为 >=）"""
+        vis = self.array[..., _JOINT_IDX[JOINT_INDEX[joint]], 3]
+        return np.all(vis >= threshold if inclusive else vis > threshold, axis=-1)
+
+    def joint_angles(self, threshold=0.5):
+        """单帧关节角度字典，关键点不可见时为 None"""
+        return {
+            joint: round(float(self.angles[i]), 2)
+            if self.joint_visible(joint, threshold, inclusive=True) else None
+            for i, joint in enumerate(self.joint_names)
+        }
@@ -0,0 +1,99 @@
+"""
+姿态分析分阶段流水线
+analyze_pose 的一帧依次经过 解码 -> 推理 -> 编码 三个阶段，每个阶段有独立大小的线程池：
+- decode / encode：cv2.imdecode、cvtColor、cv2.imencode 会释放 GIL，多个线程可真正并行
+- infer：线程数即每种模型复杂度的 Pose 检测器数量（检测器按线程缓存），不随 WSGI 线程数增长
+- batch：批量接口整组帧的顺序推理单独使用的线程，一组数百帧的推理不占用实时请求的 infer 线程
+并发请求时，其他帧的解码和编码与当前帧的推理重叠执行；阶段线程数为 0 时在请求线程内直接执行
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import metrics
+
+STAGES = ('decode', 'infer', 'encode', 'batch')
+
+
+class StagePipeline:
+    """
+    用法：
+        image = pipeline.run('decode', decode_frame, image_bytes)
+    调用线程阻塞等待该阶段完成；各阶段排队时间记录在指标 pose_wait_<stage>
+    """
+
+    def __init__(self, decode_workers=2, infer_workers=1, encode_workers=2, batch_workers=1):
+        self.workers = dict(zip(STAGES, (decode_workers, infer_workers, encode_workers, batch_workers)))
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'pose-{stage}')
+            for stage, workers in self.workers.items() if workers > 0
+        }
+        self._lock = threading.Lock()
+        self._backlog = dict.fromkeys(STAGES, 0)
+
+    def backlog(self, stage):
+        """已提交但尚未开始执行的任务数"""
+        return self._backlog[stage]
+
+    def _add_backlog(self, stage, delta):
+        with self._lock:
+            self._backlog[stage] += delta
+
+    def run(self, stage, fn, *args, **kwargs):
+        executor = self._executors.get(stage)
+        if executor is None:
+            return fn(*args, **kwargs)
+
+        submitted = time.perf_counter()
+
+        def task():
+            self._add_backlog(stage, -1)
+            metrics.observe(f'pose_wait_{stage}', time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        self._add_backlog(stage, 1)
+        return executor.submit(task).result()
+
+    def map(self, stage, fn, items, *args):
+        """对 items 中的每一项执行 fn(item, *args)，同时提交给阶段线程池，按原顺序返回结果"""
+        executor = self._executors.get(stage)
+        if executor is None:
+            return [fn(item, *args) for item in items]
+        submitted = time.perf_counter()
+
+        def task(item):
+            self._add_backlog(stage, -1)
+            metrics.observe(f'pose_wait_{stage}', time.perf_counter() - submitted)
+            return fn(item, *args)
+
+        futures = []
+        for item in items:
+            self._add_backlog(stage, 1)
+            futures.append(executor.submit(task, item))
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pose_pipeline():
+    """按 settings 创建的全局流水线；推理线程数默认为推理进程池大小，未启用进程池时为 2"""
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+    from django.conf import settings
+    with _pipeline_lock:
+        if _pipeline is None:
+            enabled = getattr(settings, 'POSE_PIPELINE', True)
+            _pipeline = StagePipeline(
+                decode_workers=getattr(settings, 'POSE_PIPELINE_DECODE_THREADS', 2) if enabled else 0,
+                infer_workers=getattr(settings, 'POSE_PIPELINE_INFER_THREADS', 1) if enabled else 0,
+                encode_workers=getattr(settings, 'POSE_PIPELINE_ENCODE_THREADS', 2) if enabled else 0,
+                batch_workers=getattr(settings, 'POSE_PIPELINE_BATCH_THREADS', 1) if enabled else 0,
+            )
+    return _pipeline
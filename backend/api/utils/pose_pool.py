@@ -0,0 +1,206 @@
+"""
+MediaPipe 姿态推理进程池
+每个工作进程常驻一个已加载的 Pose 检测器，并与主进程共享一块固定大小的帧缓冲区 (SharedMemory)：
+主进程把 RGB 像素直接写入共享内存，管道中只传递帧尺寸和 (33, 4) 的关键点结果，像素数据不经过 pickle
+总内存上限 = 进程数 × (检测器 + 帧缓冲区)，与 Web 线程数无关；推理不占用 Web 进程的 GIL
+在 settings.POSE_POOL_WORKERS > 0 时启用，analyze_pose 与离线视频分析共用
+"""
+import atexit
+import multiprocessing
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from .pose_math import landmarks_to_array
+
+# 与 MediaPipe NormalizedLandmark 字段一致，供 build_pose_result 等函数直接使用
+PoolLandmark = namedtuple('PoolLandmark', ['x', 'y', 'z', 'visibility'])
+
+
+class _PoolLandmarkList:
+    def __init__(self, array):
+        self.landmark = [PoolLandmark(*row) for row in array.tolist()]
+
+
+class PoolPoseResults:
+    """模仿 MediaPipe 结果对象：pose_landmarks 为 None 或含 .landmark 列表"""
+
+    def __init__(self, array):
+        self.array = array
+        self.pose_landmarks = _PoolLandmarkList(array) if array is not None else None
+
+
+def _pack_results(results):
+    """将 MediaPipe 结果压缩为 (33, 4) float32 数组，未检测到人体返回 None"""
+    if not results.pose_landmarks:
+        return None
+    return landmarks_to_array(results.pose_landmarks.landmark)
+
+
+def _worker_main(shm_name, conn, model_complexity):
+    """
+    工作进程入口：加载默认复杂度的检测器后循环处理共享内存中的帧
+    其他复杂度的检测器在首次请求时加载并常驻
+    """
+    from .pose_analysis import create_pose_detector
+
+    # 共享内存由主进程创建和释放，子进程只负责挂载
+    shm = shared_memory.SharedMemory(name=shm_name)
+    detectors = {model_complexity: create_pose_detector(static_image_mode=True, model_complexity=model_complexity)}
+    conn.send('ready')
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            height, width, complexity = msg
+            frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+            try:
+                if complexity not in detectors:
+                    detectors[complexity] = create_pose_detector(static_image_mode=True, model_complexity=complexity)
+                conn.send(_pack_results(detectors[complexity].process(frame)))
+            except Exception as e:
+                conn.send(e)
+            finally:
+                del frame
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for detector in detectors.values():
+            detector.close()
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, slot_bytes, model_complexity):
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes)
+        self.buffer = np.ndarray((slot_bytes,), dtype=np.uint8, buffer=self.shm.buf)
+        self.ctx = ctx
+        self.model_complexity = model_complexity
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(self.shm.name, child_conn, self.model_complexity),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        # 等待检测器加载完成，保证进入空闲队列的进程都是热的
+        self.conn.recv()
+
+    def restart(self):
+        self.stop(timeout=1)
+        self.start()
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+    def release(self):
+        del self.buffer
+        self.shm.close()
+        self.shm.unlink()
+
+
+class PosePool:
+    """
+    固定大小的姿态推理进程池
+    process(image_rgb) 可从任意线程调用，所有进程忙碌时阻塞等待
+    """
+
+    def __init__(self, workers, model_complexity=1, max_frame_pixels=1920 * 1080):
+        ctx = multiprocessing.get_context('spawn')
+        self.model_complexity = model_complexity
+        self.max_frame_pixels = max_frame_pixels
+        self._workers = [
+            _Worker(ctx, max_frame_pixels * 3, model_complexity) for _ in range(workers)
+        ]
+        self._free = queue.Queue()
+        for idx in range(workers):
+            self._free.put(idx)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pose-pool')
+
+    def _fit(self, image_rgb):
+        """超过帧缓冲区的图像按比例缩小（关键点是归一化坐标，结果不受影响）"""
+        height, width = image_rgb.shape[:2]
+        if height * width <= self.max_frame_pixels:
+            return image_rgb
+        scale = (self.max_frame_pixels / (height * width)) ** 0.5
+        return cv2.resize(image_rgb, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    @property
+    def worker_pids(self):
+        return [worker.process.pid for worker in self._workers]
+
+    def process(self, image_rgb, timeout=None, model_complexity=None):
+        """对一帧 RGB 图像执行姿态检测，返回 PoolPoseResults；model_complexity 缺省为进程池的默认复杂度"""
+        if model_complexity is None:
+            model_complexity = self.model_complexity
+        frame = self._fit(image_rgb)
+        height, width = frame.shape[:2]
+        idx = self._free.get(timeout=timeout)
+        worker = self._workers[idx]
+        try:
+            worker.buffer[:frame.size] = frame.reshape(-1)
+            worker.conn.send((height, width, model_complexity))
+            packed = worker.conn.recv()
+        except (EOFError, OSError):
+            # 工作进程异常退出：重启后再放回空闲队列
+            worker.restart()
+            raise
+        finally:
+            self._free.put(idx)
+        if isinstance(packed, Exception):
+            raise packed
+        return PoolPoseResults(packed)
+
+    def process_many(self, frames, model_complexity=None):
+        """并行处理多帧，结果顺序与输入一致"""
+        return list(self._executor.map(
+            lambda frame: self.process(frame, model_complexity=model_complexity), frames
+        ))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        for worker in self._workers:
+            worker.stop()
+            worker.release()
+        self._workers = []
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pose_pool():
+    """返回全局推理进程池；未配置 POSE_POOL_WORKERS 时返回 None（使用线程内检测器）"""
+    global _pool
+    if _pool is not None:
+        return _pool
+    from django.conf import settings
+    workers = getattr(settings, 'POSE_POOL_WORKERS', 0)
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = PosePool(
+                workers,
+                model_complexity=getattr(settings, 'POSE_POOL_MODEL_COMPLEXITY', 1),
+                max_frame_pixels=getattr(settings, 'POSE_POOL_MAX_FRAME_PIXELS', 1920 * 1080),
+            )
+            atexit.register(_pool.shutdown)
+    return _pool
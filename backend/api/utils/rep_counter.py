@@ -0,0 +1,214 @@
+"""
+服务端动作计数
+客户端在本地运行 MediaPipe，只上传关键点或测量值（角度/高度差），服务端按会话维护计数状态机：
+- 测量值先做滑动平均，再用检测器的阈值（ACTION_CATEGORIES 或内置动作）判定 DOWN/UP/TRANSITION
+- 起始/结束两个阈值之间的过渡区构成滞回：只有从起始状态真正到达结束状态才计一次，抖动不会重复计数
+- 两次计数间隔不少于 min_rep_interval 秒（与前端 poseAnalyzer.js 的 1 秒限制一致）
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from .action_classifier import STATE_INVISIBLE, STATE_NAMES
+from .pose_detectors import DETECTORS
+from .pose_math import LANDMARK_INDEX, NUM_LANDMARKS, PoseFeatures
+
+
+class RepCounter:
+    """单个会话的计数状态机"""
+
+    def __init__(self, detector, smoothing=5, min_rep_interval=1.0):
+        if detector.rep_phases is None:
+            raise ValueError(f'动作类型 {detector.key} 不支持计数')
+        self.detector = detector
+        self.start_state, self.end_state = detector.rep_phases
+        self.smoothing = max(int(smoothing), 1)
+        self.min_rep_interval = min_rep_interval
+
+        self.reps = 0
+        self.phase = 'end'
+        self.state = STATE_INVISIBLE
+        self.value = 0.0
+        self.frames_received = 0
+        self.rep_start_time = None
+        self.last_rep_time = None
+        self.rep_durations = []
+        self.rep_times = []
+        # 每次动作的片段：上一次计数（或首个可见帧）到本次计数之间的时间与测量值范围
+        self.segments = []
+        self._segment_start = None
+        self._segment_min = None
+        self._segment_max = None
+        self._history = np.zeros(0, dtype=np.float32)
+
+    def _smooth(self, values):
+        """带上一批末尾历史的滑动平均，窗口不足时取已有帧的平均"""
+        buffer = np.concatenate([self._history, values])
+        cumsum = np.concatenate([[0.0], np.cumsum(buffer, dtype=np.float64)])
+        end = np.arange(len(self._history), len(buffer)) + 1
+        start = np.maximum(end - self.smoothing, 0)
+        self._history = buffer[len(buffer) - (self.smoothing - 1):] if self.smoothing > 1 else buffer[:0]
+        return (cumsum[end] - cumsum[start]) / (end - start)
+
+    def update(self, values, visible, timestamps):
+        """
+        推进状态机
+        values / visible / timestamps: (T,) 测量值、可见性、时间戳（秒）
+        返回本批新增的计数
+        """
+        self.frames_received += len(values)
+        mask = np.asarray(visible, dtype=bool)
+        values = np.asarray(values, dtype=np.float32)[mask]
+        timestamps = np.asarray(timestamps, dtype=np.float64)[mask]
+        if not len(values):
+            self.state = STATE_INVISIBLE
+            return 0
+
+        smoothed = self._smooth(values)
+        states = self.detector.classify_values(smoothed)
+        added = 0
+        for state, value, timestamp in zip(states.tolist(), smoothed.tolist(), timestamps.tolist()):
+            if self._segment_start is None:
+                self._segment_start = timestamp
+                self._segment_min = self._segment_max = value
+            else:
+                self._segment_min = min(self._segment_min, value)
+                self._segment_max = max(self._segment_max, value)
+
+            if state == self.start_state and self.phase == 'end':
+                self.phase = 'start'
+                self.rep_start_time = timestamp
+            elif state == self.end_state and self.phase == 'start':
+                self.phase = 'end'
+                if self.last_rep_time is None or timestamp - self.last_rep_time >= self.min_rep_interval:
+                    self.reps += 1
+                    added += 1
+                    self.rep_durations.append(timestamp - self.rep_start_time)
+                    self.rep_times.append(timestamp)
+                    self.last_rep_time = timestamp
+                    self.segments.append({
+                        'index': self.reps,
+                        'start': round(self._segment_start, 3),
+                        'end': round(timestamp, 3),
+                        'min_value': round(self._segment_min, 2),
+                        'max_value': round(self._segment_max, 2),
+                        'range_of_motion': round(self._segment_max - self._segment_min, 2),
+                    })
+                    self._segment_start = timestamp
+                    self._segment_min = self._segment_max = value
+        self.state = int(states[-1])
+        self.value = float(smoothed[-1])
+        return added
+
+    def tempo(self):
+        """节奏统计：单次动作时长、平均时长、每分钟次数"""
+        intervals = np.diff(self.rep_times)
+        return {
+            'last_rep_seconds': round(self.rep_durations[-1], 3) if self.rep_durations else None,
+            'avg_rep_seconds': round(float(np.mean(self.rep_durations)), 3) if self.rep_durations else None,
+            'reps_per_minute': round(60.0 / float(np.mean(intervals)), 2)
+            if len(intervals) and np.mean(intervals) > 0 else None,
+        }
+
+    def snapshot(self):
+        return {
+            'exercise_type': self.detector.key,
+            'reps': self.reps,
+            'phase': self.phase,
+            'state': STATE_NAMES[self.state],
+            'value': round(self.value, 4),
+            'frames_received': self.frames_received,
+            'tempo': self.tempo(),
+        }
+
+
+def landmark_indices(names):
+    """关键点名称或索引列表 -> 索引列表"""
+    return [LANDMARK_INDEX[name] if isinstance(name, str) else int(name) for name in names]
+
+
+def frames_to_array(frames, indices=None):
+    """
+    客户端上传的关键点帧 -> (T, 33, 4) 数组
+    frames: 每帧为 [[x, y, z, visibility], ...]，或扁平的 [x, y, z, visibility, ...]
+    indices: 只上传部分关键点时对应的关键点索引，其余关键点可见度为 0
+    """
+    count = len(indices) if indices is not None else NUM_LANDMARKS
+    compact = np.asarray(frames, dtype=np.float32).reshape(-1, count, 4)
+    if indices is None:
+        return compact
+    array = np.zeros((len(compact), NUM_LANDMARKS, 4), dtype=np.float32)
+    array[:, indices] = compact
+    return array
+
+
+def measure_frames(detector, array):
+    """对 (T, 33, 4) 关键点计算检测器的测量值与可见性"""
+    return detector.measure_batch(PoseFeatures(array, joints=detector.joints))
+
+
+class _Session:
+    def __init__(self, counter):
+        self.counter = counter
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+
+class RepSessionStore:
+    """进程内的计数会话表，长时间不活跃的会话在创建新会话时清理"""
+
+    def __init__(self, idle_timeout=600):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def resolve_detector(self, session_id, exercise_type=None):
+        """
+        请求将使用的检测器（不创建会话）：指定 exercise_type 时取该动作，否则沿用已有会话的动作
+        未知动作类型时抛出 ValueError
+        """
+        if session_id and not exercise_type:
+            with self._lock:
+                session = self._sessions.get(session_id)
+            if session is not None:
+                return session.counter.detector
+        detector = DETECTORS.get(exercise_type)
+        if detector is None:
+            raise ValueError(f'未知动作类型: {exercise_type}')
+        return detector
+
+    def get(self, session_id, exercise_type=None, reset=False, **options):
+        """
+        获取会话；会话不存在、重置或动作类型变化时新建
+        重置已有会话时未指定 exercise_type 则沿用原会话的动作类型
+        返回 (session_id, _Session)
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            changed = (session is not None and exercise_type
+                       and session.counter.detector.key != exercise_type)
+            if session is None or reset or changed:
+                if session is not None and not exercise_type:
+                    detector = session.counter.detector
+                else:
+                    detector = DETECTORS.get(exercise_type)
+                if detector is None:
+                    raise ValueError(f'未知动作类型: {exercise_type}')
+                counter = RepCounter(detector, **options)
+                for key in [k for k, s in self._sessions.items() if now - s.last_seen > self.idle_timeout]:
+                    del self._sessions[key]
+                session_id = session_id or uuid.uuid4().hex
+                session = self._sessions[session_id] = _Session(counter)
+            session.last_seen = now
+            return session_id, session
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+# 进程内共享的计数会话表
+rep_sessions = RepSessionStore()
@@ -0,0 +1,102 @@
+"""
+按客户端的人体区域 (ROI) 跟踪
+同一组训练中用户基本站在同一位置：用上一帧关键点得到外扩的人体包围框，下一帧只对该区域做推理，
+再把关键点坐标映射回整帧。裁剪区域内未检测到人体（跟踪丢失）时，同一请求内回退到整帧检测
+"""
+import threading
+import time
+
+import numpy as np
+
+from .pose_math import results_to_array
+from .pose_pool import PoolPoseResults
+
+
+def bbox_from_landmarks(array, image_shape, padding=0.25, min_visibility=0.5, min_size=64):
+    """
+    由整帧归一化关键点得到外扩后的像素包围框 (x0, y0, x1, y1)
+    可见关键点不足或外扩后接近整帧时返回 None
+    """
+    visible = array[:, 3] >= min_visibility
+    if visible.sum() < 4:
+        return None
+    height, width = image_shape[:2]
+    xs = np.clip(array[visible, 0], 0, 1) * width
+    ys = np.clip(array[visible, 1], 0, 1) * height
+    pad_x = max((xs.max() - xs.min()) * padding, min_size / 2)
+    pad_y = max((ys.max() - ys.min()) * padding, min_size / 2)
+    x0 = int(max(xs.min() - pad_x, 0))
+    y0 = int(max(ys.min() - pad_y, 0))
+    x1 = int(min(xs.max() + pad_x, width))
+    y1 = int(min(ys.max() + pad_y, height))
+    if (x1 - x0) * (y1 - y0) >= 0.8 * width * height:
+        return None
+    return x0, y0, x1, y1
+
+
+def map_to_full_frame(array, roi, image_shape):
+    """裁剪区域内的归一化关键点 -> 整帧归一化坐标（z 与 x 同尺度，一并缩放）"""
+    height, width = image_shape[:2]
+    x0, y0, x1, y1 = roi
+    mapped = array.copy()
+    mapped[:, 0] = (array[:, 0] * (x1 - x0) + x0) / width
+    mapped[:, 1] = (array[:, 1] * (y1 - y0) + y0) / height
+    mapped[:, 2] = array[:, 2] * (x1 - x0) / width
+    return mapped
+
+
+class _Track:
+    def __init__(self):
+        # 上一帧的整帧归一化关键点；包围框按当前帧尺寸计算，客户端分辨率变化时依然有效
+        self.array = None
+        self.last_seen = time.monotonic()
+
+
+class RoiTracker:
+    """
+    用法（同一客户端的调用需串行，analyze_pose 中由 pose_scheduler 保证）：
+        results, roi = roi_tracker.process(client_id, image_rgb, detector.process)
+    roi 为本帧实际使用的像素裁剪框，整帧推理时为 None
+    """
+
+    def __init__(self, padding=0.25, idle_timeout=300):
+        self.padding = padding
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._tracks = {}
+
+    def _get_track(self, client_id):
+        now = time.monotonic()
+        with self._lock:
+            track = self._tracks.get(client_id)
+            if track is None:
+                for key in [k for k, t in self._tracks.items() if now - t.last_seen > self.idle_timeout]:
+                    del self._tracks[key]
+                track = self._tracks[client_id] = _Track()
+            track.last_seen = now
+            return track
+
+    def process(self, client_id, image_rgb, process):
+        track = self._get_track(client_id)
+        roi = bbox_from_landmarks(track.array, image_rgb.shape, self.padding) if track.array is not None else None
+        array = None
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            crop = np.ascontiguousarray(image_rgb[y0:y1, x0:x1])
+            array = results_to_array(process(crop))
+            if array is not None:
+                array = map_to_full_frame(array, roi, image_rgb.shape)
+        if array is None:
+            # 首帧或跟踪丢失：整帧检测
+            roi = None
+            array = results_to_array(process(image_rgb))
+        track.array = array
+        return PoolPoseResults(array), roi
+
+    def reset(self, client_id):
+        with self._lock:
+            self._tracks.pop(client_id, None)
+
+
+# 进程内共享的 ROI 跟踪器
+roi_tracker = RoiTracker()
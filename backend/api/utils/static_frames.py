@@ -0,0 +1,105 @@
+"""
+静止帧短路
+组间休息时摄像头画面几乎不变，每帧仍要完整推理。这里为每个客户端保存上一次实际推理帧的
+缩略灰度指纹（32x24）和推理结果：新帧指纹与之的平均绝对差低于阈值时直接复用缓存结果，跳过推理。
+始终与“产生缓存结果的那一帧”比较，而不是与上一帧比较，缓慢的累计变化也会触发重新推理；
+缓存超过 max_age 秒后强制重新推理一次
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+FINGERPRINT_SIZE = (32, 24)
+
+
+def frame_fingerprint(image):
+    """BGR 图像 -> 32x24 灰度缩略图（int16，便于直接相减）"""
+    # 先用线性插值缩到 5 倍尺寸再做区域平均，比直接 INTER_AREA 快约 3 倍，且仍能平滑传感器噪声
+    width, height = FINGERPRINT_SIZE
+    small = cv2.resize(image, (width * 5, height * 5), interpolation=cv2.INTER_LINEAR)
+    small = cv2.resize(small, FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def fingerprint_distance(a, b):
+    """两个指纹的平均绝对灰度差（0~255）"""
+    return float(np.abs(a - b).mean())
+
+
+class _Entry:
+    def __init__(self, fingerprint, value):
+        self.fingerprint = fingerprint
+        self.value = value
+        self.created = time.monotonic()
+        self.last_seen = self.created
+
+
+class StaticFrameCache:
+    """
+    用法（同一客户端的调用需串行）：
+        value = cache.lookup(client_id, fingerprint)
+        if value is None:
+            value = infer()
+            cache.store(client_id, fingerprint, value)
+    threshold <= 0 时不启用
+    """
+
+    def __init__(self, threshold=1.5, max_age=1.0, idle_timeout=300):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def lookup(self, client_id, fingerprint):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(client_id)
+        if entry is None or now - entry.created > self.max_age:
+            return None
+        if fingerprint_distance(fingerprint, entry.fingerprint) > self.threshold:
+            return None
+        entry.last_seen = now
+        return entry.value
+
+    def store(self, client_id, fingerprint, value):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if client_id not in self._entries:
+                # 新客户端到来时顺便清理长时间不活跃的客户端
+                for key in [k for k, e in self._entries.items() if now - e.last_seen > self.idle_timeout]:
+                    del self._entries[key]
+            self._entries[client_id] = _Entry(fingerprint, value)
+
+    def discard(self, client_id):
+        with self._lock:
+            self._entries.pop(client_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_static_frame_cache():
+    """按 settings 创建的全局静止帧缓存"""
+    global _cache
+    if _cache is not None:
+        return _cache
+    from django.conf import settings
+    with _cache_lock:
+        if _cache is None:
+            _cache = StaticFrameCache(
+                threshold=getattr(settings, 'POSE_STATIC_FRAME_THRESHOLD', 1.5),
+                max_age=getattr(settings, 'POSE_STATIC_FRAME_MAX_AGE', 1.0),
+            )
+    return _cache
@@ -0,0 +1,252 @@
+"""
+训练视频本地分析
+次数、动作幅度、节奏这类问题不需要大模型：用 cv2.VideoCapture 流式读取视频，按步长抽帧，
+批量做姿态推理（解码在后台线程中与推理重叠；配置了推理进程池时推理本身也多核并行），再用与实时分析相同的检测器阈值计数，
+输出每次动作的片段、幅度范围和基于规则的动作评分
+"""
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .frame_sampler import sample_frames, video_info
+from .pose_analysis import create_pose_detector
+from .pose_detectors import DETECTORS
+from .pose_math import NUM_LANDMARKS, results_to_array
+from .pose_pool import get_pose_pool
+from .rep_counter import RepCounter, measure_frames
+
+DEFAULT_STRIDE = 2
+# 推理前把帧缩小到长边不超过该值，关键点是归一化坐标，不影响计数
+INFERENCE_MAX_SIDE = 640
+BATCH_SIZE = 16
+# 后台线程预读的帧数：视频解码（cv2 释放 GIL）与推理在两个核上重叠，内存占用有上限
+PREFETCH_FRAMES = 2 * BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_exercise_type(workout_plan, exercise_type=None):
+    """优先使用请求指定的动作类型，其次取训练计划中第一个可计数的动作类别"""
+    if exercise_type in DETECTORS:
+        return exercise_type
+    for exercise in workout_plan or []:
+        category = exercise.get('category') if isinstance(exercise, dict) else None
+        if category in DETECTORS and DETECTORS[category].rep_phases is not None:
+            return category
+    return 'general'
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _PrefetchError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _prefetch(iterable, size):
+    """在后台线程中迭代 iterable，最多预读 size 项；消费方提前结束时停止读取"""
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(done)
+        except Exception as e:
+            put(_PrefetchError(e))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='training-video-decode', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, _PrefetchError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def infer_landmarks(frames, batch_size=BATCH_SIZE):
+    """
+    对 (frame_index, image_rgb) 序列做姿态推理
+    配置了推理进程池时每批帧在多个进程中并行处理，否则使用跟踪模式的检测器顺序处理
+    返回 (frame_indices, (T, 33, 4) 数组)，未检测到人体的帧可见度为 0
+    """
+    pool = get_pose_pool()
+    detector = None if pool is not None else create_pose_detector(static_image_mode=False)
+    indices, arrays = [], []
+    empty = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    try:
+        for batch in _batches(frames, batch_size):
+            images = [image for _, image in batch]
+            if pool is not None:
+                results = pool.process_many(images)
+            else:
+                results = [detector.process(image) for image in images]
+            for (frame_index, _), result in zip(batch, results):
+                array = results_to_array(result)
+                indices.append(frame_index)
+                arrays.append(array if array is not None else empty)
+    finally:
+        if detector is not None:
+            detector.close()
+    array = np.stack(arrays) if arrays else np.zeros((0, NUM_LANDMARKS, 4), dtype=np.float32)
+    return np.asarray(indices, dtype=np.int64), array
+
+
+def _variation(values):
+    """变异系数（标准差 / 平均值），样本不足时为 0"""
+    if len(values) < 2 or np.mean(values) <= 0:
+        return 0.0
+    return float(np.std(values) / np.mean(values))
+
+
+def score_form(segments, visible_ratio, target_reps=None):
+    """
+    基于规则的动作评分（0~100）
+    扣分项：幅度不一致、节奏不稳定、速度过快、身体可见时间不足、次数未达目标
+    返回 (score, detected_errors, advice)
+    """
+    if not segments:
+        return 0, ['未检测到完整的动作'], ['请确保全身在画面内，并完成完整的动作幅度']
+
+    penalty = 0.0
+    errors, advice = [], []
+    ranges = [segment['range_of_motion'] for segment in segments]
+    durations = [segment['end'] - segment['start'] for segment in segments]
+
+    range_variation = _variation(ranges)
+    penalty += min(range_variation * 100, 25)
+    if range_variation > 0.15:
+        errors.append('各次动作幅度不一致')
+        advice.append('每次都做到完整的动作幅度，不要越做越浅')
+
+    tempo_variation = _variation(durations[1:])
+    penalty += min(tempo_variation * 50, 15)
+    if tempo_variation > 0.25:
+        errors.append('动作节奏不稳定')
+        advice.append('保持匀速，每次动作用时尽量一致')
+
+    fast_reps = sum(1 for duration in durations if duration < 1.2)
+    penalty += min(fast_reps * 5, 15)
+    if fast_reps:
+        errors.append(f'{fast_reps} 次动作速度过快')
+        advice.append('放慢速度，尤其是下放阶段要有控制')
+
+    penalty += (1 - visible_ratio) * 30
+    if visible_ratio < 0.7:
+        errors.append(f'身体关键部位仅在 {visible_ratio * 100:.0f}% 的时间内可见')
+        advice.append('调整机位，让训练部位完整出现在画面中')
+
+    if target_reps and len(segments) < target_reps:
+        penalty += (1 - len(segments) / target_reps) * 15
+        errors.append(f'完成 {len(segments)} 次，少于目标 {target_reps} 次')
+
+    return round(max(0.0, 100 - penalty), 1), errors, advice
+
+
+def analyze_training_video(video_path, exercise_type, stride=DEFAULT_STRIDE, target_reps=None):
+    """
+    本地分析训练视频
+    返回与 CoachAgent.analyze_complete_training 相同的评价字段（score / detected_errors / improvement_advice /
+    coach_comment / is_standard），以及 reps、segments、tempo、range_of_motion、video、timing 等本地统计
+    """
+    start_time = time.time()
+    stride = max(int(stride), 1)
+    fps, frame_count, _, _ = video_info(video_path)
+
+    # 跳过的帧只 grab() 不转换；取到的帧缩小并转换为 RGB。解码在后台线程中预读，与推理重叠
+    frames = _prefetch(sample_frames(video_path, stride=stride, max_side=INFERENCE_MAX_SIDE, rgb=True),
+                       PREFETCH_FRAMES)
+    frame_indices, array = infer_landmarks((index, image) for index, _, image in frames)
+    infer_duration = time.time() - start_time
+    timestamps = frame_indices / fps
+
+    detector = DETECTORS[exercise_type]
+    result = {
+        'exercise_type': exercise_type,
+        'reps': 0,
+        'segments': [],
+        'tempo': None,
+        'range_of_motion': None,
+        'visible_ratio': 0.0,
+        'video': {
+            'fps': round(fps, 2),
+            'frame_count': frame_count,
+            'duration': round(frame_count / fps, 2),
+            'stride': stride,
+            'sampled_frames': len(frame_indices),
+        },
+    }
+
+    if detector.rep_phases is not None and len(array):
+        values, visible = measure_frames(detector, array)
+        # 平滑窗口按采样后的帧率折算（最短计数间隔以秒计，不受步长影响）
+        counter = RepCounter(detector, smoothing=max(1, round(5 / stride)))
+        counter.update(values, visible, timestamps)
+        ranges = [segment['range_of_motion'] for segment in counter.segments]
+        result.update({
+            'reps': counter.reps,
+            'segments': counter.segments,
+            'tempo': counter.tempo(),
+            'range_of_motion': {
+                'min': min(ranges), 'max': max(ranges), 'mean': round(float(np.mean(ranges)), 2),
+            } if ranges else None,
+            'visible_ratio': round(float(np.mean(visible)), 3),
+        })
+        score, errors, advice = score_form(counter.segments, float(np.mean(visible)), target_reps)
+    elif detector.rep_phases is None:
+        score, errors, advice = 0, [f'动作类型 {exercise_type} 不支持本地计数'], ['请在训练计划中为动作设置类别']
+    else:
+        score, errors, advice = 0, ['视频中没有可分析的帧'], ['请检查视频格式或重新录制']
+
+    tempo = result['tempo'] or {}
+    rom = result['range_of_motion'] or {}
+    result.update({
+        'score': score,
+        'is_standard': score >= 80 and not errors,
+        'detected_errors': errors,
+        'improvement_advice': '；'.join(advice) if advice else '动作稳定，继续保持',
+        'coach_comment': f"本地分析：共完成 {result['reps']} 次"
+                         + (f"，平均每次 {tempo['avg_rep_seconds']} 秒" if tempo.get('avg_rep_seconds') else '')
+                         + (f"，平均动作幅度 {rom['mean']}" if rom else ''),
+        'timing': {
+            'inference_seconds': round(infer_duration, 3),
+            'total_seconds': round(time.time() - start_time, 3),
+        },
+    })
+    logger.info('训练视频本地分析 %s: %d 次，抽样 %d 帧，耗时 %.2fs',
+                exercise_type, result['reps'], len(frame_indices), result['timing']['total_seconds'])
+    return result
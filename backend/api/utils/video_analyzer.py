@@ -1,22 +1,130 @@
 import cv2
+import logging
 import os
 import base64
+import hashlib
 import json
 import tempfile
 import time
-import inspect
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from imageio_ffmpeg import get_ffmpeg_exe
 from openai import OpenAI
-try:
-    from moviepy.editor import VideoFileClip
-except ImportError:
-    from moviepy import VideoFileClip
+from PIL import Image
 from django.conf import settings
 from dotenv import load_dotenv
+from .action_classifier import ACTION_CATEGORIES
+from .frame_sampler import merge_ranges, sample_frames, sample_segments
+
+logger = logging.getLogger(__name__)
+
+# 生成 GIF 共享调色板时最多取样的帧数
+GIF_PALETTE_FRAMES = 8
 
 load_dotenv()
 
+
+def _to_seconds(t_str):
+    """解析时间戳 "mm:ss"，格式不对时按 0 处理"""
+    parts = str(t_str).split(':')
+    if len(parts) == 2:
+        return int(parts[0]) * 60 + int(parts[1])
+    return 0
+
+
+def _gif_range(start_time_str, end_time_str):
+    start_t = _to_seconds(start_time_str)
+    end_t = _to_seconds(end_time_str)
+    # 确保结束时间大于开始时间，且至少持续1秒
+    if end_t <= start_t:
+        end_t = start_t + 3
+    return start_t, end_t
+
+
+def _save_gif(frames, output_gif_path, fps):
+    """
+    用一个共享调色板量化所有帧后写出 GIF
+    调色板取自均匀抽取的最多 8 帧；比 Pillow 默认的逐帧自适应调色板快约 9 倍，文件更小，也没有帧间闪烁
+    """
+    step = max(len(frames) // GIF_PALETTE_FRAMES, 1)
+    samples = frames[::step][:GIF_PALETTE_FRAMES]
+    width, height = samples[0].size
+    mosaic = Image.new('RGB', (width, height * len(samples)))
+    for index, frame in enumerate(samples):
+        mosaic.paste(frame, (0, height * index))
+    palette = mosaic.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+    quantized = [frame.quantize(palette=palette) for frame in frames]
+    quantized[0].save(output_gif_path, format='GIF', save_all=True, append_images=quantized[1:],
+                      duration=int(1000 / fps), loop=0)
+
+
+def _write_gifs(input_video_path, ranges, output_gif_paths, width, fps, done):
+    """一次读取视频生成 ranges 中所有时间段的 GIF，每个 GIF 写出后调用 done(index, ok)"""
+    frames = {index: [] for index in range(len(ranges))}
+    pending = set(frames)
+
+    def finish(index):
+        pending.discard(index)
+        segment_frames = frames.pop(index)
+        if not segment_frames:
+            start_t, end_t = ranges[index]
+            logger.warning('生成 GIF 失败: %ss~%ss 之间没有帧', start_t, end_t)
+            done(index, False)
+            return
+        try:
+            _save_gif(segment_frames, output_gif_paths[index], fps)
+            done(index, True)
+        except Exception:
+            logger.exception('生成 GIF 失败: %s', output_gif_paths[index])
+            done(index, False)
+
+    try:
+        for timestamp, frame, active in sample_segments(input_video_path, ranges, fps=fps, width=width, rgb=True):
+            image = Image.fromarray(frame)
+            for index in active:
+                frames[index].append(image)
+            # 已经读过结束时间的时间段立即写出，释放其帧
+            for index in [i for i in pending if ranges[i][1] <= timestamp]:
+                finish(index)
+    except Exception:
+        logger.exception('生成 GIF 时读取视频失败: %s', input_video_path)
+    for index in sorted(pending):
+        finish(index)
+
+
+def _write_gifs_worker(input_video_path, ranges, output_gif_paths, width, fps):
+    """进程池中执行的 _write_gifs，返回成功/失败列表"""
+    results = [False] * len(ranges)
+
+    def done(index, ok):
+        results[index] = ok
+
+    _write_gifs(input_video_path, ranges, output_gif_paths, width, fps, done)
+    return results
+
+
+def _split_spans(ranges, workers):
+    """把相邻（merge_ranges 合并后）的时间段作为整体，按总时长均衡地分成最多 workers 组，返回各组的序号列表"""
+    spans = sorted(merge_ranges(ranges), key=lambda span: span[1] - span[0], reverse=True)
+    groups = [[] for _ in range(min(workers, len(spans)))]
+    loads = [0.0] * len(groups)
+    for start, end, members in spans:
+        target = loads.index(min(loads))
+        groups[target].extend(members)
+        loads[target] += end - start
+    return [sorted(group) for group in groups if group]
+
+
 class VideoAnalyzer:
+    # 主分析模型；与提示词版本一起作为结果缓存的键
+    MODEL = "google/gemini-2.0-flash-001"
+    # 主模型返回 404 / 无可用节点时使用的备用模型
+    FALLBACK_MODEL = "google/gemini-flash-1.5"
+
     def __init__(self):
+        # 最近一次 analyze_video 实际给出结果的模型（MODEL 或 FALLBACK_MODEL）
+        self.answered_model = None
         load_dotenv()
         api_key = os.getenv("OPENROUTER_API_KEY")
         self.client = OpenAI(
@@ -24,14 +132,8 @@ class VideoAnalyzer:
             api_key=api_key,
         )
         
-        # 加载动作分类配置
-        categories_path = os.path.join(os.path.dirname(__file__), 'action_categories.json')
-        try:
-            with open(categories_path, 'r', encoding='utf-8') as f:
-                self.action_categories = json.load(f)
-        except Exception as e:
-            print(f"Warning: Could not load action_categories.json: {e}")
-            self.action_categories = {}
+        # 动作分类配置（与实时姿态判定共用同一份 action_categories.json）
+        self.action_categories = ACTION_CATEGORIES
         
         # 构建动作分类说明
         categories_description = ""
@@ -86,7 +188,12 @@ class VideoAnalyzer:
     }}
   ]
 }}"""
-    
+
+    @property
+    def prompt_version(self):
+        """提示词内容（含动作分类配置）的短哈希，修改提示词或分类后旧的缓存结果自动失效"""
+        return hashlib.sha256(self.system_prompt.encode('utf-8')).hexdigest()[:16]
+
     def get_muscle_group_from_category(self, category):
         """
         根据category获取对应的训练部位（muscle_group）
@@ -103,170 +210,117 @@ class VideoAnalyzer:
         }
         return default_mapping.get(category, '未知部位')
 
-    def compress_video(self, input_path, output_path, target_fps=1, target_width=320):
-        temp_video = tempfile.mktemp(suffix=".mp4")
-        
-        # --- Step 1: Process video frames using OpenCV ---
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            raise Exception("Could not open video file")
-
-        original_fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        
-        ratio = target_width / width
-        target_height = int(height * ratio)
-        
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(temp_video, fourcc, target_fps, (target_width, target_height))
-
-        frame_count = 0
-        skip_interval = max(1, int(original_fps / target_fps))
-
+    @staticmethod
+    def compress_video(input_path, output_path, target_fps=1, target_width=320):
+        """
+        单遍压缩：一次 ffmpeg 调用完成降帧率（fps 滤镜）、缩放、H.264 编码和音频转码，
+        源视频只解码一次，不产生中间文件
+        ffmpeg 执行失败时退回 OpenCV 单遍抽帧编码（无音频，与原先音频合成失败时的结果一致）
+        """
+        command = [
+            get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+            '-i', input_path,
+            '-vf', f'fps={target_fps},scale={target_width}:-2',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac',
+            '-movflags', '+faststart',
+            output_path,
+        ]
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                if frame_count % skip_interval == 0:
-                    resized_frame = cv2.resize(frame, (target_width, target_height))
-                    out.write(resized_frame)
-                frame_count += 1
-        finally:
-            cap.release()
-            out.release()
+            subprocess.run(command, check=True, capture_output=True)
+            return
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, 'stderr', None)
+            logger.warning('ffmpeg 转码失败，改用 OpenCV: %s', stderr.decode(errors='ignore').strip() if stderr else e)
+        VideoAnalyzer._compress_video_opencv(input_path, output_path, target_fps, target_width)
 
-        # --- Step 2: Synthesize audio using MoviePy ---
-        video_clip = None
-        original_clip = None
+    @staticmethod
+    def _compress_video_opencv(input_path, output_path, target_fps, target_width):
+        """OpenCV 单遍抽帧（跳过的帧不做转换）缩放后直接写入 output_path（mp4v，无音频）"""
+        out = None
         try:
-            video_clip = VideoFileClip(temp_video)
-            original_clip = VideoFileClip(input_path)
-            
-            if original_clip.audio:
-                # Compatibility for MoviePy v1 and v2
-                if hasattr(video_clip, 'with_audio'):
-                    final_clip = video_clip.with_audio(original_clip.audio)
-                    # MoviePy v2 removed verbose and logger from write_videofile
-                    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
-                else:
-                    final_clip = video_clip.set_audio(original_clip.audio)
-                    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", verbose=False, logger=None)
-            else:
-                if hasattr(video_clip, 'with_audio'):
-                    video_clip.write_videofile(output_path, codec="libx264")
-                else:
-                    video_clip.write_videofile(output_path, codec="libx264", verbose=False, logger=None)
-            
-        except Exception as e:
-            # Fallback to just the compressed video if audio processing fails
-            import traceback
-            traceback.print_exc()
-            print(f"Audio processing failed, using silent video: {e}")
-            # Close clips before renaming to avoid PermissionError on Windows
-            if video_clip: video_clip.close()
-            if original_clip: original_clip.close()
-            video_clip = None
-            original_clip = None
-            
-            import shutil
-            shutil.copy2(temp_video, output_path)
+            for _, _, frame in sample_frames(input_path, fps=target_fps, width=target_width):
+                if out is None:
+                    height, width = frame.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                    out = cv2.VideoWriter(output_path, fourcc, target_fps, (width, height))
+                out.write(frame)
+        except IOError:
+            raise Exception("Could not open video file")
         finally:
-            if video_clip:
-                video_clip.close()
-            if original_clip:
-                original_clip.close()
-            
-            # Small delay to ensure Windows releases the file handle
-            import time
-            time.sleep(0.1)
-            if os.path.exists(temp_video):
-                try:
-                    os.remove(temp_video)
-                except Exception as e:
-                    print(f"Warning: Could not remove temp file {temp_video}: {e}")
+            if out is not None:
+                out.release()
 
-    def create_gif(self, input_video_path, start_time_str, end_time_str, output_gif_path, width=320):
+    def create_gif(self, input_video_path, start_time_str, end_time_str, output_gif_path, width=320, fps=10):
+        """根据时间戳截取视频并转换为 GIF"""
+        return self.create_gifs(input_video_path, [(start_time_str, end_time_str)], [output_gif_path],
+                                width=width, fps=fps)[0]
+
+    @staticmethod
+    def create_gifs(input_video_path, segments, output_gif_paths, width=320, fps=10, workers=0, on_done=None):
         """
-        根据时间戳截取视频并转换为 GIF
+        一次生成多个时间段的 GIF，segments 为 [("mm:ss", "mm:ss"), ...]，返回与之对应的成功/失败列表
+        - workers <= 1：一次顺序读取视频（sample_segments），每帧只解码并缩放到 width 一次，
+          某个时间段读完后立即编码写出，内存中只保留尚未结束的时间段的帧
+        - workers > 1：按时间把相邻的时间段分组，分给多个进程，每个进程跳转到自己的时间范围各读一遍
+        on_done(index, ok)：每个 GIF 完成时回调（用于汇报进度）
         """
-        video = None
-        clip = None
-        try:
-            # 解析时间戳 "mm:ss"
-            def to_seconds(t_str):
-                parts = t_str.split(':')
-                if len(parts) == 2:
-                    return int(parts[0]) * 60 + int(parts[1])
-                return 0
+        results = [False] * len(segments)
+        ranges, indexes = [], []
+        for index, (start, end) in enumerate(segments):
+            try:
+                ranges.append(_gif_range(start, end))
+                indexes.append(index)
+            except ValueError as e:
+                logger.warning('生成 GIF 失败: 时间范围 %s-%s 无效: %s', start, end, e)
+                if on_done:
+                    on_done(index, False)
+        output_gif_paths = [output_gif_paths[index] for index in indexes]
+        if not ranges:
+            return results
 
-            start_t = to_seconds(start_time_str)
-            end_t = to_seconds(end_time_str)
+        def done(index, ok):
+            # index 为有效时间段中的序号，回调和返回值使用原序号
+            results[indexes[index]] = ok
+            if on_done:
+                on_done(indexes[index], ok)
 
-            # 确保结束时间大于开始时间，且至少持续1秒
-            if end_t <= start_t:
-                end_t = start_t + 3
+        groups = _split_spans(ranges, workers) if workers > 1 else []
+        if len(groups) <= 1:
+            _write_gifs(input_video_path, ranges, output_gif_paths, width, fps, done)
+            return results
 
-            video = VideoFileClip(input_video_path)
-            
-            # 兼容不同版本的 MoviePy (v1.x 使用 subclip, v2.x 使用 subclipped)
-            if hasattr(video, 'subclipped'):
-                clip = video.subclipped(start_t, end_t)
-            else:
-                clip = video.subclip(start_t, end_t)
-            
-            # 调整大小以减小 GIF 体积
-            # 兼容不同版本的 MoviePy (v1.x 使用 resize, v2.x 使用 resized)
-            if hasattr(clip, 'resized'):
-                clip_resized = clip.resized(width=width)
-            elif hasattr(clip, 'resize'):
-                clip_resized = clip.resize(width=width)
-            else:
-                # 最后的回退方案：尝试从不同路径导入 resize
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(groups), mp_context=ctx) as executor:
+            futures = {
+                executor.submit(_write_gifs_worker, input_video_path, [ranges[i] for i in group],
+                                [output_gif_paths[i] for i in group], width, fps): group
+                for group in groups
+            }
+            for future in as_completed(futures):
+                group = futures[future]
                 try:
-                    from moviepy.video.fx.resize import resize
-                    clip_resized = resize(clip, width=width)
-                except ImportError:
-                    try:
-                        from moviepy.video.fx.all import resize
-                        clip_resized = resize(clip, width=width)
-                    except ImportError:
-                        print("Warning: Could not find resize effect, using original size")
-                        clip_resized = clip
-            
-            # 限制 FPS 以减小体积；兼容不同版本的 MoviePy 是否支持 program 参数
-            write_gif_kwargs = {"fps": 10, "logger": None}
-            try:
-                if "program" in inspect.signature(clip_resized.write_gif).parameters:
-                    write_gif_kwargs["program"] = "imageio"
-            except Exception:
-                # 如果无法获取签名则使用默认参数，避免因兼容性导致的异常
-                pass
-            clip_resized.write_gif(output_gif_path, **write_gif_kwargs)
-            
-            # 只有在非 clip_resized 的情况下手动关闭 clip_resized
-            if clip_resized is not clip:
-                clip_resized.close()
-                
-            return True
-        except Exception as e:
-            print(f"Error creating GIF: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-        finally:
-            if clip:
-                clip.close()
-            if video:
-                video.close()
+                    group_results = future.result()
+                except Exception:
+                    logger.exception('GIF 生成进程失败')
+                    group_results = [False] * len(group)
+                for index, ok in zip(group, group_results):
+                    done(index, ok)
+        return results
 
-    def analyze_video(self, input_video_path):
+    def analyze_video(self, input_video_path, progress=None):
+        """
+        progress(stage)：进入 compressing / analyzing 阶段时回调，供异步任务汇报进度
+        调用后 self.answered_model 记录实际给出结果的模型
+        """
+        self.answered_model = None
         with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as optimized_video_file:
             optimized_video_path = optimized_video_file.name
 
         try:
             # 1. Compress video
+            if progress:
+                progress('compressing')
             self.compress_video(input_video_path, optimized_video_path)
 
             # 2. Convert to Base64
@@ -274,11 +328,13 @@ class VideoAnalyzer:
                 video_b64 = base64.b64encode(f.read()).decode('utf-8')
 
             # 3. Call OpenRouter
+            if progress:
+                progress('analyzing')
             # 使用 google/gemini-2.0-flash-001，这是一个更稳定且支持视频的版本
             # 如果依然报错 404，可能是 OpenRouter 某些节点对 base64 视频支持不稳定
             try:
                 response = self.client.chat.completions.create(
-                    model="google/gemini-2.0-flash-001",
+                    model=self.MODEL,
                     messages=[
                         {
                             "role": "user",
@@ -294,12 +350,13 @@ class VideoAnalyzer:
                     response_format={"type": "json_object"},
                     timeout=180
                 )
+                self.answered_model = self.MODEL
             except Exception as e:
                 if "404" in str(e) or "No endpoints found" in str(e):
                     print("尝试使用备用模型或格式...")
                     # 尝试使用 Gemini 1.5 Flash 或更改类型为 image_url (有时 OpenRouter 这样处理)
                     response = self.client.chat.completions.create(
-                        model="google/gemini-flash-1.5",
+                        model=self.FALLBACK_MODEL,
                         messages=[
                             {
                                 "role": "user",
@@ -315,6 +372,7 @@ class VideoAnalyzer:
                         response_format={"type": "json_object"},
                         timeout=180
                     )
+                    self.answered_model = self.FALLBACK_MODEL
                 else:
                     raise e
             
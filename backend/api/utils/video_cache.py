@@ -0,0 +1,202 @@
+"""
+视频分析结果缓存
+同一个视频（例如同一条教程反复上传、前端重试）每次都要压缩、上传给模型并生成 GIF，耗时数十秒。
+上传写入临时文件的同时计算 SHA-256，按 (内容哈希, 模型, 提示词版本) 在数据库中查找已保存的
+训练计划和 GIF 文件名，命中时直接返回；模型或提示词变化后旧结果自然不再命中。
+淘汰策略：超过 TTL 未使用的条目删除；条目数或 GIF 总大小超过上限时按最近使用时间从旧到新删除。
+被删除条目的 GIF 如果已被某个训练计划引用（WorkoutExercise.gif_url）则保留文件
+"""
+import hashlib
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GIF_SUBDIR = 'workout_gifs'
+
+
+class UploadHasher:
+    """边写入边计算哈希：for chunk in upload.chunks(): hasher.update(chunk); f.write(chunk)"""
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def gif_path(filename):
+    from django.conf import settings
+    return os.path.join(settings.MEDIA_ROOT, GIF_SUBDIR, filename)
+
+
+def strip_gif_urls(workout_data):
+    """拆出与 exercises 对应的 GIF 文件名列表，返回 (不含 gif_url 的结果, 文件名列表)"""
+    data = dict(workout_data)
+    exercises = []
+    gif_files = []
+    for exercise in workout_data.get('exercises', []):
+        exercise = dict(exercise)
+        url = exercise.pop('gif_url', None)
+        exercises.append(exercise)
+        gif_files.append(url.rsplit('/', 1)[-1] if url else None)
+    data['exercises'] = exercises
+    return data, gif_files
+
+
+class VideoResultCache:
+    """
+    用法：
+        entry = cache.lookup(content_hash, model, prompt_version)
+        if entry is None:
+            ... 分析并生成 GIF ...
+            cache.store(content_hash, model, prompt_version, workout_data, video_size)
+    GIF 文件名每次生成都是唯一的，不同条目之间不共享文件
+    ttl_days / max_entries / max_gif_mb 为 0 时不限制对应项；enabled=False 时 lookup 始终未命中、store 不保存
+    """
+
+    def __init__(self, ttl_days=30, max_entries=200, max_gif_mb=500, enabled=True):
+        self.ttl = timedelta(days=ttl_days) if ttl_days > 0 else None
+        self.max_entries = max_entries
+        self.max_gif_bytes = int(max_gif_mb * 1024 * 1024)
+        self.enabled = enabled
+
+    def lookup(self, content_hash, model, prompt_version):
+        """命中时更新最近使用时间和命中次数并返回条目，否则返回 None"""
+        if not self.enabled:
+            return None
+        from ..models import VideoAnalysisCache
+        try:
+            entry = VideoAnalysisCache.objects.filter(
+                content_hash=content_hash, model=model, prompt_version=prompt_version
+            ).first()
+        except DatabaseError as e:
+            # 缓存表不可用（例如尚未迁移）时按未命中处理，不影响分析本身
+            logger.warning('查询视频分析缓存失败: %s', e)
+            entry = None
+        if entry is not None and self.ttl is not None and entry.last_used_at < timezone.now() - self.ttl:
+            self._delete([entry])
+            entry = None
+        if entry is None:
+            return None
+        now = timezone.now()
+        VideoAnalysisCache.objects.filter(pk=entry.pk).update(last_used_at=now, hit_count=F('hit_count') + 1)
+        entry.last_used_at = now
+        entry.hit_count += 1
+        return entry
+
+    def store(self, content_hash, model, prompt_version, workout_data, video_size=0):
+        """保存分析结果（workout_data 中的 gif_url 拆为文件名保存），并执行一次淘汰"""
+        if not self.enabled:
+            return None
+        from ..models import VideoAnalysisCache
+        data, gif_files = strip_gif_urls(workout_data)
+        defaults = {
+            'workout_data': data,
+            'gif_files': gif_files,
+            'video_size': video_size,
+            'gif_size': self._gif_size(gif_files),
+            'last_used_at': timezone.now(),
+        }
+        try:
+            with transaction.atomic():
+                entry, _ = VideoAnalysisCache.objects.update_or_create(
+                    content_hash=content_hash, model=model, prompt_version=prompt_version, defaults=defaults
+                )
+        except IntegrityError:
+            # 并发上传同一视频时另一个请求已经写入，保留先写入的结果
+            return None
+        except DatabaseError as e:
+            logger.warning('保存视频分析缓存失败: %s', e)
+            return None
+        self.evict()
+        return entry
+
+    def update_gifs(self, entry, gif_files):
+        """命中但部分 GIF 文件已被删除、重新生成后更新条目"""
+        entry.gif_files = gif_files
+        entry.gif_size = self._gif_size(gif_files)
+        entry.save(update_fields=['gif_files', 'gif_size'])
+
+    def evict(self):
+        """删除过期条目，再按最近使用时间淘汰超出条目数或 GIF 总大小上限的条目"""
+        from ..models import VideoAnalysisCache
+        evicted = []
+        if self.ttl is not None:
+            evicted.extend(VideoAnalysisCache.objects.filter(last_used_at__lt=timezone.now() - self.ttl))
+
+        remaining = VideoAnalysisCache.objects.exclude(pk__in=[entry.pk for entry in evicted])
+        count = remaining.count()
+        total = remaining.aggregate(total=Sum('gif_size'))['total'] or 0
+        over_count = self.max_entries > 0 and count > self.max_entries
+        over_size = self.max_gif_bytes > 0 and total > self.max_gif_bytes
+        if over_count or over_size:
+            for entry in remaining.order_by('last_used_at').only('pk', 'gif_files', 'gif_size'):
+                if not ((self.max_entries > 0 and count > self.max_entries)
+                        or (self.max_gif_bytes > 0 and total > self.max_gif_bytes)):
+                    break
+                evicted.append(entry)
+                count -= 1
+                total -= entry.gif_size
+
+        if evicted:
+            self._delete(evicted)
+            logger.info('视频分析缓存淘汰 %d 个条目', len(evicted))
+        return len(evicted)
+
+    def _delete(self, entries):
+        from ..models import VideoAnalysisCache, WorkoutExercise
+        VideoAnalysisCache.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+        for entry in entries:
+            for filename in entry.gif_files or []:
+                if not filename:
+                    continue
+                # 已保存为训练计划的动作仍引用该 GIF，保留文件
+                if WorkoutExercise.objects.filter(gif_url__endswith=f'/{GIF_SUBDIR}/{filename}').exists():
+                    continue
+                try:
+                    os.remove(gif_path(filename))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning('删除缓存 GIF %s 失败: %s', filename, e)
+
+    @staticmethod
+    def _gif_size(gif_files):
+        size = 0
+        for filename in gif_files:
+            if filename and os.path.exists(gif_path(filename)):
+                size += os.path.getsize(gif_path(filename))
+        return size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_video_result_cache():
+    """按 settings 创建的全局视频分析结果缓存"""
+    global _cache
+    if _cache is not None:
+        return _cache
+    from django.conf import settings
+    with _cache_lock:
+        if _cache is None:
+            _cache = VideoResultCache(
+                ttl_days=getattr(settings, 'VIDEO_CACHE_TTL_DAYS', 30),
+                max_entries=getattr(settings, 'VIDEO_CACHE_MAX_ENTRIES', 200),
+                max_gif_mb=getattr(settings, 'VIDEO_CACHE_MAX_GIF_MB', 500),
+                enabled=getattr(settings, 'VIDEO_CACHE', True),
+            )
+    return _cache
@@ -0,0 +1,351 @@
+"""
+视频分析任务
+analyze-video 的完整流程（压缩 -> 调用模型 -> 逐个动作生成 GIF）耗时从数十秒到数分钟，
+同步执行时整段时间占用一个 WSGI 工作线程。异步模式下接口只保存上传并在数据库中登记任务（VideoAnalysisJob），
+由独立的 worker 进程（python manage.py video_worker）按提交顺序领取执行，并把所处阶段和进度写回任务记录，
+前端轮询 /api/analyze-video/jobs/<job_id>/ 获取进度和结果。不依赖外部消息队列。
+同步和异步模式共用 analyze_workout_video，结果缓存对两者都生效；所有动作的 GIF 在一次视频读取中生成
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .video_analyzer import VideoAnalyzer
+from .video_cache import GIF_SUBDIR, get_video_result_cache
+
+logger = logging.getLogger(__name__)
+
+INLINE_WORKER_PREFIX = 'inline:'
+
+# 各阶段开始时的总进度（百分比）；generating_gifs 阶段按已完成的 GIF 数在 70~100 之间推进
+STAGE_PROGRESS = {
+    'queued': 0,
+    'compressing': 5,
+    'analyzing': 25,
+    'generating_gifs': 70,
+    'completed': 100,
+}
+
+
+def gif_dir():
+    from django.conf import settings
+    path = os.path.join(settings.MEDIA_ROOT, GIF_SUBDIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def create_exercise_gifs(video_path, exercises, on_done=None):
+    """
+    一次读取视频为多个动作生成 GIF（VideoAnalyzer.create_gifs），返回 (文件名列表, 耗时秒数)
+    生成失败的动作对应 None；VIDEO_GIF_WORKERS > 1 时按时间范围分给多个进程
+    """
+    from django.conf import settings
+    directory = gif_dir()
+    # 生成唯一的 GIF 文件名
+    filenames = [f"ex_{uuid.uuid4().hex[:8]}.gif" for _ in exercises]
+    segments = [(exercise.get('start_time', '00:00'), exercise.get('end_time', '00:05')) for exercise in exercises]
+    start = time.perf_counter()
+    results = VideoAnalyzer.create_gifs(
+        video_path, segments, [os.path.join(directory, filename) for filename in filenames],
+        workers=getattr(settings, 'VIDEO_GIF_WORKERS', 0), on_done=on_done,
+    )
+    duration = time.perf_counter() - start
+    return [filename if ok else None for filename, ok in zip(filenames, results)], duration
+
+
+def exercise_gif_url(media_url, gif_filename):
+    """media_url 为 MEDIA_URL 的绝对地址（请求处理时由 request.build_absolute_uri 得到）"""
+    return f'{media_url}{GIF_SUBDIR}/{gif_filename}'
+
+
+def restore_cached_workout(cache, entry, video_path, media_url):
+    """
+    用缓存条目还原分析结果并补上 gif_url，返回 (workout_data, GIF 生成耗时)
+    GIF 文件已被删除（例如手动清理媒体目录）时用本次上传的视频重新生成
+    """
+    workout_data = entry.workout_data
+    gif_files = list(entry.gif_files)
+    exercises = workout_data.get('exercises', [])
+    gif_files += [None] * (len(exercises) - len(gif_files))
+    missing = [
+        index for index, gif_filename in enumerate(gif_files)
+        if gif_filename and not os.path.exists(os.path.join(gif_dir(), gif_filename))
+    ]
+    gif_seconds = 0.0
+    if missing:
+        regenerated, gif_seconds = create_exercise_gifs(video_path, [exercises[index] for index in missing])
+        for index, gif_filename in zip(missing, regenerated):
+            gif_files[index] = gif_filename
+        cache.update_gifs(entry, gif_files)
+    for exercise, gif_filename in zip(exercises, gif_files):
+        if gif_filename:
+            exercise['gif_url'] = exercise_gif_url(media_url, gif_filename)
+    return workout_data, gif_seconds
+
+
+def analyze_workout_video(video_path, content_hash, video_size, media_url, progress=None):
+    """
+    分析视频并为每个动作生成 GIF，返回 (workout_data, cached, gif_seconds)；分析失败时 workout_data 为 None
+    gif_seconds 为本次请求生成 GIF 的总耗时
+    progress(stage, percent)：阶段变化及 GIF 生成进度回调
+    """
+    def report(stage, percent=None):
+        if progress:
+            progress(stage, STAGE_PROGRESS[stage] if percent is None else percent)
+
+    analyzer = VideoAnalyzer()
+    cache = get_video_result_cache()
+    cache_key = (content_hash, analyzer.MODEL, analyzer.prompt_version)
+    entry = cache.lookup(*cache_key)
+    if entry is not None:
+        workout_data, gif_seconds = restore_cached_workout(cache, entry, video_path, media_url)
+        return workout_data, True, gif_seconds
+
+    workout_data = analyzer.analyze_video(video_path, progress=report)
+    if not workout_data:
+        return None, False, 0.0
+
+    # 为所有动作生成 GIF
+    exercises = workout_data.get('exercises', [])
+    start = STAGE_PROGRESS['generating_gifs']
+    report('generating_gifs')
+    finished = []
+
+    def gif_done(index, ok):
+        finished.append(index)
+        report('generating_gifs', start + (100 - start) * len(finished) / (len(exercises) + 1))
+
+    gif_files, gif_seconds = create_exercise_gifs(video_path, exercises, on_done=gif_done)
+    for exercise, gif_filename in zip(exercises, gif_files):
+        if gif_filename:
+            # 记录 GIF 的绝对 URL
+            exercise['gif_url'] = exercise_gif_url(media_url, gif_filename)
+
+    # 缓存只按主模型查找；备用模型给出的结果不写入，避免以主模型的名义被复用
+    if analyzer.answered_model == analyzer.MODEL:
+        cache.store(*cache_key, workout_data, video_size=video_size)
+    return workout_data, False, gif_seconds
+
+
+def job_upload_path(job_id):
+    from django.conf import settings
+    os.makedirs(settings.VIDEO_JOB_DIR, exist_ok=True)
+    return os.path.join(settings.VIDEO_JOB_DIR, f'{job_id}.mp4')
+
+
+def job_snapshot(job):
+    """任务状态（接口返回的 data）；排队中的任务附带前面还有多少个任务"""
+    from ..models import VideoAnalysisJob
+    data = {
+        'job_id': str(job.job_id),
+        'status': job.status,
+        'stage': job.stage,
+        'progress': round(job.progress, 1),
+        'cached': job.cached,
+        'gif_seconds': job.gif_seconds,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == 'queued':
+        data['queue_position'] = VideoAnalysisJob.objects.filter(
+            status__in=('queued', 'running'), created_at__lt=job.created_at
+        ).count()
+    if job.status == 'completed':
+        data['result'] = job.result
+    if job.status == 'failed':
+        data['error'] = job.error
+    return data
+
+
+def claim_next_job(worker):
+    """
+    领取最早提交的排队任务；多个 worker 同时领取时以条件更新保证只有一个成功
+    没有可领取的任务时返回 None
+    """
+    from ..models import VideoAnalysisJob
+    while True:
+        job = VideoAnalysisJob.objects.filter(status='queued').order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = VideoAnalysisJob.objects.filter(pk=job.pk, status='queued').update(
+            status='running', worker=worker, started_at=timezone.now(), updated_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """执行一个已领取的任务，结束后删除上传的视频"""
+    from ..models import VideoAnalysisJob
+    last_saved = [0.0]
+
+    def progress(stage, percent):
+        # 阶段变化立即写入，同一阶段内的进度更新至少间隔 0.5 秒，避免频繁写库
+        now = time.monotonic()
+        if stage == job.stage and now - last_saved[0] < 0.5:
+            return
+        last_saved[0] = now
+        job.stage = stage
+        job.progress = percent
+        VideoAnalysisJob.objects.filter(pk=job.pk).update(stage=stage, progress=percent, updated_at=timezone.now())
+
+    start = time.perf_counter()
+    try:
+        workout_data, cached, gif_seconds = analyze_workout_video(
+            job.video_path, job.content_hash, job.video_size, job.media_url, progress=progress
+        )
+        job.gif_seconds = round(gif_seconds, 3)
+        if workout_data:
+            job.status, job.stage, job.progress = 'completed', 'completed', 100
+            job.result, job.cached = workout_data, cached
+        else:
+            job.status = 'failed'
+            job.error = '视频分析失败，请稍后重试'
+    except Exception as e:
+        logger.exception('视频分析任务 %s 失败', job.job_id)
+        job.status = 'failed'
+        job.error = f'服务器内部错误: {str(e)}'
+    job.finished_at = timezone.now()
+    job.save()
+    logger.info('视频分析任务 %s %s，耗时 %.1fs（排队 %.1fs，GIF %.1fs）', job.job_id, job.status,
+                time.perf_counter() - start, max((job.started_at - job.created_at).total_seconds(), 0), job.gif_seconds or 0)
+
+    try:
+        os.remove(job.video_path)
+    except OSError:
+        pass
+    return job
+
+
+def requeue_stale_jobs(stale_after, max_attempts):
+    """
+    worker 异常退出时其任务会一直停在 running：
+    - 执行该任务的 worker 已没有心跳，或超过 stale_after 秒没有进度更新的任务重新排队，已尝试 max_attempts 次的标记为失败
+    - 在请求内执行（sync 模式）的任务超过 stale_after 秒没有进度更新，说明 Web 进程已退出，直接标记为失败
+    """
+    from django.db.models import Q
+    from ..models import VideoAnalysisJob
+    now = timezone.now()
+    deadline = now - timedelta(seconds=stale_after)
+    running = VideoAnalysisJob.objects.filter(status='running')
+    inline = running.filter(worker__startswith=INLINE_WORKER_PREFIX)
+    inline.filter(updated_at__lt=deadline).update(
+        status='failed', error='视频分析被中断', finished_at=now
+    )
+    # 刚领取、尚未写入进度的任务不因心跳判断被重新排队
+    orphaned = Q(updated_at__lt=now - worker_timeout()) & ~Q(worker__in=live_workers())
+    stale = running.exclude(worker__startswith=INLINE_WORKER_PREFIX).filter(Q(updated_at__lt=deadline) | orphaned)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='视频分析任务多次中断', finished_at=now
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status='queued', stage='queued', progress=0, worker=''
+    )
+    return requeued, failed
+
+
+def fail_unserved_job(job):
+    """
+    排队中的任务在没有存活 worker 的情况下等待超过心跳超时，标记为失败并删除上传，
+    避免客户端无限轮询（由查询任务状态的请求调用）
+    """
+    from ..models import VideoAnalysisJob
+    if job.status != 'queued' or job.created_at > timezone.now() - worker_timeout() or worker_alive():
+        return job
+    updated = VideoAnalysisJob.objects.filter(pk=job.pk, status='queued').update(
+        status='failed', error='没有运行中的视频分析 worker，请稍后重新上传', finished_at=timezone.now()
+    )
+    if updated:
+        try:
+            os.remove(job.video_path)
+        except OSError:
+            pass
+    job.refresh_from_db()
+    return job
+
+
+def purge_finished_jobs(retention_days):
+    """删除完成超过 retention_days 天的任务记录及残留的上传文件"""
+    from ..models import VideoAnalysisJob
+    expired = VideoAnalysisJob.objects.filter(
+        status__in=('completed', 'failed'), finished_at__lt=timezone.now() - timedelta(days=retention_days)
+    )
+    for video_path in expired.values_list('video_path', flat=True):
+        if video_path and os.path.exists(video_path):
+            os.remove(video_path)
+    return expired.delete()[0]
+
+
+def worker_name(inline=False):
+    """worker 进程名为 主机名:pid；在 Web 请求内执行的任务记为 inline:主机名:pid"""
+    name = f'{socket.gethostname()}:{os.getpid()}'
+    return INLINE_WORKER_PREFIX + name if inline else name
+
+
+def worker_timeout():
+    """超过该时长没有心跳的 worker 视为已退出"""
+    from django.conf import settings
+    return timedelta(seconds=settings.VIDEO_WORKER_TIMEOUT_SECONDS)
+
+
+def touch_worker(name):
+    """记录 worker 心跳"""
+    from ..models import VideoWorker
+    VideoWorker.objects.update_or_create(name=name, defaults={'last_seen': timezone.now()})
+
+
+def remove_worker(name):
+    from ..models import VideoWorker
+    VideoWorker.objects.filter(name=name).delete()
+
+
+def live_workers():
+    """心跳未超时的 worker 名称列表"""
+    from ..models import VideoWorker
+    return list(VideoWorker.objects.filter(
+        last_seen__gte=timezone.now() - worker_timeout()
+    ).values_list('name', flat=True))
+
+
+def worker_alive():
+    return bool(live_workers())
+
+
+def video_job_stats():
+    """
+    视频分析统计，由任务记录计算（worker 进程与 Web 进程的内存指标互不可见，且 worker 重启后会清零）
+    同步和异步模式的每次分析都对应一条任务记录；覆盖最近 VIDEO_JOB_RETENTION_DAYS 天
+    """
+    from django.db.models import Avg, Count, Max, Q
+    from ..models import VideoAnalysisJob
+    jobs = VideoAnalysisJob.objects.aggregate(
+        queued=Count('pk', filter=Q(status='queued')),
+        running=Count('pk', filter=Q(status='running')),
+        completed=Count('pk', filter=Q(status='completed')),
+        failed=Count('pk', filter=Q(status='failed')),
+        cache_hits=Count('pk', filter=Q(status='completed', cached=True)),
+        gif_seconds_mean=Avg('gif_seconds', filter=Q(status='completed', cached=False)),
+        gif_seconds_max=Max('gif_seconds', filter=Q(status='completed', cached=False)),
+    )
+    finished = jobs['completed'] + jobs['failed']
+    return {
+        'video_jobs_queued': jobs['queued'],
+        'video_jobs_running': jobs['running'],
+        'video_jobs_completed': jobs['completed'],
+        'video_jobs_failed': jobs['failed'],
+        'video_cache_hits': jobs['cache_hits'],
+        # 失败的任务都没有命中缓存（命中时直接返回结果）
+        'video_cache_hit_rate': round(jobs['cache_hits'] / finished, 4) if finished else None,
+        'video_gif_seconds_mean': round(jobs['gif_seconds_mean'], 3) if jobs['gif_seconds_mean'] is not None else None,
+        'video_gif_seconds_max': jobs['gif_seconds_max'],
+        'video_workers': len(live_workers()),
+    }
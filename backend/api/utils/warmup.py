@@ -0,0 +1,130 @@
+"""
+姿态模型预热
+MediaPipe 检测器在首次 process() 时才构建计算图、加载模型，部署或进程重启后的第一批请求会多出几百毫秒。
+Web 进程启动时（ApiConfig.ready）在后台线程中为每个推理线程（或推理进程池的每个进程）创建配置的检测器，
+并用一张空白图像跑一次推理；/api/ready/ 在预热完成前返回 503，负载均衡只把流量转发给已预热的进程
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .complexity_controller import get_complexity_controller
+from .metrics import metrics
+from .pose_analysis import ModelUnavailable, get_pose_detector
+from .pose_pipeline import get_pose_pipeline
+from .pose_pool import get_pose_pool
+
+logger = logging.getLogger(__name__)
+
+WARMUP_IMAGE_SIZE = (256, 256)
+
+
+class WarmupState:
+    """预热状态：pending -> warming -> ready / failed；未启用预热时为 disabled"""
+
+    def __init__(self):
+        self.state = 'pending'
+        self.detectors = []
+        self.errors = []
+        self.duration = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state in ('ready', 'disabled')
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'detectors': list(self.detectors),
+            'errors': list(self.errors),
+            'duration_ms': round(self.duration * 1000, 1) if self.duration is not None else None,
+        }
+
+    def start(self, levels):
+        """在后台线程中预热，重复调用不会重复执行"""
+        with self._lock:
+            if self.state != 'pending':
+                return
+            self.state = 'warming'
+            self._thread = threading.Thread(target=self._run, args=(levels,), name='pose-warmup', daemon=True)
+            self._thread.start()
+
+    def disable(self):
+        with self._lock:
+            if self.state == 'pending':
+                self.state = 'disabled'
+
+    def _run(self, levels):
+        start = time.perf_counter()
+        controller = get_complexity_controller()
+        for level in levels:
+            try:
+                self.detectors.extend(warm_up_level(level))
+            except ModelUnavailable as e:
+                # 非默认档位不可用不影响就绪，自适应控制器以后直接跳过该档位
+                controller.mark_unavailable(level, e.reason)
+                self.errors.append(str(e))
+            except Exception as e:
+                logger.exception('模型复杂度 %d 预热失败', level)
+                self.errors.append(f'model_complexity={level}: {e}')
+        self.duration = time.perf_counter() - start
+        warmed_levels = {detector['model_complexity'] for detector in self.detectors}
+        self.state = 'ready' if controller.default in warmed_levels else 'failed'
+        metrics.observe('pose_warmup', self.duration)
+        metrics.set_gauge('pose_warm_detectors', len(self.detectors))
+        logger.info('姿态模型预热%s: %d 个检测器，耗时 %.0fms',
+                    '完成' if self.state == 'ready' else '失败', len(self.detectors), self.duration * 1000)
+
+
+def warm_up_level(level):
+    """
+    为指定复杂度创建检测器并各跑一次空白图像推理
+    配置了推理进程池时预热每个工作进程，否则预热推理阶段的每个线程（检测器按线程缓存）
+    返回已预热的检测器描述列表
+    """
+    image = np.zeros((*WARMUP_IMAGE_SIZE, 3), dtype=np.uint8)
+    pool = get_pose_pool()
+    if pool is not None:
+        # 同时提交与进程数相同的帧，每个空闲工作进程各处理一帧
+        pool.process_many([image] * len(pool.worker_pids), model_complexity=level)
+        return [{'model_complexity': level, 'worker': 'process', 'pid': pid} for pid in pool.worker_pids]
+
+    pipeline = get_pose_pipeline()
+    threads = pipeline.workers['infer']
+    if threads <= 0:
+        # 未启用推理阶段线程池时检测器属于各个请求线程，这里只能提前完成模型文件的加载与缓存
+        get_pose_detector(level).process(image)
+        return [{'model_complexity': level, 'worker': threading.current_thread().name}]
+
+    # 每个任务推理后在栅栏处等待，保证 threads 个任务分别落在不同的推理线程上
+    barrier = threading.Barrier(threads)
+
+    def warm(_):
+        get_pose_detector(level).process(image)
+        barrier.wait(timeout=120)
+        return threading.current_thread().name
+
+    names = pipeline.map('infer', warm, range(threads))
+    return [{'model_complexity': level, 'worker': name} for name in names]
+
+
+# 进程内共享的预热状态
+warmup_state = WarmupState()
+
+
+def start_warmup():
+    """按 settings 启动预热；POSE_WARMUP=0 时直接视为就绪"""
+    from django.conf import settings
+    if not getattr(settings, 'POSE_WARMUP', True):
+        warmup_state.disable()
+        return warmup_state
+    default = get_complexity_controller().default
+    levels = getattr(settings, 'POSE_WARMUP_COMPLEXITY_LEVELS', None) or (default,)
+    # 默认档位先预热；其他档位的检测器也在接收流量前建好，控制器切换档位时不再临时加载模型
+    warmup_state.start(sorted(set(levels) | {default}, key=lambda level: level != default))
+    return warmup_state
@@ -2,29 +2,53 @@ import re
 import requests
 import os
 import tempfile
-import uuid
 from django.conf import settings
 from bs4 import BeautifulSoup
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+import logging
 import json
 import cv2
-import mediapipe as mp
-import numpy as np
 import base64
+import time
+import uuid
+import numpy as np
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.db import DatabaseError
 from django.db.models import Sum, Count, Q, Max
-from .utils.video_analyzer import VideoAnalyzer
 from .utils.coach_agent import CoachAgent
-from .utils.action_classifier import detect_action, ACTION_CATEGORIES
-from .models import WorkoutPlan, WorkoutLog, WorkoutExercise
+from .utils.pose_analysis import (
+    RETURN_IMAGE_MODES, LANDMARK_FORMATS, get_pose_detector, get_tracking_detector, decode_frame, build_pose_result,
+)
+from .utils.pose_math import NUM_LANDMARKS, results_to_array
+from .utils.frame_scheduler import pose_scheduler, FrameSuperseded
+from .utils.pose_pool import get_pose_pool, PoolPoseResults
+from .utils.pose_detectors import DETECTORS
+from .utils.rep_counter import RepCounter, rep_sessions, frames_to_array, landmark_indices, measure_frames
+from .utils.training_video import analyze_training_video, resolve_exercise_type
+from .utils.metrics import metrics
+from .utils.roi_tracker import roi_tracker
+from .utils.complexity_controller import get_complexity_controller, run_with_complexity
+from .utils.static_frames import get_static_frame_cache, frame_fingerprint
+from .utils.pose_pipeline import get_pose_pipeline
+from .utils.warmup import start_warmup
+from .utils.frame_sampler import resize_frame
+from .utils.video_cache import UploadHasher
+from .utils.video_jobs import (
+    fail_unserved_job, job_snapshot, job_upload_path, run_job, video_job_stats, worker_alive, worker_name,
+)
+from .models import WorkoutPlan, WorkoutLog, WorkoutExercise, VideoAnalysisJob
+from .parsers import RawFrameParser, ImageFrameParser
+from .renderers import OrjsonRenderer, MessagePackRenderer, PrometheusTextRenderer
 
 from rest_framework import viewsets
 from .serializers import WorkoutPlanSerializer, WorkoutLogSerializer
 
+logger = logging.getLogger(__name__)
+
 class WorkoutPlanViewSet(viewsets.ModelViewSet):
     queryset = WorkoutPlan.objects.all()
     serializer_class = WorkoutPlanSerializer
@@ -163,6 +187,12 @@ class WorkoutLogViewSet(viewsets.ModelViewSet):
 def analyze_video_content(request):
     """
     分析上传的视频，提取健身动作
+    - mode=async：保存上传并登记任务后立即返回 202 和 job_id，由 video_worker 进程执行，
+      进度和结果通过 /api/analyze-video/jobs/<job_id>/ 查询；没有存活的 worker 时返回 503
+    - mode=sync：在请求内完成分析
+    - 未指定时取 VIDEO_ANALYSIS_MODE（默认 auto：有存活 worker 时 async，否则 sync）
+    两种模式都登记任务记录（统计见 /api/metrics/）；上传写入磁盘时同时计算 SHA-256，
+    同一视频（相同模型和提示词版本）再次上传时直接返回缓存结果
     """
     try:
         video_file = request.FILES.get('video')
@@ -172,53 +202,58 @@ def analyze_video_content(request):
                 'error': '请上传视频文件'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # 确保媒体目录存在
-        gif_dir = os.path.join(settings.MEDIA_ROOT, 'workout_gifs')
-        if not os.path.exists(gif_dir):
-            os.makedirs(gif_dir)
+        mode = request.data.get('mode') or request.query_params.get('mode') or settings.VIDEO_ANALYSIS_MODE
+        if mode not in ('async', 'sync', 'auto'):
+            return Response({
+                'success': False,
+                'error': 'mode 只能是 async、sync 或 auto'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if mode != 'sync':
+            alive = worker_alive()
+            if mode == 'async' and not alive:
+                return Response({
+                    'success': False,
+                    'error': '没有运行中的视频分析 worker，请使用 mode=sync 或启动 python manage.py video_worker'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            mode = 'async' if alive else 'sync'
 
-        # 保存临时文件
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
+        # 上传写入任务目录，同时计算内容哈希；任务执行完成后删除
+        job = VideoAnalysisJob(media_url=request.build_absolute_uri(settings.MEDIA_URL))
+        job.video_path = job_upload_path(job.job_id)
+        hasher = UploadHasher()
+        with open(job.video_path, 'wb') as f:
             for chunk in video_file.chunks():
-                temp_video.write(chunk)
-            temp_video_path = temp_video.name
+                hasher.update(chunk)
+                f.write(chunk)
+        job.content_hash = hasher.hexdigest()
+        job.video_size = hasher.size
 
-        try:
-            analyzer = VideoAnalyzer()
-            workout_data = analyzer.analyze_video(temp_video_path)
-            
-            if workout_data:
-                # 为每个动作生成 GIF
-                exercises = workout_data.get('exercises', [])
-                for exercise in exercises:
-                    start_time = exercise.get('start_time', '00:00')
-                    end_time = exercise.get('end_time', '00:05')
-                    
-                    # 生成唯一的 GIF 文件名
-                    gif_filename = f"ex_{uuid.uuid4().hex[:8]}.gif"
-                    gif_path = os.path.join(gif_dir, gif_filename)
-                    
-                    if analyzer.create_gif(temp_video_path, start_time, end_time, gif_path):
-                        # 记录 GIF 的相对 URL
-                        exercise['gif_url'] = request.build_absolute_uri(settings.MEDIA_URL + 'workout_gifs/' + gif_filename)
-                
-                return Response({
-                    'success': True,
-                    'data': workout_data
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    'success': False,
-                    'error': '视频分析失败，请稍后重试'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if os.path.exists(temp_video_path):
-                import time
-                time.sleep(0.2) # 给 Windows 一点时间释放句柄
-                try:
-                    os.remove(temp_video_path)
-                except Exception as e:
-                    print(f"Warning: Could not remove temp video {temp_video_path}: {e}")
+        if mode == 'async':
+            job.save()
+            return Response({
+                'success': True,
+                'data': job_snapshot(job)
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # 在请求内执行：直接以 running 状态登记，worker 不会领取
+        job.status = 'running'
+        job.worker = worker_name(inline=True)
+        job.started_at = timezone.now()
+        job.attempts = 1
+        job.save()
+        job = run_job(job)
+        if job.status == 'completed':
+            return Response({
+                'success': True,
+                'data': job.result,
+                'cached': job.cached,
+                'content_hash': job.content_hash,
+                'gif_seconds': job.gif_seconds
+            }, status=status.HTTP_200_OK)
+        return Response({
+            'success': False,
+            'error': job.error
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     except Exception as e:
         import traceback
@@ -229,6 +264,25 @@ def analyze_video_content(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+def video_analysis_job(request, job_id):
+    """
+    异步视频分析任务的状态：status（queued/running/completed/failed）、stage、progress（0~100）
+    排队中附带 queue_position，完成后 result 与同步模式的 data 相同，失败时附带 error
+    没有存活的 worker 时，排队超过心跳超时的任务标记为失败，客户端不会无限轮询
+    """
+    job = VideoAnalysisJob.objects.filter(job_id=job_id).first()
+    if job is None:
+        return Response({
+            'success': False,
+            'error': '任务不存在'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'success': True,
+        'data': job_snapshot(fail_unserved_job(job))
+    })
+
+
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 def evaluate_complete_training(request):
@@ -239,12 +293,21 @@ def evaluate_complete_training(request):
     - workout_plan: 训练计划信息（JSON字符串，包含所有动作信息）
     - plan_id: 训练计划ID（可选，用于关联）
     - log_id: 训练记录ID（可选，如果提供则更新该记录）
+    - analysis_mode: remote（默认，大模型评价）/ local（仅本地姿态分析）/ both
+    - exercise_type: 本地分析使用的动作类型（可选，默认取训练计划中第一个动作的类别）
+    - stride: 本地分析的抽帧步长（可选）
     """
     try:
         video_file = request.FILES.get('video')
         workout_plan_str = request.data.get('workout_plan', '[]')
         plan_id = request.data.get('plan_id')
         log_id = request.data.get('log_id')
+        analysis_mode = request.data.get('analysis_mode', 'remote')
+        if analysis_mode not in ('remote', 'local', 'both'):
+            return Response({
+                'success': False,
+                'error': 'analysis_mode 必须是 remote/local/both 之一'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         if not video_file:
             return Response({
@@ -252,6 +315,16 @@ def evaluate_complete_training(request):
                 'error': '请提供视频文件'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            stride = int(request.data.get('stride') or settings.VIDEO_POSE_STRIDE)
+            if stride < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': 'stride 必须是大于 0 的整数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         # 保存临时视频文件
         with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
             for chunk in video_file.chunks():
@@ -268,12 +341,29 @@ def evaluate_complete_training(request):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # 调用CoachAgent进行综合评价
-            coach = CoachAgent()
-            feedback_data = coach.analyze_complete_training(
-                temp_video_path,
-                workout_plan
-            )
+            # 本地姿态分析：次数、动作片段、幅度与规则评分，不需要调用大模型
+            local_analysis = None
+            if analysis_mode in ('local', 'both'):
+                exercise_type = resolve_exercise_type(workout_plan, request.data.get('exercise_type'))
+                target_reps = next((ex.get('reps_per_set') for ex in workout_plan
+                                    if isinstance(ex, dict) and ex.get('category') == exercise_type), None)
+                local_analysis = analyze_training_video(
+                    temp_video_path, exercise_type,
+                    stride=stride,
+                    target_reps=target_reps,
+                )
+
+            if analysis_mode == 'local':
+                feedback_data = dict(local_analysis)
+            else:
+                # 调用CoachAgent进行综合评价
+                coach = CoachAgent()
+                feedback_data = coach.analyze_complete_training(
+                    temp_video_path,
+                    workout_plan
+                )
+                if local_analysis is not None:
+                    feedback_data['local_analysis'] = local_analysis
 
             # 添加计划相关信息
             feedback_data['plan_id'] = plan_id
@@ -285,7 +375,11 @@ def evaluate_complete_training(request):
                     workout_log = WorkoutLog.objects.get(id=log_id)
                     workout_log.ai_score = feedback_data.get('score', 0)
                     workout_log.ai_feedback = feedback_data.get('improvement_advice', '') + "\n\n" + feedback_data.get('coach_comment', '')
-                    workout_log.save(update_fields=['ai_score', 'ai_feedback'])
+                    update_fields = ['ai_score', 'ai_feedback']
+                    if local_analysis is not None:
+                        workout_log.video_analysis = local_analysis
+                        update_fields.append('video_analysis')
+                    workout_log.save(update_fields=update_fields)
                     feedback_data['log_id'] = workout_log.id
                 except WorkoutLog.DoesNotExist:
                     pass
@@ -418,111 +512,256 @@ def analyze_douyin(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-# 初始化 MediaPipe 模块
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-
-# 使用线程局部存储，确保多线程环境下的安全性
-import threading
-thread_local = threading.local()
-
-def get_pose_detector():
-    """获取当前线程的 Pose 检测器实例"""
-    if not hasattr(thread_local, 'pose_detector'):
-        # model_complexity: 0=Lite, 1=Full, 2=Heavy. 
-        # 实时应用建议使用 0 或 1。此处改为 1 平衡速度与精度。
-        thread_local.pose_detector = mp_pose.Pose(
-            static_image_mode=True,
-            model_complexity=1,
-            enable_segmentation=False,
-            min_detection_confidence=0.3 # 降低置信度阈值，提高检出率
-        )
-    return thread_local.pose_detector
+def get_pose_option(request, name, default=None):
+    """
+    读取姿态分析请求参数
+    JSON/表单请求从请求体读取；二进制帧请求的参数放在查询参数或 X-<Name> 请求头中
+    """
+    if isinstance(request.data, dict):
+        value = request.data.get(name)
+        if value not in (None, ''):
+            return value
+    value = request.query_params.get(name)
+    if value not in (None, ''):
+        return value
+    header_name = 'HTTP_X_' + name.upper().replace('-', '_')
+    value = request.META.get(header_name)
+    if value not in (None, ''):
+        return value
+    return default
+
+
+# 未提供 client_id 的客户端由服务端下发的 Cookie 区分
+POSE_CLIENT_COOKIE = 'pose_client_id'
+
+
+def get_pose_client_id(request):
+    """
+    帧调度（latest-frame-wins）、ROI 跟踪和静止帧缓存按客户端隔离所用的键
+    优先使用 client_id 参数或 X-Client-Id 请求头，其次使用 Cookie 中服务端下发的 ID，都没有时生成新的 ID；
+    不使用客户端 IP，同一 NAT/反向代理后的用户不会互相取代帧或复用彼此的裁剪区域和关键点
+    返回: (client_id, 是否为本次新生成)
+    """
+    client_id = get_pose_option(request, 'client_id')
+    if client_id:
+        return str(client_id), False
+    client_id = request.COOKIES.get(POSE_CLIENT_COOKIE, '')
+    if re.fullmatch(r'[0-9a-f]{32}', client_id):
+        return client_id, False
+    return uuid.uuid4().hex, True
+
+
+def issue_pose_client_id(response, client_id, issued):
+    """新生成的客户端 ID 写入 Cookie，浏览器后续请求自动带上"""
+    if issued:
+        response.set_cookie(POSE_CLIENT_COOKIE, client_id, max_age=settings.POSE_CLIENT_COOKIE_AGE,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def read_frame_bytes(request):
+    """
+    从请求中取出图像的原始字节
+    支持三种方式：
+    - application/octet-stream 或 image/* 请求体：原始 JPEG/WebP 字节
+    - multipart 表单：image 文件字段
+    - JSON：base64 data-URL 字符串（旧方式）
+    返回: (image_bytes, source)
+    """
+    if isinstance(request.data, (bytes, bytearray)):
+        return request.data, 'binary'
+
+    image_file = request.FILES.get('image') if hasattr(request, 'FILES') else None
+    if image_file is not None:
+        return image_file.read(), 'multipart'
+
+    image_data = request.data.get('image', '') if hasattr(request.data, 'get') else ''
+    return decode_base64_frame(image_data), 'base64'
+
+
+def decode_base64_frame(image_data):
+    """base64 字符串（可带 data:image/jpeg;base64, 前缀）-> 图像字节"""
+    if not image_data:
+        return b''
+    # 移除data:image/jpeg;base64,前缀（如果存在）
+    if ',' in image_data:
+        image_data = image_data.split(',')[1]
+    return base64.b64decode(image_data)
+
+
+def decode_pose_frame(image_bytes, max_side, keep_original=False):
+    """
+    解码阶段：解码并缩小图像，同时转换为 MediaPipe 需要的 RGB
+    keep_original=True 时（jpeg 回显）按原始分辨率解码后再缩小，另外返回原始图像；否则 original 为 None
+    返回 (image, scale, image_rgb, original)
+    """
+    original = None
+    if keep_original:
+        original, _ = decode_frame(image_bytes)
+        if original is None:
+            return None, 1.0, None, None
+        image = resize_frame(original, max_side=max_side)
+        input_scale = max(image.shape[:2]) / max(original.shape[:2])
+    else:
+        image, input_scale = decode_frame(image_bytes, max_side=max_side)
+        if image is None:
+            return None, input_scale, None, None
+    return image, input_scale, cv2.cvtColor(image, cv2.COLOR_BGR2RGB), original
+
+
+def encode_jpeg_data_url(image):
+    """编码阶段：BGR 图像 -> JPEG base64 data-URL"""
+    _, buffer = cv2.imencode('.jpg', image)
+    return f'data:image/jpeg;base64,{base64.b64encode(buffer).decode("utf-8")}'
+
 
 @api_view(['POST'])
+@parser_classes([JSONParser, MultiPartParser, FormParser, RawFrameParser, ImageFrameParser])
 def analyze_pose(request):
     """
     分析用户动作，提供AI指导
+    图像可以是 JSON 中的 base64 字符串，也可以是原始二进制帧（见 read_frame_bytes）
+    各阶段耗时记录到 metrics（见 /api/metrics/），逐帧日志为 DEBUG 级别，INFO 级别按 POSE_LOG_SAMPLE_EVERY 抽样
     """
-    import time
-    start_time = time.time()
-    print('[AnalyzePose] ========== 收到姿态分析请求 ==========')
+    start_time = time.perf_counter()
     
     try:
-        image_data = request.data.get('image', '')
-        exercise_type = request.data.get('exercise_type', 'general') # 获取动作类型
-        
-        print(f'[AnalyzePose] 动作类型: {exercise_type}')
-        print(f'[AnalyzePose] 图像数据长度: {len(image_data) if image_data else 0} 字符')
+        exercise_type = get_pose_option(request, 'exercise_type', 'general') # 获取动作类型
+        return_image = get_pose_option(request, 'return_image', 'landmarks')
+        if return_image not in RETURN_IMAGE_MODES:
+            return Response({
+                'success': False,
+                'error': f'return_image 必须是 {"/".join(RETURN_IMAGE_MODES)} 之一'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        landmark_format = get_pose_option(request, 'landmark_format', 'list')
+        if landmark_format not in LANDMARK_FORMATS:
+            return Response({
+                'success': False,
+                'error': f'landmark_format 必须是 {"/".join(LANDMARK_FORMATS)} 之一'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        if not image_data:
-            print('[AnalyzePose] ✗ 错误: 未提供图像数据')
+        try:
+            max_side = int(get_pose_option(request, 'max_side', settings.POSE_INFERENCE_MAX_SIDE))
+            if max_side < 0:
+                raise ValueError
+        except (TypeError, ValueError):
             return Response({
                 'success': False,
-                'error': '请提供图像数据'
+                'error': 'max_side 必须是非负整数'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 解码base64图像
-        decode_start = time.time()
+        # 解码、推理、编码分别在各自的阶段线程池中执行，并发请求的解码/编码与推理相互重叠
+        pipeline = get_pose_pipeline()
+
+        # 解码图像
+        decode_start = time.perf_counter()
         try:
-            # 移除data:image/jpeg;base64,前缀（如果存在）
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
+            image_bytes, frame_source = read_frame_bytes(request)
             
-            image_bytes = base64.b64decode(image_data)
-            print(f'[AnalyzePose] Base64解码完成，图像字节数: {len(image_bytes)}')
+            if not image_bytes:
+                logger.warning('未提供图像数据')
+                return Response({
+                    'success': False,
+                    'error': '请提供图像数据'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # jpeg 回显返回客户端发送的原始分辨率画面，推理仍使用缩小后的图像
+            image, input_scale, image_rgb, original = pipeline.run(
+                'decode', decode_pose_frame, image_bytes, max_side, return_image == 'jpeg'
+            )
             
             if image is None:
-                print('[AnalyzePose] ✗ 错误: 无法解码图像')
+                logger.warning('无法解码图像，来源: %s，字节数: %d', frame_source, len(image_bytes))
                 return Response({
                     'success': False,
                     'error': '无法解码图像'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            decode_duration = time.time() - decode_start
-            print(f'[AnalyzePose] ✓ 图像解码成功，耗时: {decode_duration*1000:.2f}ms')
-            print(f'[AnalyzePose] 图像尺寸: {image.shape[1]}x{image.shape[0]}')
+            metrics.observe('pose_decode', time.perf_counter() - decode_start)
             
         except Exception as e:
-            print(f'[AnalyzePose] ✗ 图像解码失败: {str(e)}')
-            import traceback
-            traceback.print_exc()
+            logger.exception('图像解码失败')
             return Response({
                 'success': False,
                 'error': f'图像解码失败: {str(e)}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 获取当前线程的 Pose 检测器
-        pose_detector = get_pose_detector()
-        print('[AnalyzePose] Pose检测器已获取')
-        
-        # 转换BGR到RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        process_start = time.time()
-        results = pose_detector.process(image_rgb)
-        process_duration = time.time() - process_start
-        print(f'[AnalyzePose] MediaPipe处理完成，耗时: {process_duration*1000:.2f}ms')
-        
-        # 准备返回数据
-        feedback = []
-        pose_state = "UNKNOWN"
-        pose_angle = 0
-        landmarks_detected = False
-        
-        annotated_image = image.copy()
-
-        # 检测是否检测到人体
-        if results.pose_landmarks:
-            landmarks_detected = True
-            print(f'[AnalyzePose] ✓ 检测到人体姿态，关键点数量: {len(results.pose_landmarks.landmark)}')
-            
-            # 提取关键点
-            landmarks = results.pose_landmarks.landmark
-            
+        # 配置了推理进程池时交给池中的进程，否则使用当前线程的 Pose 检测器
+        # 模型复杂度由控制器按最近的推理延迟和排队帧数在 0/1/2 之间调整
+        pose_pool = get_pose_pool()
+        if pose_pool is not None:
+            process = lambda image, level: pose_pool.process(image, model_complexity=level)
+        else:
+            process = lambda image, level: get_pose_detector(level).process(image)
+
+        # roi=1 时只对上一帧人体所在区域做推理（跟踪丢失时回退到整帧）
+        client_id, client_issued = get_pose_client_id(request)
+        use_roi = str(get_pose_option(request, 'roi', '0')).lower() in ('1', 'true', 'yes')
+
+        def run(level):
+            if use_roi:
+                return roi_tracker.process(client_id, image_rgb, lambda image: process(image, level))
+            return process(image_rgb, level), None
+
+        # 画面与上次推理的帧几乎相同（组间休息）时直接复用缓存的关键点
+        static_frames = get_static_frame_cache()
+        fingerprint = frame_fingerprint(image) if static_frames.enabled else None
+
+        def infer():
+            cached = static_frames.lookup(client_id, fingerprint)
+            if cached is not None:
+                return cached, True
+            output, level, duration = run_with_complexity(
+                get_complexity_controller(), run,
+                pose_scheduler.queue_depth + pipeline.backlog('infer')
+            )
+            metrics.observe('pose_inference', duration)
+            metrics.observe(f'pose_inference_complexity_{level}', duration)
+            static_frames.store(client_id, fingerprint, (output, level))
+            return (output, level), False
+        
+        # 同一客户端只保留最新一帧等待推理，推理期间被新帧取代的请求直接返回
+        try:
+            (((results, roi), model_complexity), static_hit), dropped_frames = pose_scheduler.run(
+                client_id, lambda: pipeline.run('infer', infer)
+            )
+        except FrameSuperseded as e:
+            metrics.inc('pose_frames_dropped')
+            logger.debug('帧已被更新的帧取代，客户端 %s 累计丢弃: %d', client_id, e.dropped_frames)
+            return issue_pose_client_id(Response({
+                'success': False,
+                'dropped': True,
+                'dropped_frames': e.dropped_frames,
+                'error': '帧已被更新的帧取代'
+            }, status=status.HTTP_409_CONFLICT), client_id, client_issued)
+        
+        # 分析关键点并准备返回数据
+        analyze_start = time.perf_counter()
+        response_data = build_pose_result(
+            results, exercise_type, image.shape,
+            include_landmarks=(return_image == 'landmarks'), landmark_format=landmark_format
+        )
+        response_data['dropped_frames'] = dropped_frames
+        response_data['input_scale'] = round(input_scale, 4)
+        response_data['model_complexity'] = model_complexity
+        response_data['static_frame'] = static_hit
+        if static_hit:
+            metrics.inc('pose_static_hits')
+        if use_roi:
+            # 本帧推理使用的裁剪区域（归一化 [x0, y0, x1, y1]），整帧推理时为 None
+            height, width = image.shape[:2]
+            response_data['roi'] = [
+                round(roi[0] / width, 4), round(roi[1] / height, 4),
+                round(roi[2] / width, 4), round(roi[3] / height, 4),
+            ] if roi else None
+            if roi:
+                metrics.inc('pose_roi_crops')
+        metrics.observe('pose_analysis', time.perf_counter() - analyze_start)
+        
+        if return_image == 'jpeg':
+            # 仅在显式请求时编码图像（无论是否检测到人体都返回，确保前端画面流畅）
             # 绘制姿态 (已禁用辅助点和辅助线展示)
+            # annotated_image = image.copy()
             # mp_drawing.draw_landmarks(
             #     annotated_image,
             #     results.pose_landmarks,
@@ -530,376 +769,333 @@ def analyze_pose(request):
             #     mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
             #     mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2)
             # )
-
-            # 根据动作类型进行分析
-            analyze_start = time.time()
-            if exercise_type in ACTION_CATEGORIES:
-                print(f'[AnalyzePose] 使用动作分类器分析: {exercise_type}')
-                state, val, msg = detect_action(exercise_type, landmarks, mp_pose)
-                if state:
-                    pose_state = state
-                    pose_angle = val
-                    feedback.append({'type': 'info', 'message': msg})
-                    print(f'[AnalyzePose] ✓ 动作检测成功 - 状态: {pose_state}, 角度: {pose_angle:.2f}°, 消息: {msg}')
-                else:
-                    feedback.append({'type': 'warning', 'message': msg})
-                    print(f'[AnalyzePose] ⚠ 动作检测失败 - 消息: {msg}')
-            elif exercise_type == 'squat':
-                print(f'[AnalyzePose] 使用深蹲检测器')
-                state, angle, msg = detect_squat(landmarks)
-                if state:
-                    pose_state = state
-                    pose_angle = angle
-                    feedback.append({'type': 'info', 'message': msg})
-                    print(f'[AnalyzePose] ✓ 深蹲检测成功 - 状态: {pose_state}, 角度: {pose_angle:.2f}°, 消息: {msg}')
-                else:
-                    feedback.append({'type': 'warning', 'message': msg})
-                    print(f'[AnalyzePose] ⚠ 深蹲检测失败 - 消息: {msg}')
-                    
-            elif exercise_type == 'curl':
-                print(f'[AnalyzePose] 使用弯举检测器')
-                state, angle, msg = detect_curl(landmarks)
-                if state:
-                    pose_state = state
-                    pose_angle = angle
-                    feedback.append({'type': 'info', 'message': msg})
-                    print(f'[AnalyzePose] ✓ 弯举检测成功 - 状态: {pose_state}, 角度: {pose_angle:.2f}°, 消息: {msg}')
-                else:
-                    feedback.append({'type': 'warning', 'message': msg})
-                    print(f'[AnalyzePose] ⚠ 弯举检测失败 - 消息: {msg}')
-                    
-            elif exercise_type == 'press':
-                print(f'[AnalyzePose] 使用推举检测器')
-                state, angle, msg = detect_press(landmarks)
-                if state:
-                    pose_state = state
-                    pose_angle = angle
-                    feedback.append({'type': 'info', 'message': msg})
-                    print(f'[AnalyzePose] ✓ 推举检测成功 - 状态: {pose_state}, 角度: {pose_angle:.2f}°, 消息: {msg}')
-                else:
-                    feedback.append({'type': 'warning', 'message': msg})
-                    print(f'[AnalyzePose] ⚠ 推举检测失败 - 消息: {msg}')
-            
-            else: # general
-                print(f'[AnalyzePose] 使用通用姿态质量分析')
-                feedback = analyze_pose_quality(landmarks, image.shape)
-                print(f'[AnalyzePose] ✓ 通用分析完成，反馈数量: {len(feedback)}')
-            
-            analyze_duration = time.time() - analyze_start
-            print(f'[AnalyzePose] 动作分析耗时: {analyze_duration*1000:.2f}ms')
-        else:
-            print('[AnalyzePose] ⚠ 未检测到人体姿态')
-            feedback.append({'type': 'warning', 'message': '未检测到人体，请调整站位'})
-
-        # 无论是否检测到，都返回图像，确保前端画面流畅
-        encode_start = time.time()
-        _, buffer = cv2.imencode('.jpg', annotated_image)
-        annotated_image_base64 = base64.b64encode(buffer).decode('utf-8')
-        encode_duration = time.time() - encode_start
-        print(f'[AnalyzePose] 图像编码完成，耗时: {encode_duration*1000:.2f}ms')
-        
-        total_duration = time.time() - start_time
-        print(f'[AnalyzePose] ========== 分析完成，总耗时: {total_duration*1000:.2f}ms ==========')
-        print(f'[AnalyzePose] 返回数据 - 状态: {pose_state}, 角度: {pose_angle:.2f}°, 反馈数: {len(feedback)}')
-        
-        return Response({
+            encode_start = time.perf_counter()
+            response_data['annotated_image'] = pipeline.run('encode', encode_jpeg_data_url, original)
+            metrics.observe('pose_encode', time.perf_counter() - encode_start)
+        
+        total_duration = time.perf_counter() - start_time
+        metrics.observe('pose_request', total_duration)
+        frames = metrics.inc('pose_frames')
+        if not response_data['landmarks_detected']:
+            metrics.inc('pose_detection_misses')
+        
+        logger.debug('%s %dx%d (%s) 状态: %s, 角度: %.2f, 总耗时: %.2fms',
+                     exercise_type, image.shape[1], image.shape[0], frame_source,
+                     response_data['pose_state'], response_data['pose_angle'], total_duration * 1000)
+        if frames % settings.POSE_LOG_SAMPLE_EVERY == 0:
+            latency = metrics.snapshot()['latency_ms']['pose_request']
+            logger.info('已处理 %d 帧，总耗时 p50 %.2fms / p95 %.2fms，未检测到人体比例: %s，丢弃帧: %d',
+                        frames, latency['p50'], latency['p95'],
+                        metrics.ratio('pose_detection_misses', 'pose_frames'),
+                        metrics.counter('pose_frames_dropped'))
+        
+        if client_issued:
+            # 不保存 Cookie 的客户端可以改用 X-Client-Id 请求头
+            response_data['client_id'] = client_id
+        return issue_pose_client_id(Response({
             'success': True,
-            'data': {
-                'feedback': feedback,
-                'annotated_image': f'data:image/jpeg;base64,{annotated_image_base64}',
-                'landmarks_detected': landmarks_detected,
-                'pose_state': pose_state,
-                'pose_angle': pose_angle,
-                'exercise_type': exercise_type
-            }
-        }, status=status.HTTP_200_OK)
+            'data': response_data
+        }, status=status.HTTP_200_OK), client_id, client_issued)
             
     except Exception as e:
-        total_duration = time.time() - start_time
-        print(f'[AnalyzePose] ✗ 错误: {str(e)}')
-        print(f'[AnalyzePose] 错误发生前耗时: {total_duration*1000:.2f}ms')
-        import traceback
-        traceback.print_exc()
+        metrics.inc('pose_errors')
+        logger.exception('姿态分析失败，耗时 %.2fms', (time.perf_counter() - start_time) * 1000)
         return Response({
             'success': False,
             'error': f'姿态分析失败: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def calculate_angle(point1, point2, point3):
-    """计算三点之间的角度"""
-    a = np.array([point1.x, point1.y])
-    b = np.array([point2.x, point2.y])
-    c = np.array([point3.x, point3.y])
-    
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    
-    if angle > 180.0:
-        angle = 360 - angle
-    
-    return angle
+def track_pose_frames(images_rgb, model_complexity):
+    """推理阶段：用当前线程的跟踪模式检测器按顺序处理一组帧，返回每帧的 (33, 4) 数组或 None"""
+    detector = get_tracking_detector(model_complexity)
+    detector.reset()
+    return [results_to_array(detector.process(image)) for image in images_rgb]
 
 
-def analyze_pose_quality(landmarks, image_shape):
+@api_view(['POST'])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+def analyze_pose_batch(request):
     """
-    分析姿态质量，提供AI指导
+    批量姿态分析：一次请求上传同一动作的一组有序帧（弱网缓冲、回放录制的一组训练）
+    - multipart：多个 images 文件字段，按上传顺序处理
+    - JSON：frames 为 base64 图像字符串列表
+    - exercise_type：动作类型；timestamps：每帧时间戳（秒），省略时按 fps（默认 30）推算
+    - return_image：none（默认）或 landmarks；landmark_format、max_side、smoothing、min_rep_interval 同单帧与计数接口
+    帧按顺序经过同一个跟踪模式检测器，返回每帧状态以及整组的动作计数
     """
-    feedback = []
-    
-    # 获取关键点索引
-    mp_pose = mp.solutions.pose
-    
-    # 左肩、左肘、左手腕
-    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-    left_elbow = landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-    left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
-    
-    # 右肩、右肘、右手腕
-    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-    right_elbow = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    
-    # 左髋、左膝、左脚踝
-    left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP.value]
-    left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value]
-    left_ankle = landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-    
-    # 右髋、右膝、右脚踝
-    right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value]
-    right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-    right_ankle = landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-    
-    # 分析左臂角度
-    if (left_shoulder.visibility > 0.5 and left_elbow.visibility > 0.5 and 
-        left_wrist.visibility > 0.5):
-        left_arm_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-        if left_arm_angle < 150:
-            feedback.append({
-                'type': 'warning',
-                'message': '左臂可以更伸直一些',
-                'body_part': 'left_arm'
-            })
-        elif left_arm_angle > 180:
-            feedback.append({
-                'type': 'info',
-                'message': '左臂姿势良好',
-                'body_part': 'left_arm'
-            })
-    
-    # 分析右臂角度
-    if (right_shoulder.visibility > 0.5 and right_elbow.visibility > 0.5 and 
-        right_wrist.visibility > 0.5):
-        right_arm_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        if right_arm_angle < 150:
-            feedback.append({
-                'type': 'warning',
-                'message': '右臂可以更伸直一些',
-                'body_part': 'right_arm'
-            })
-        elif right_arm_angle > 180:
-            feedback.append({
-                'type': 'info',
-                'message': '右臂姿势良好',
-                'body_part': 'right_arm'
-            })
-    
-    # 分析左腿角度
-    if (left_hip.visibility > 0.5 and left_knee.visibility > 0.5 and 
-        left_ankle.visibility > 0.5):
-        left_leg_angle = calculate_angle(left_hip, left_knee, left_ankle)
-        if left_leg_angle < 150:
-            feedback.append({
-                'type': 'warning',
-                'message': '左腿可以更伸直一些',
-                'body_part': 'left_leg'
-            })
-    
-    # 分析右腿角度
-    if (right_hip.visibility > 0.5 and right_knee.visibility > 0.5 and 
-        right_ankle.visibility > 0.5):
-        right_leg_angle = calculate_angle(right_hip, right_knee, right_ankle)
-        if right_leg_angle < 150:
-            feedback.append({
-                'type': 'warning',
-                'message': '右腿可以更伸直一些',
-                'body_part': 'right_leg'
-            })
-    
-    # 分析身体平衡
-    if (left_shoulder.visibility > 0.5 and right_shoulder.visibility > 0.5 and
-        left_hip.visibility > 0.5 and right_hip.visibility > 0.5):
-        shoulder_diff = abs(left_shoulder.y - right_shoulder.y)
-        hip_diff = abs(left_hip.y - right_hip.y)
-        
-        if shoulder_diff > 0.05 or hip_diff > 0.05:
-            feedback.append({
-                'type': 'warning',
-                'message': '注意保持身体平衡，肩膀和髋部应该在同一水平线上',
-                'body_part': 'balance'
-            })
+    start_time = time.perf_counter()
+    data = request.data
+    if not isinstance(data, dict):
+        return Response({'success': False, 'error': '请求体必须是 JSON 对象'}, status=status.HTTP_400_BAD_REQUEST)
+    exercise_type = data.get('exercise_type') or 'general'
+    return_image = data.get('return_image') or 'none'
+    if return_image not in ('none', 'landmarks'):
+        return Response({
+            'success': False,
+            'error': 'return_image 必须是 none/landmarks 之一'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    landmark_format = data.get('landmark_format') or 'list'
+    if landmark_format not in LANDMARK_FORMATS:
+        return Response({
+            'success': False,
+            'error': f'landmark_format 必须是 {"/".join(LANDMARK_FORMATS)} 之一'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if request.FILES.getlist('images'):
+            frames = [image_file.read() for image_file in request.FILES.getlist('images')]
         else:
-            feedback.append({
-                'type': 'success',
-                'message': '身体平衡良好',
-                'body_part': 'balance'
-            })
-    
-    if not feedback:
-        feedback.append({
-            'type': 'info',
-            'message': '姿态检测正常，继续保持',
-            'body_part': 'general'
+            frames = [decode_base64_frame(frame) for frame in data.get('frames') or []]
+        if not frames:
+            raise ValueError('请提供 images 文件或 frames 列表')
+        if len(frames) > settings.POSE_BATCH_MAX_FRAMES:
+            raise ValueError(f'单次最多 {settings.POSE_BATCH_MAX_FRAMES} 帧')
+        timestamps = data.get('timestamps')
+        if isinstance(timestamps, str):
+            timestamps = json.loads(timestamps)
+        if timestamps:
+            timestamps = [float(value) for value in timestamps]
+            if len(timestamps) != len(frames):
+                raise ValueError('timestamps 与帧数不一致')
+        else:
+            fps = data.get('fps')
+            fps = 30.0 if fps in (None, '') else float(fps)
+            if not 0 < fps < float('inf'):
+                raise ValueError('fps 必须大于 0')
+            timestamps = [index / fps for index in range(len(frames))]
+        max_side = int(data.get('max_side') or settings.POSE_INFERENCE_MAX_SIDE)
+        if max_side < 0:
+            raise ValueError('max_side 必须是非负整数')
+        smoothing = int(data.get('smoothing') or 5)
+        min_rep_interval = float(data.get('min_rep_interval') or 1.0)
+    except (TypeError, ValueError) as e:
+        return Response({'success': False, 'error': f'批量数据无效: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # 各帧并行解码；推理在批量推理线程内按顺序进行，保持跟踪模式的连续性，不占用实时请求的推理线程
+        pipeline = get_pose_pipeline()
+        decode_start = time.perf_counter()
+        decoded = pipeline.map('decode', decode_pose_frame, frames, max_side)
+        metrics.observe('pose_batch_decode', time.perf_counter() - decode_start)
+        undecodable = [index for index, (image, _, _, _) in enumerate(decoded) if image is None]
+        if undecodable:
+            return Response({
+                'success': False,
+                'error': f'无法解码图像，帧序号: {undecodable}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        infer_start = time.perf_counter()
+        arrays = pipeline.run(
+            'batch', track_pose_frames, [image_rgb for _, _, image_rgb, _ in decoded],
+            settings.POSE_POOL_MODEL_COMPLEXITY
+        )
+        metrics.observe('pose_batch_inference', time.perf_counter() - infer_start)
+
+        include_landmarks = return_image == 'landmarks'
+        results = []
+        for index, ((image, input_scale, _, _), array) in enumerate(zip(decoded, arrays)):
+            frame_data = build_pose_result(
+                PoolPoseResults(array), exercise_type, image.shape,
+                include_landmarks=include_landmarks, landmark_format=landmark_format
+            )
+            frame_data['frame_index'] = index
+            frame_data['timestamp'] = timestamps[index]
+            results.append(frame_data)
+
+        # 整组动作计数：与服务端计数会话相同的滞回状态机
+        detector = DETECTORS.get(exercise_type)
+        reps = None
+        if detector is not None and detector.rep_phases is not None:
+            empty = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+            values, visible = measure_frames(
+                detector, np.stack([array if array is not None else empty for array in arrays])
+            )
+            counter = RepCounter(detector, smoothing=smoothing, min_rep_interval=min_rep_interval)
+            counter.update(values, visible, timestamps)
+            reps = counter.snapshot()
+            reps['segments'] = counter.segments
+            reps['visible_ratio'] = round(float(np.mean(visible)), 3)
+
+        detected = sum(1 for frame_data in results if frame_data['landmarks_detected'])
+        metrics.inc('pose_batch_frames', len(frames))
+        metrics.observe('pose_batch_request', time.perf_counter() - start_time)
+        return Response({
+            'success': True,
+            'data': {
+                'exercise_type': exercise_type,
+                'frame_count': len(frames),
+                'detected_frames': detected,
+                'frames': results,
+                'reps': reps,
+                'model_complexity': settings.POSE_POOL_MODEL_COMPLEXITY,
+                'duration_ms': round((time.perf_counter() - start_time) * 1000, 2),
+            }
         })
-    
-    return feedback
 
+    except Exception as e:
+        metrics.inc('pose_errors')
+        logger.exception('批量姿态分析失败')
+        return Response({
+            'success': False,
+            'error': f'批量姿态分析失败: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def detect_squat(landmarks):
+
+@api_view(['GET'])
+@renderer_classes([OrjsonRenderer, MessagePackRenderer, PrometheusTextRenderer])
+def metrics_view(request):
     """
-    检测深蹲动作
-    返回: (state, angle, feedback)
-    state: 'UP' (站立), 'DOWN' (下蹲)
+    性能指标：各阶段延迟分位数（毫秒）、帧数、丢弃帧数、未检测到人体比例、静止帧命中率、视频分析缓存命中率
+    Prometheus 抓取（Accept: text/plain 或 ?format=prometheus）时返回文本格式
     """
-    mp_pose = mp.solutions.pose
-    
-    # 获取髋、膝、踝
-    left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP.value]
-    left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value]
-    left_ankle = landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-    
-    right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value]
-    right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-    right_ankle = landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-    
-    # 确保关键点可见
-    if (left_hip.visibility < 0.5 or left_knee.visibility < 0.5 or left_ankle.visibility < 0.5):
-        return None, 0, "未检测到完整的腿部，请调整站位"
-
-    # 计算膝盖角度
-    left_angle = calculate_angle(left_hip, left_knee, left_ankle)
-    right_angle = calculate_angle(right_hip, right_knee, right_ankle)
-    
-    avg_angle = (left_angle + right_angle) / 2
-    
-    state = "UNKNOWN"
-    feedback = ""
-    
-    if avg_angle > 150:
-        state = "UP"
-        feedback = "站立准备"
-    elif avg_angle < 130:
-        state = "DOWN"
-        feedback = "下蹲到位"
-    else:
-        state = "TRANSITION"
-        feedback = "动作进行中"
-        
-    return state, avg_angle, feedback
+    # 视频分析在 video_worker 进程中执行，统计由数据库中的任务记录计算后作为 gauge 输出
+    try:
+        video_stats = video_job_stats()
+    except DatabaseError as e:
+        logger.warning('统计视频分析任务失败: %s', e)
+        video_stats = {}
+    for name, value in video_stats.items():
+        if value is not None:
+            metrics.set_gauge(name, value)
+    if request.accepted_renderer.format == 'prometheus':
+        return Response(metrics.render_prometheus())
+    data = metrics.snapshot()
+    data['detection_miss_rate'] = metrics.ratio('pose_detection_misses', 'pose_frames')
+    data['static_frame_hit_rate'] = metrics.ratio('pose_static_hits', 'pose_frames')
+    data['session_static_frame_hit_rate'] = metrics.ratio('pose_session_static_hits', 'pose_session_frames')
+    data['video_cache_hit_rate'] = video_stats.get('video_cache_hit_rate')
+    return Response({
+        'success': True,
+        'data': data
+    })
 
 
-def detect_curl(landmarks):
+@api_view(['GET'])
+def readiness(request):
     """
-    检测哑铃弯举动作 (检测主要活动的手臂)
-    返回: (state, angle, feedback)
-    state: 'DOWN' (放下), 'UP' (举起)
+    就绪检查：姿态模型预热完成（或未启用预热）时返回 200，否则返回 503
+    进程未在启动时预热（例如非常规方式启动）时，首次检查会触发预热
     """
-    mp_pose = mp.solutions.pose
-    
-    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-    left_elbow = landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-    left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
-    
-    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-    right_elbow = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    
-    # 判断哪只手臂在运动（可以通过手腕高度或变化幅度，简单起见检测可见度高且角度小的那只）
-    # 这里简单处理：优先检测右臂，如果右臂不可见则检测左臂
-    
-    target_arm = "right"
-    angle = 0
-    
-    if right_shoulder.visibility > 0.5 and right_elbow.visibility > 0.5 and right_wrist.visibility > 0.5:
-        target_arm = "right"
-        angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-    elif left_shoulder.visibility > 0.5 and left_elbow.visibility > 0.5 and left_wrist.visibility > 0.5:
-        target_arm = "left"
-        angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-    else:
-        return None, 0, "未检测到手臂"
-
-    state = "UNKNOWN"
-    feedback = ""
-    
-    if angle > 145:
-        state = "DOWN"
-        feedback = "手臂已放下"
-    elif angle < 85: # 放宽判定，小于85度即算到位
-        state = "UP"
-        feedback = "弯举到位"
-    else:
-        state = "TRANSITION"
-        feedback = "弯举中"
-        
-    return state, angle, feedback
+    state = start_warmup()
+    return Response({
+        'success': state.ready,
+        'data': state.snapshot()
+    }, status=status.HTTP_200_OK if state.ready else status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
-def detect_press(landmarks):
+@api_view(['GET', 'POST'])
+def rep_session(request):
     """
-    检测哑铃推肩动作
-    返回: (state, angle, feedback)
-    state: 'DOWN' (放下/准备), 'UP' (推起)
+    服务端动作计数（客户端本地运行 MediaPipe，只上传数字）
+    GET ?exercise_type=xxx：返回该动作需要上传的关键点和计数阶段
+    POST JSON：
+    - session_id：会话 ID，首次请求可省略，由服务端生成并返回
+    - exercise_type：动作类型，新建会话时必填
+    - frames：关键点帧列表，每帧 33 个 [x, y, z, visibility]；配合 landmarks 可只上传部分关键点
+    - values / visible：也可以直接上传检测器的测量值（角度或高度差）及其可见性，代替 frames
+    - timestamps：每帧的时间戳（秒）；多帧时必须提供，或提供 fps 按帧间隔推算（最后一帧为服务端收到请求的时间）
+      单帧时可省略，使用服务端收到请求的时间
+    - reset / end：重置会话 / 计数结束后释放会话
+    - log_id：与该训练日志的 reps_count 对比
     """
-    mp_pose = mp.solutions.pose
-    
-    # 获取关键点
-    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-    left_elbow = landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-    left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
-    
-    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-    right_elbow = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    
-    # 检查可见性
-    left_visible = left_shoulder.visibility > 0.5 and left_elbow.visibility > 0.5 and left_wrist.visibility > 0.5
-    right_visible = right_shoulder.visibility > 0.5 and right_elbow.visibility > 0.5 and right_wrist.visibility > 0.5
-    
-    if not left_visible and not right_visible:
-        return None, 0, "未检测到手臂"
-        
-    # 计算角度和位置
-    angles = []
-    
-    # 关键判定：手腕必须高于肩膀 (y坐标更小)
-    # 如果手腕低于肩膀，说明手臂是垂下的，不是推肩姿势
-    
-    if left_visible and left_wrist.y < left_shoulder.y:
-        angles.append(calculate_angle(left_shoulder, left_elbow, left_wrist))
-        
-    if right_visible and right_wrist.y < right_shoulder.y:
-        angles.append(calculate_angle(right_shoulder, right_elbow, right_wrist))
-        
-    if not angles:
-        return None, 0, "请举起双手至肩部以上"
-        
-    avg_angle = sum(angles) / len(angles)
-    
-    state = "UNKNOWN"
-    feedback = ""
-    
-    if avg_angle > 150:
-        state = "UP"
-        feedback = "推举到位"
-    elif avg_angle < 100:
-        state = "DOWN"
-        feedback = "下放到位"
-    else:
-        state = "TRANSITION"
-        feedback = "发力中"
-        
-    return state, avg_angle, feedback
+    if request.method == 'GET':
+        exercise_type = request.query_params.get('exercise_type', '')
+        detector = DETECTORS.get(exercise_type)
+        if detector is None:
+            return Response({
+                'success': False,
+                'error': f'未知动作类型: {exercise_type}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'success': True,
+            'data': {
+                'exercise_type': exercise_type,
+                'countable': detector.rep_phases is not None,
+                'landmarks': list(detector.landmarks),
+                'landmark_indices': landmark_indices(detector.landmarks),
+            }
+        })
+
+    data = request.data
+    if not isinstance(data, dict):
+        return Response({'success': False, 'error': '请求体必须是 JSON 对象'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        log_id = int(data['log_id']) if data.get('log_id') else None
+    except (TypeError, ValueError):
+        return Response({'success': False, 'error': 'log_id 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+    # 先完整校验请求数据，再获取或创建会话：无效请求不留下会话，也不会在持有会话锁时出错
+    try:
+        options = {}
+        if data.get('smoothing') is not None:
+            options['smoothing'] = int(data['smoothing'])
+        if data.get('min_rep_interval') is not None:
+            options['min_rep_interval'] = float(data['min_rep_interval'])
+        detector = rep_sessions.resolve_detector(data.get('session_id'), data.get('exercise_type'))
+        if detector.rep_phases is None:
+            raise ValueError(f'动作类型 {detector.key} 不支持计数')
+    except (TypeError, ValueError) as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if data.get('frames') is not None:
+            names = data.get('landmarks')
+            array = frames_to_array(data['frames'], landmark_indices(names) if names else None)
+            values, visible = measure_frames(detector, array)
+        else:
+            values = np.asarray(data.get('values') or [], dtype=np.float32)
+            visible = np.asarray(data.get('visible') or [True] * len(values), dtype=bool)
+        if values.ndim != 1 or visible.ndim != 1:
+            raise ValueError('values 与 visible 必须是一维列表')
+        timestamps = data.get('timestamps')
+        if not timestamps:
+            # 同一时间戳的多帧会让节奏和时长统计为 0
+            if data.get('fps') is not None:
+                fps = float(data['fps'])
+                if not 0 < fps < float('inf'):
+                    raise ValueError('fps 必须大于 0')
+                now = time.time()
+                timestamps = [now - (len(values) - 1 - index) / fps for index in range(len(values))]
+            elif len(values) > 1:
+                raise ValueError('多帧时必须提供 timestamps 或 fps')
+            else:
+                timestamps = [time.time()] * len(values)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if timestamps.ndim != 1 or not np.isfinite(timestamps).all():
+            raise ValueError('timestamps 必须是数字列表')
+        if not (len(values) == len(visible) == len(timestamps)):
+            raise ValueError('frames/values、visible 与 timestamps 的长度必须一致')
+    except (TypeError, ValueError, KeyError, IndexError) as e:
+        return Response({'success': False, 'error': f'计数数据无效: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session_id, session = rep_sessions.get(
+            data.get('session_id'), data.get('exercise_type'),
+            reset=bool(data.get('reset')), **options
+        )
+    except ValueError as e:
+        # 校验后会话恰好过期，且请求未指定动作类型
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    counter = session.counter
+    with session.lock:
+        added = counter.update(values, visible, timestamps)
+        result = counter.snapshot()
+    result['session_id'] = session_id
+    result['new_reps'] = added
+
+    if log_id is not None:
+        log = WorkoutLog.objects.filter(id=log_id).first()
+        if log is not None:
+            result['log_reps_count'] = log.reps_count
+            result['log_reps_match'] = log.reps_count == result['reps']
+    if data.get('end'):
+        rep_sessions.discard(session_id)
+
+    return Response({
+        'success': True,
+        'data': result
+    })
 
 
 @api_view(['GET'])
@@ -24,6 +24,7 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
+    'channels',
     'api',
 ]
 
@@ -65,6 +67,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'workout_app.wsgi.application'
+ASGI_APPLICATION = 'workout_app.asgi.application'
+
+# Channels (WebSocket 实时姿态分析)
+# 本地运行使用内存通道层；多进程部署时可替换为 channels_redis
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -135,8 +146,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson 输出 JSON（默认）；Accept: application/msgpack 或 ?format=msgpack 时输出 MessagePack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.OrjsonRenderer',
+        'api.renderers.MessagePackRenderer',
     ],
 }
 
@@ -148,3 +161,108 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 
+
+# 姿态推理进程池（0 表示不启用，每个 Web 线程使用自己的检测器）
+# 每个进程常驻一个 MediaPipe 检测器和一块帧共享内存，内存上限与进程数成正比
+POSE_POOL_WORKERS = int(os.getenv('POSE_POOL_WORKERS', '0'))
+POSE_POOL_MODEL_COMPLEXITY = 1
+POSE_POOL_MAX_FRAME_PIXELS = 1920 * 1080
+
+# 姿态推理输入的长边上限（像素），更大的帧在解码时直接降采样；0 表示不缩小
+# MediaPipe 内部以 256x256 运行，640 以上的分辨率不会提高关键点精度
+POSE_INFERENCE_MAX_SIDE = int(os.getenv('POSE_INFERENCE_MAX_SIDE', '640'))
+
+# 模型复杂度自适应：推理延迟 p95 超过目标时降低 model_complexity，余量充足时提高
+# Lite(0)/Heavy(2) 模型首次使用时由 MediaPipe 联网下载，无法下载的档位会被自动跳过
+POSE_ADAPTIVE_COMPLEXITY = os.getenv('POSE_ADAPTIVE_COMPLEXITY', '1') == '1'
+POSE_LATENCY_TARGET_MS = float(os.getenv('POSE_LATENCY_TARGET_MS', '150'))
+POSE_MODEL_COMPLEXITY_LEVELS = tuple(
+    int(level) for level in os.getenv('POSE_MODEL_COMPLEXITY_LEVELS', '0,1,2').split(',')
+)
+
+# 静止帧短路：与上次推理帧的 32x24 灰度缩略图平均差低于阈值（0~255，0 表示关闭）时复用上次结果
+# 缓存结果最长复用 POSE_STATIC_FRAME_MAX_AGE 秒
+POSE_STATIC_FRAME_THRESHOLD = float(os.getenv('POSE_STATIC_FRAME_THRESHOLD', '1.5'))
+POSE_STATIC_FRAME_MAX_AGE = float(os.getenv('POSE_STATIC_FRAME_MAX_AGE', '1.0'))
+
+# 未提供 client_id 的姿态分析客户端由 Cookie 中下发的 ID 区分（帧调度、ROI 跟踪、静止帧缓存），有效期（秒）
+POSE_CLIENT_COOKIE_AGE = int(os.getenv('POSE_CLIENT_COOKIE_AGE', str(7 * 24 * 3600)))
+
+# analyze-pose 分阶段流水线：解码 / 推理 / 编码各自的线程数（0 表示在请求线程内执行）
+# 推理线程数决定每种模型复杂度的 Pose 检测器数量（每个线程一个检测器）
+# 启用推理进程池时默认与进程数一致（线程只负责把帧交给池中的进程，检测器在进程中），否则固定为 2：
+# 每个推理线程为用到的每种复杂度各持有一个检测器，内存随 线程数 × 档位数 增长，不随 CPU 核数增长；
+# 多核机器需要更高吞吐时启用 POSE_POOL_WORKERS（内存上限与进程数成正比）或显式调大该值
+POSE_PIPELINE = os.getenv('POSE_PIPELINE', '1') == '1'
+POSE_PIPELINE_DECODE_THREADS = int(os.getenv('POSE_PIPELINE_DECODE_THREADS', '2'))
+POSE_PIPELINE_INFER_THREADS = int(os.getenv('POSE_PIPELINE_INFER_THREADS', str(POSE_POOL_WORKERS or 2)))
+POSE_PIPELINE_ENCODE_THREADS = int(os.getenv('POSE_PIPELINE_ENCODE_THREADS', '2'))
+# 批量姿态分析的推理线程数，与实时请求的推理线程分开，同时执行的批次数不超过该值
+POSE_PIPELINE_BATCH_THREADS = int(os.getenv('POSE_PIPELINE_BATCH_THREADS', '1'))
+
+# 批量姿态分析单次请求的最大帧数（一个批次在批量推理线程上按顺序推理，帧数决定其占用时长）
+POSE_BATCH_MAX_FRAMES = int(os.getenv('POSE_BATCH_MAX_FRAMES', '120'))
+# multipart 批量上传时每帧是一个文件，Django 默认最多 100 个
+DATA_UPLOAD_MAX_NUMBER_FILES = max(100, POSE_BATCH_MAX_FRAMES)
+
+# Web 进程启动时预热姿态模型（/api/ready/ 在预热完成前返回 503）
+# POSE_WARMUP_COMPLEXITY_LEVELS 为预热的模型复杂度：启用复杂度自适应时默认预热 POSE_MODEL_COMPLEXITY_LEVELS 的所有档位
+# （Lite/Heavy 模型在启动时下载和加载，而不是在控制器切换档位后的请求中），否则只预热 POSE_POOL_MODEL_COMPLEXITY
+POSE_WARMUP = os.getenv('POSE_WARMUP', '1') == '1'
+POSE_WARMUP_COMPLEXITY_LEVELS = tuple(
+    int(level) for level in os.getenv(
+        'POSE_WARMUP_COMPLEXITY_LEVELS',
+        ','.join(map(str, POSE_MODEL_COMPLEXITY_LEVELS if POSE_ADAPTIVE_COMPLEXITY else (POSE_POOL_MODEL_COMPLEXITY,)))
+    ).split(',')
+)
+
+# 视频分析结果缓存：按上传内容 SHA-256 + 模型 + 提示词版本保存训练计划和 GIF
+# 超过 VIDEO_CACHE_TTL_DAYS 天未使用的条目删除；条目数或 GIF 总大小（MB）超过上限时淘汰最久未使用的条目（0 表示不限制）
+VIDEO_CACHE = os.getenv('VIDEO_CACHE', '1') == '1'
+VIDEO_CACHE_TTL_DAYS = int(os.getenv('VIDEO_CACHE_TTL_DAYS', '30'))
+VIDEO_CACHE_MAX_ENTRIES = int(os.getenv('VIDEO_CACHE_MAX_ENTRIES', '200'))
+VIDEO_CACHE_MAX_GIF_MB = int(os.getenv('VIDEO_CACHE_MAX_GIF_MB', '500'))
+
+# analyze-video 执行方式：async 为登记任务后立即返回 job_id，由 python manage.py video_worker 进程执行；
+# sync 为在请求内执行；auto（默认）在有存活 worker（心跳未超时）时使用 async，否则 sync
+VIDEO_ANALYSIS_MODE = os.getenv('VIDEO_ANALYSIS_MODE', 'auto')
+VIDEO_WORKER_HEARTBEAT_SECONDS = float(os.getenv('VIDEO_WORKER_HEARTBEAT_SECONDS', '5'))
+VIDEO_WORKER_TIMEOUT_SECONDS = float(os.getenv('VIDEO_WORKER_TIMEOUT_SECONDS', '30'))
+VIDEO_JOB_DIR = os.getenv('VIDEO_JOB_DIR', os.path.join(BASE_DIR, 'video_jobs'))  # 待处理上传的保存目录
+VIDEO_JOB_POLL_INTERVAL = float(os.getenv('VIDEO_JOB_POLL_INTERVAL', '1'))
+# 超过该秒数没有进度更新的 running 任务视为 worker 已退出，重新排队（最多执行 VIDEO_JOB_MAX_ATTEMPTS 次）
+VIDEO_JOB_STALE_SECONDS = int(os.getenv('VIDEO_JOB_STALE_SECONDS', '900'))
+VIDEO_JOB_MAX_ATTEMPTS = int(os.getenv('VIDEO_JOB_MAX_ATTEMPTS', '2'))
+VIDEO_JOB_RETENTION_DAYS = int(os.getenv('VIDEO_JOB_RETENTION_DAYS', '7'))
+# 动作 GIF 默认在一次顺序读取视频中全部生成；大于 1 时按时间范围分给多个进程并行读取、编码（多核时使用）
+VIDEO_GIF_WORKERS = int(os.getenv('VIDEO_GIF_WORKERS', '0'))
+
+# 姿态分析日志：逐帧信息为 DEBUG 级别，INFO 级别每 N 帧输出一次汇总
+POSE_LOG_SAMPLE_EVERY = int(os.getenv('POSE_LOG_SAMPLE_EVERY', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '[{levelname}] {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# 训练视频本地分析的抽帧步长（每 N 帧分析一帧）
+VIDEO_POSE_STRIDE = int(os.getenv('VIDEO_POSE_STRIDE', '2'))